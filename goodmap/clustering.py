@@ -1,10 +1,29 @@
 import logging
+import math
+import threading
 import uuid
 
-from scipy.spatial import KDTree
+import numpy
+import pysupercluster
 
-# Maximum distance to consider a point-cluster match (accounts for floating point errors)
-DISTANCE_THRESHOLD = 1e-8
+# Maximum number of distinct filter sets whose cluster indexes are cached
+CLUSTER_INDEX_CACHE_SIZE = 32
+
+# Query parameters that only affect how an index is queried, not which points it holds
+CLUSTER_QUERY_PARAMS = frozenset({"zoom", "bbox", "north", "south", "east", "west"})
+
+# Fraction of the viewport size added on every side of a requested bounding box,
+# so clusters whose centre is just off-screen are still returned
+BBOX_MARGIN = 0.1
+
+# Upper bound for the total size of the cached serialized tiles
+TILE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Namespace for the name-based (uuid5) identifiers of multi-point clusters
+CLUSTER_UUID_NAMESPACE = uuid.UUID("6f1c3b52-52a4-4c8e-9d0a-2f5b8e3c7a41")
+
+# SuperCluster query box covering the whole map
+WORLD_BOXES = [((-180.0, 90.0), (180.0, -90.0))]
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +34,7 @@ def map_clustering_data_to_proper_lazy_loading_object(input_array):
     Transforms an array of clustered point data into response objects suitable
     for lazy loading on the frontend. Single-point clusters become "point" type
     objects with their original UUID, while multi-point clusters become "cluster"
-    type objects with a generated UUID and count.
+    type objects with a deterministic UUID (see ``make_cluster_uuid``) and count.
 
     Args:
         input_array: List of cluster dicts with 'count', 'longitude', 'latitude',
@@ -29,7 +48,7 @@ def map_clustering_data_to_proper_lazy_loading_object(input_array):
     for item in input_array:
         if item["count"] == 1:
             response_object = {
-                "position": [item["longitude"], item["latitude"]],
+                "position": [item["latitude"], item["longitude"]],
                 "uuid": item["uuid"],
                 "cluster_uuid": None,
                 "cluster_count": None,
@@ -38,9 +57,9 @@ def map_clustering_data_to_proper_lazy_loading_object(input_array):
             response_array.append(response_object)
             continue
         response_object = {
-            "position": [item["longitude"], item["latitude"]],
+            "position": [item["latitude"], item["longitude"]],
             "uuid": None,
-            "cluster_uuid": str(uuid.uuid4()),
+            "cluster_uuid": make_cluster_uuid(item),
             "cluster_count": item["count"],
             "type": "cluster",
         }
@@ -48,43 +67,360 @@ def map_clustering_data_to_proper_lazy_loading_object(input_array):
     return response_array
 
 
-# Since there can be some floating point errors
-# we need to check if the distance is close enough to 0
-def match_clusters_uuids(points, clusters):
+def match_clusters_uuids(uuids, clusters):
     """
     Match single-point clusters to their original point UUIDs.
 
-    For clusters containing exactly one point, this function attempts to match the cluster
-    coordinates back to the original point to retrieve its UUID. The 'uuid' key is optional
-    and will only be present in single-point clusters where a matching point is found.
+    SuperCluster reports a single point with the row index it was built from as its
+    'id', so the UUID is looked up directly instead of by position. This also keeps
+    co-located points apart.
 
     Args:
-        points: List of point dicts with 'position' and 'uuid' keys
-        clusters: List of cluster dicts with 'longitude', 'latitude', and 'count' keys.
-                 For single-point clusters (count=1), a 'uuid' key will be added if a
-                 matching point is found (modified in place)
+        uuids: List of point UUIDs in the order the points were passed to SuperCluster
+        clusters: List of cluster dicts with 'id' and 'count' keys. For single-point
+                 clusters (count=1), a 'uuid' key is added (modified in place)
 
     Returns:
-        The modified clusters list with 'uuid' keys added to matched single-point clusters
+        The modified clusters list with 'uuid' keys added to single-point clusters
     """
-    points_coords = [(point["position"][0], point["position"][1]) for point in points]
-    tree = KDTree(points_coords)
     for cluster in clusters:
         if cluster["count"] == 1:
-            cluster_coords = (cluster["longitude"], cluster["latitude"])
-            dist, idx = tree.query(cluster_coords)
-            if dist < DISTANCE_THRESHOLD:
-                closest_point = points[idx]
-                cluster["uuid"] = closest_point["uuid"]
+            point_id = cluster.get("id")
+            if point_id is not None and 0 <= point_id < len(uuids):
+                cluster["uuid"] = uuids[point_id]
             else:
                 # Log warning when no match is found - indicates data inconsistency
                 logger.warning(
-                    "No matching UUID found for cluster at coordinates (%f, %f). "
-                    "Distance to nearest point: %f (threshold: %f)",
+                    "No matching UUID found for cluster %s at coordinates (%f, %f)",
+                    point_id,
                     cluster["longitude"],
                     cluster["latitude"],
-                    dist,
-                    DISTANCE_THRESHOLD,
                 )
                 cluster["uuid"] = None
     return clusters
+
+
+def make_cluster_uuid(cluster):
+    """Return a stable identifier for a multi-point cluster.
+
+    The identifier is derived from the SuperCluster cluster id, the number of
+    points and the cluster position, so identical requests against the same data
+    return identical responses. Its last byte holds the cluster's expansion zoom
+    (see ``cluster_uuid_zoom``), if known.
+
+    Args:
+        cluster: Cluster dict with 'id', 'count', 'longitude' and 'latitude' keys,
+            and optionally 'expansion_zoom'
+
+    Returns:
+        UUID string
+    """
+    name = (
+        f"{cluster.get('id')}:{cluster['count']}:"
+        f"{cluster['longitude']:.7f}:{cluster['latitude']:.7f}"
+    )
+    cluster_uuid = uuid.uuid5(CLUSTER_UUID_NAMESPACE, name)
+    expansion_zoom = cluster.get("expansion_zoom")
+    if expansion_zoom is None:
+        return str(cluster_uuid)
+    return str(uuid.UUID(bytes=cluster_uuid.bytes[:-1] + bytes([expansion_zoom])))
+
+
+def cluster_uuid_zoom(cluster_uuid):
+    """Return the expansion zoom stored in a cluster identifier.
+
+    Args:
+        cluster_uuid: Identifier returned by ``make_cluster_uuid``
+
+    Returns:
+        Expansion zoom, or None if ``cluster_uuid`` is not a UUID
+    """
+    try:
+        return uuid.UUID(cluster_uuid).bytes[-1]
+    except ValueError:
+        return None
+
+
+def location_query_params(query_params):
+    """Return the query parameters that select which locations get clustered.
+
+    Parameters that only affect how the index is queried (see ``CLUSTER_QUERY_PARAMS``)
+    are removed, so they are neither used as location filters nor as cache keys.
+
+    Args:
+        query_params: Dict of query parameter lists (``request.args.to_dict(flat=False)``)
+
+    Returns:
+        Dict of query parameter lists
+    """
+    return {key: values for key, values in query_params.items() if key not in CLUSTER_QUERY_PARAMS}
+
+
+def make_filter_key(query_params):
+    """Build a hashable cache key from location query parameters.
+
+    The order of keys and values does not matter.
+
+    Args:
+        query_params: Dict of query parameter lists
+
+    Returns:
+        Tuple usable as a dictionary key
+    """
+    return tuple(sorted((key, tuple(sorted(values))) for key, values in query_params.items()))
+
+
+def parse_bbox(query_params):
+    """Read the requested viewport from query parameters.
+
+    The viewport is given either as ``bbox=west,south,east,north`` or as separate
+    ``north``, ``south``, ``east`` and ``west`` parameters. ``west`` may be greater
+    than ``east`` for viewports crossing the antimeridian.
+
+    Args:
+        query_params: Dict of query parameter lists
+
+    Returns:
+        Tuple (west, south, east, north) in degrees, or None if no viewport was requested
+
+    Raises:
+        ValueError: If the viewport is incomplete or out of range
+    """
+    if "bbox" in query_params:
+        values = query_params["bbox"][0].split(",")
+        if len(values) != 4:
+            raise ValueError("bbox must have four comma separated values")
+        west, south, east, north = (float(value) for value in values)
+    elif any(key in query_params for key in ("north", "south", "east", "west")):
+        try:
+            west, south, east, north = (
+                float(query_params[key][0]) for key in ("west", "south", "east", "north")
+            )
+        except KeyError as e:
+            raise ValueError(f"Missing viewport bound: {e.args[0]}") from e
+    else:
+        return None
+
+    if not (-90.0 <= south <= north <= 90.0):
+        raise ValueError("Viewport latitudes must satisfy -90 <= south <= north <= 90")
+    if not (-180.0 <= west <= 180.0 and -180.0 <= east <= 180.0):
+        raise ValueError("Viewport longitudes must be between -180 and 180")
+    return west, south, east, north
+
+
+def viewport_boxes(bbox, margin=BBOX_MARGIN):
+    """Widen a viewport by a margin and split it into boxes SuperCluster can query.
+
+    Args:
+        bbox: Tuple (west, south, east, north) as returned by ``parse_bbox``
+        margin: Fraction of the viewport size added on every side
+
+    Returns:
+        List of (top_left, bottom_right) pairs of (longitude, latitude) tuples.
+        Viewports crossing the antimeridian are split in two.
+    """
+    west, south, east, north = bbox
+    width = east - west if west <= east else east - west + 360.0
+    lat_margin = (north - south) * margin
+    lon_margin = width * margin
+    south = max(-90.0, south - lat_margin)
+    north = min(90.0, north + lat_margin)
+
+    if width + 2 * lon_margin >= 360.0:
+        return [((-180.0, north), (180.0, south))]
+
+    west = (west - lon_margin + 180.0) % 360.0 - 180.0
+    east = (east + lon_margin + 180.0) % 360.0 - 180.0
+    if west <= east:
+        return [((west, north), (east, south))]
+    return [((west, north), (180.0, south)), ((-180.0, north), (east, south))]
+
+
+def tile_bbox(z, x, y):
+    """Return the bounds of a slippy map tile.
+
+    The top and bottom rows are extended to the poles, so points beyond the
+    Web Mercator latitude limit still belong to a tile.
+
+    Args:
+        z: Tile zoom level
+        x: Tile column, 0 <= x < 2**z
+        y: Tile row, 0 <= y < 2**z
+
+    Returns:
+        Tuple (west, south, east, north) in degrees
+
+    Raises:
+        ValueError: If x or y is outside the tile grid for zoom z
+    """
+    tiles = 2**z
+    if not (0 <= x < tiles and 0 <= y < tiles):
+        raise ValueError(f"Tile {x}/{y} is outside the grid for zoom {z}")
+
+    def tile_latitude(row):
+        """Return the latitude of the top edge of a tile row."""
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / tiles))))
+
+    west = x / tiles * 360.0 - 180.0
+    east = (x + 1) / tiles * 360.0 - 180.0
+    north = 90.0 if y == 0 else tile_latitude(y)
+    south = -90.0 if y == tiles - 1 else tile_latitude(y + 1)
+    return west, south, east, north
+
+
+def _lng_x(lng):
+    """Project a longitude to a Web Mercator x in [0, 1]."""
+    return lng / 360.0 + 0.5
+
+
+def _lat_y(lat):
+    """Project a latitude to a Web Mercator y in [0, 1], clamped at the poles."""
+    sin = math.sin(math.radians(lat))
+    if sin >= 1.0:
+        return 0.0
+    if sin <= -1.0:
+        return 1.0
+    y = 0.5 - 0.25 * math.log((1 + sin) / (1 - sin)) / math.pi
+    return min(max(y, 0.0), 1.0)
+
+
+def _x_lng(x):
+    """Return the longitude of a Web Mercator x."""
+    return (x - 0.5) * 360.0
+
+
+def _y_lat(y):
+    """Return the latitude of a Web Mercator y."""
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+
+
+def _mercator_boxes(x, y, half_size):
+    """Return SuperCluster query boxes for a square around a Web Mercator point."""
+    if half_size >= 0.5:
+        return WORLD_BOXES
+    west = (_x_lng(x - half_size) + 180.0) % 360.0 - 180.0
+    east = (_x_lng(x + half_size) + 180.0) % 360.0 - 180.0
+    north = _y_lat(max(y - half_size, 0.0)) if y - half_size > 0.0 else 90.0
+    south = _y_lat(min(y + half_size, 1.0)) if y + half_size < 1.0 else -90.0
+    return viewport_boxes((west, south, east, north), margin=0)
+
+
+class ClusterIndex:
+    """SuperCluster index over a fixed set of points.
+
+    Built once per data version and filter set, then queried for every zoom level.
+
+    Attributes:
+        points: List of point dicts with 'position' and 'uuid' keys the index was built from
+    """
+
+    def __init__(self, points, min_zoom, max_zoom, radius, extent):
+        self.points = points
+        self._uuids = [point["uuid"] for point in points]
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.radius = radius
+        self.extent = extent
+        self._clusters_by_uuid = {}
+        self._registered_zooms = set()
+        # Guards the registry of served clusters, shared by concurrent requests
+        self._lock = threading.Lock()
+        # SuperCluster expects (longitude, latitude), positions are (latitude, longitude)
+        points_numpy = numpy.array(
+            [(point["position"][1], point["position"][0]) for point in points]
+        )
+        self._index = pysupercluster.SuperCluster(
+            points_numpy,
+            min_zoom=min_zoom,
+            max_zoom=max_zoom,
+            radius=radius,
+            extent=extent,
+        )
+
+    def get_clusters(self, zoom, bbox=None, margin=BBOX_MARGIN):
+        """Return clusters at the given zoom, with UUIDs of single points.
+
+        Args:
+            zoom: Zoom level to cluster at
+            bbox: Optional viewport (west, south, east, north); the whole map if None
+            margin: Fraction of the viewport size added on every side of ``bbox``
+
+        Returns:
+            List of cluster dicts as returned by ``match_clusters_uuids``
+        """
+        boxes = viewport_boxes(bbox, margin) if bbox else WORLD_BOXES
+        return self._get_clusters_in_boxes(zoom, boxes)
+
+    def _get_clusters_in_boxes(self, zoom, boxes):
+        """Return the clusters of a zoom level in the given boxes, with uuids assigned."""
+        clusters = []
+        for top_left, bottom_right in boxes:
+            clusters.extend(
+                self._index.getClusters(top_left=top_left, bottom_right=bottom_right, zoom=zoom)
+            )
+        clusters = match_clusters_uuids(self._uuids, clusters)
+        self._register_clusters(clusters)
+        return clusters
+
+    def _register_clusters(self, clusters):
+        """Remember multi-point clusters by uuid so find_cluster can look them up."""
+        with self._lock:
+            for cluster in clusters:
+                if cluster["count"] > 1:
+                    self._clusters_by_uuid.setdefault(make_cluster_uuid(cluster), cluster)
+
+    def find_cluster(self, cluster_uuid):
+        """Return the multi-point cluster with the given identifier.
+
+        Clusters are remembered as they are served. For an unknown identifier the
+        zoom level below its expansion zoom, the deepest one the cluster is shown
+        at, is clustered once, so clusters served by another process are found too.
+
+        Args:
+            cluster_uuid: Identifier returned by ``make_cluster_uuid``
+
+        Returns:
+            Cluster dict, or None if no cluster in this index has that identifier
+        """
+        with self._lock:
+            cluster = self._clusters_by_uuid.get(cluster_uuid)
+        if cluster is not None:
+            return cluster
+        expansion_zoom = cluster_uuid_zoom(cluster_uuid)
+        if expansion_zoom is None or not self.min_zoom < expansion_zoom <= self.max_zoom + 1:
+            return None
+        zoom = expansion_zoom - 1
+        with self._lock:
+            if zoom in self._registered_zooms:
+                return None
+            self._registered_zooms.add(zoom)
+        self._get_clusters_in_boxes(zoom, WORLD_BOXES)
+        with self._lock:
+            return self._clusters_by_uuid.get(cluster_uuid)
+
+    def expansion_zoom(self, cluster):
+        """Return the zoom a cluster expands at, capped at the index's ``max_zoom``."""
+        return min(cluster["expansion_zoom"], self.max_zoom)
+
+    def get_cluster_expansion(self, cluster):
+        """Return what the map shows around a cluster once zoomed to its expansion zoom.
+
+        SuperCluster does not expose its cluster tree, so the exact children cannot
+        be listed. Instead this returns every cluster and point at its expansion
+        zoom within the distance the cluster was merged from. That always includes
+        all of its children; neighbouring clusters close to its edge may be included
+        as well. Points too close to be split before ``max_zoom`` stay clustered.
+
+        Args:
+            cluster: Cluster dict as returned by ``get_clusters`` or ``find_cluster``
+
+        Returns:
+            List of cluster dicts at ``expansion_zoom(cluster)``
+        """
+        zoom = self.expansion_zoom(cluster)
+        parent_zoom = zoom - 1
+        # Children lie within the merge radius of the seed point, which itself lies
+        # within the merge radius of the cluster centre
+        half_size = 2 * self.radius / (self.extent * 2**parent_zoom)
+        x, y = _lng_x(cluster["longitude"]), _lat_y(cluster["latitude"])
+        return self._get_clusters_in_boxes(zoom, _mercator_boxes(x, y, half_size))
@@ -1,9 +1,36 @@
 """Core data filtering and sorting utilities for location queries."""
 
-from typing import Any, Dict, List
+import bisect
+import copy
+import functools
+import math
+from typing import Any, Dict, List, Mapping, Sequence, Type
+
+import numpy
+from pydantic import BaseModel
+from scipy.spatial import cKDTree  # pyright: ignore[reportAttributeAccessIssue]
+
+from goodmap.data_models.location import location_model_fingerprint
+from goodmap.versioned_cache import VersionedLRUCache
 
 # TODO move filtering to db site
 
+# Filtered sets larger than this are searched with the spatial index instead of a scan
+KNN_SCAN_MAX_ROWS = 10_000
+
+# Mean Earth radius used for great-circle distances
+EARTH_RADIUS_KM = 6371.0088
+
+# Maximum number of distinct filter combinations kept compiled by compile_requirements
+COMPILED_FILTER_CACHE_SIZE = 256
+
+# Maximum number of distinct queries whose results a LocationStore keeps cached
+QUERY_RESULT_CACHE_SIZE = 128
+
+# Query parameters besides category filters that change which locations a query
+# returns and in what order
+LOCATION_QUERY_PARAMS = ("lat", "lon", "radius_km", "limit")
+
 
 def does_fulfill_requirement(entry, requirements):
     """Check if an entry fulfills all category requirements.
@@ -15,16 +42,116 @@ def does_fulfill_requirement(entry, requirements):
     Returns:
         bool: True if entry matches all non-empty requirements
     """
-    matches = []
-    for category, values in requirements:
-        if not values:
-            continue
-        matches.append(all(entry_value in entry[category] for entry_value in values))
-    return all(matches)
+    return compile_requirements(requirements)(entry)
+
 
+def compile_requirements(requirements):
+    """Compile category requirements into a predicate over location entries.
 
-def sort_by_distance(data: List[Dict[str, Any]], query_params: Dict[str, List[str]]):
-    """Sort locations by distance from query coordinates.
+    Compiled predicates are cached by the normalized requirements, so repeated
+    filter combinations skip all of the setup.
+
+    Args:
+        requirements: List of (category, values) tuples to match
+
+    Returns:
+        Callable taking a location entry and returning True if it has all
+        required values of every non-empty requirement
+    """
+    return _compile_requirements(_normalize_requirements(requirements))
+
+
+def _normalize_requirements(requirements):
+    """Drop empty requirements and sort categories and values into a hashable key."""
+    return tuple(
+        sorted(
+            (category, tuple(sorted(set(values)))) for category, values in requirements if values
+        )
+    )
+
+
+@functools.lru_cache(maxsize=COMPILED_FILTER_CACHE_SIZE)
+def _compile_requirements(requirements: tuple[tuple[str, tuple[str, ...]], ...]):
+    """Build the predicate of normalized requirements; see compile_requirements."""
+    # Categories requiring more values are less likely to match, so check them first
+    checks = sorted(
+        ((category, frozenset(values)) for category, values in requirements),
+        key=lambda check: -len(check[1]),
+    )
+    if not checks:
+        return _match_all
+
+    def predicate(entry):
+        """Return whether a location has all required values in every category."""
+        for category, required in checks:
+            field = entry[category]
+            if isinstance(field, list):
+                try:
+                    if not required.issubset(field):
+                        return False
+                    continue
+                except TypeError:
+                    pass
+            if not all(value in field for value in required):
+                return False
+        return True
+
+    return predicate
+
+
+def _match_all(entry):
+    """Predicate of an empty set of requirements, matching every location."""
+    return True
+
+
+def canonical_query(query_params, categories):
+    """Return a hashable canonical form of the parts of a query that select locations.
+
+    Filters on ``categories`` and the parameters in LOCATION_QUERY_PARAMS are kept;
+    any other parameter (e.g. 'format' or 'with_distance') and empty filters are
+    dropped. Filter values are deduplicated and sorted and keys are sorted, so
+    queries that only differ in parameter order or repeated values give the same
+    key and select the same locations in the same order.
+
+    Args:
+        query_params: Query parameters, mapping names to lists of values
+        categories: Names of the parameters that are category filters
+
+    Returns:
+        Tuple of (name, values) tuples
+    """
+    items = list(
+        _normalize_requirements((category, query_params.get(category)) for category in categories)
+    )
+    for key in LOCATION_QUERY_PARAMS:
+        values = query_params.get(key)
+        if values and key not in categories:
+            items.append((key, (values[0],)))
+    return tuple(sorted(items))
+
+
+def haversine_km(positions, lat, lon):
+    """Compute great-circle distances from a point.
+
+    Args:
+        positions: Array-like of shape (N, 2) with (latitude, longitude) rows in degrees
+        lat: Latitude of the reference point in degrees
+        lon: Longitude of the reference point in degrees
+
+    Returns:
+        numpy.ndarray: Distances in kilometres
+    """
+    positions = numpy.radians(numpy.asarray(positions, dtype=numpy.float64).reshape(-1, 2))
+    lat, lon = numpy.radians(lat), numpy.radians(lon)
+    a = (
+        numpy.sin((positions[:, 0] - lat) / 2) ** 2
+        + numpy.cos(lat) * numpy.cos(positions[:, 0]) * numpy.sin((positions[:, 1] - lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+
+
+def sort_by_distance(data: List[Dict[str, Any]], query_params: Mapping[str, Sequence[str]]):
+    """Sort locations by great-circle distance from query coordinates.
 
     Args:
         data: List of location dictionaries
@@ -34,14 +161,94 @@ def sort_by_distance(data: List[Dict[str, Any]], query_params: Dict[str, List[st
         List[Dict[str, Any]]: Sorted data (or original if no coordinates provided)
     """
     try:
-        if "lat" in query_params and "lon" in query_params:
-            lat = float(query_params["lat"][0])
-            lon = float(query_params["lon"][0])
-            data.sort(key=lambda x: (x["position"][0] - lat) ** 2 + (x["position"][1] - lon) ** 2)
+        coordinates = query_coordinates(query_params)
+        if coordinates is not None and data:
+            distances = haversine_km([x["position"] for x in data], *coordinates)
+            data[:] = [data[i] for i in numpy.argsort(distances, kind="stable")]
             return data
         return data
-    except (ValueError, KeyError, IndexError):
+    except (ValueError, KeyError, IndexError, TypeError):
+        return data
+
+
+def within_radius(data: List[Dict[str, Any]], query_params: Mapping[str, Sequence[str]]):
+    """Keep locations within 'radius_km' kilometres of query coordinates.
+
+    Args:
+        data: List of location dictionaries
+        query_params: Query parameters containing 'lat', 'lon' and 'radius_km'
+
+    Returns:
+        List[Dict[str, Any]]: Filtered data (or original if no radius or coordinates provided)
+    """
+    try:
+        coordinates = query_coordinates(query_params)
+        radius = query_radius(query_params)
+        if coordinates is not None and radius is not None and data:
+            distances = haversine_km([x["position"] for x in data], *coordinates)
+            return [x for x, distance in zip(data, distances) if distance <= radius]
+        return data
+    except (ValueError, KeyError, IndexError, TypeError):
+        return data
+
+
+def query_coordinates(query_params):
+    """Read the reference point for distance sorting from query parameters.
+
+    Args:
+        query_params: Query parameters containing optional 'lat' and 'lon'
+
+    Returns:
+        Tuple (lat, lon), or None if no coordinates were provided
+
+    Raises:
+        ValueError: If the coordinates are not finite numbers
+    """
+    if "lat" in query_params and "lon" in query_params:
+        lat, lon = float(query_params["lat"][0]), float(query_params["lon"][0])
+        if not (math.isfinite(lat) and math.isfinite(lon)):
+            raise ValueError(f"Coordinates must be finite, got {lat}, {lon}")
+        return lat, lon
+    return None
+
+
+def add_distances(data: List[Dict[str, Any]], query_params: Dict[str, List[str]]):
+    """Add each location's great-circle distance from query coordinates.
+
+    Args:
+        data: List of location dictionaries with 'position'
+        query_params: Query parameters containing 'lat' and 'lon'
+
+    Returns:
+        List[Dict[str, Any]]: The same dicts with 'distance_km' set, rounded to metres
+        (or original data if no valid coordinates provided)
+    """
+    try:
+        coordinates = query_coordinates(query_params)
+    except ValueError:
         return data
+    if coordinates is None or not data:
+        return data
+    distances = haversine_km([x["position"] for x in data], *coordinates)
+    for entry, distance in zip(data, distances):
+        entry["distance_km"] = round(float(distance), 3)
+    return data
+
+
+def query_radius(query_params):
+    """Read the 'radius_km' search radius from query parameters.
+
+    Args:
+        query_params: Query parameters containing optional 'radius_km'
+
+    Returns:
+        Non-negative radius in kilometres, or None if not provided or invalid
+    """
+    try:
+        radius = float(query_params["radius_km"][0])
+    except (ValueError, KeyError, IndexError):
+        return None
+    return radius if radius >= 0 else None
 
 
 def limit(data, query_params):
@@ -67,6 +274,10 @@ def limit(data, query_params):
 def get_queried_data(all_data, categories, query_params):
     """Filter, sort, and limit location data based on query parameters.
 
+    Locations are filtered by category and by 'radius_km' around 'lat'/'lon',
+    then sorted by distance from 'lat'/'lon' and cut to 'limit'. Other query
+    parameters are ignored.
+
     Args:
         all_data: Complete list of location data
         categories: Available categories for filtering
@@ -75,11 +286,440 @@ def get_queried_data(all_data, categories, query_params):
     Returns:
         Filtered, sorted, and limited location data
     """
-    requirements = []
-    for key in categories.keys():
-        requirements.append((key, query_params.get(key)))
-
-    filtered_data = [x for x in all_data if does_fulfill_requirement(x, requirements)]
+    query_params = dict(canonical_query(query_params, categories))
+    predicate = _compile_requirements(
+        tuple((key, values) for key, values in query_params.items() if key in categories)
+    )
+    filtered_data = [x for x in all_data if predicate(x)]
+    filtered_data = within_radius(filtered_data, query_params)
     final_data = sort_by_distance(filtered_data, query_params)
     final_data = limit(final_data, query_params)
     return final_data
+
+
+class LocationStore:
+    """Columnar view of location data with an inverted index over category options.
+
+    Built once per data load. Positions are kept as a float64 array. Each category
+    option has a sorted array of the rows that have it, so a filter intersects a
+    few small arrays, smallest first, instead of scanning every location. A UUID to
+    row index answers single-location lookups.
+    ``query`` returns the same results as ``get_queried_data``; the rows it selects
+    are cached per canonical query.
+
+    A store is never changed once built, so it can be read by any number of
+    threads while locations are written. ``add``, ``update`` and ``delete`` return
+    a new store for the changed location list, reusing the unchanged parts of this
+    one; writers then swap the reference to it.
+
+    Attributes:
+        data: List of location dicts the store indexes; it must not be modified in
+              place, a changed list gets a new store
+        categories: Available categories for filtering
+        validated_for: Fingerprint of the location model ``data`` was already
+                       validated against (a pre-validated snapshot), or None
+        positions: Array of shape (N, 2) with (latitude, longitude) rows, or None
+                   if some location has no usable position
+    """
+
+    def __init__(self, data, categories, validated_for=None):
+        self.data = data
+        self.categories = categories
+        self.validated_for = validated_for
+        try:
+            self.positions = numpy.array(
+                [entry["position"] for entry in data], dtype=numpy.float64
+            ).reshape(len(data), 2)
+        except (ValueError, TypeError, KeyError):
+            self.positions = None
+        self._tree = None
+        self._rows_by_uuid = _index_uuids(data)
+        # id(entry) -> (entry, location model, validated instance); holding the entry
+        # keeps its id from being reused while the instance is cached
+        self._models: Dict[int, tuple[Dict[str, Any], Type[BaseModel], BaseModel]] = {}
+        self._results: VersionedLRUCache[tuple[Any, ...], numpy.ndarray] = VersionedLRUCache(
+            max_entries=QUERY_RESULT_CACHE_SIZE
+        )
+
+        postings: Dict[str, Dict[str, List[int]]] = {category: {} for category in categories}
+        # Locations whose category value is not a list of strings (or is missing) are
+        # checked one by one, exactly like does_fulfill_requirement does
+        self._irregular: Dict[str, List[int]] = {category: [] for category in categories}
+        for row, entry in enumerate(data):
+            for category in categories:
+                options = _category_options(entry, category)
+                if options is None:
+                    self._irregular[category].append(row)
+                    continue
+                for option in options:
+                    postings[category].setdefault(option, []).append(row)
+        self._postings: Dict[str, Dict[str, numpy.ndarray]] = {
+            category: {
+                option: numpy.array(rows, dtype=numpy.intp) for option, rows in options.items()
+            }
+            for category, options in postings.items()
+        }
+
+    def __len__(self):
+        return len(self.data)
+
+    def find(self, uuid):
+        """Return the row of the first location with the given UUID, or None."""
+        return self._rows_by_uuid.get(uuid)
+
+    def model(self, entry, location_model):
+        """Return a location dict of ``data`` validated as ``location_model``.
+
+        Every entry is validated once and the instance is reused by later reads, so
+        validation cost follows writes rather than requests. Callers must treat the
+        returned instance as read-only. Entries of a snapshot validated against the
+        same model (see ``validated_for``) are trusted and not validated at all.
+
+        Args:
+            entry: Location dict taken from ``data``
+            location_model: Pydantic model class to validate the location with
+
+        Returns:
+            Validated location model instance
+        """
+        cached = self._models.get(id(entry))
+        if cached is not None and cached[1] is location_model:
+            return cached[2]
+        if self.validated_for is not None and self.validated_for == location_model_fingerprint(
+            location_model
+        ):
+            model = location_model.model_construct(
+                **{**entry, "position": tuple(entry["position"])}
+            )
+        else:
+            model = location_model.model_validate(entry)
+        self._models[id(entry)] = (entry, location_model, model)
+        return model
+
+    def _option_rows(self, category, value):
+        """Return the sorted rows of locations having an option in a category."""
+        rows = self._postings[category].get(value, _NO_ROWS)
+        irregular = [i for i in self._irregular[category] if value in self.data[i][category]]
+        if irregular:
+            rows = numpy.union1d(rows, irregular)
+        return rows
+
+    def filter_indices(self, query_params):
+        """Return the indices of locations matching the category filters.
+
+        Args:
+            query_params: Query parameters for filtering
+
+        Returns:
+            Sorted array of indices into ``data``
+        """
+        postings = [
+            self._option_rows(category, value)
+            for category in self.categories
+            for value in query_params.get(category) or []
+        ]
+        if not postings:
+            return numpy.arange(len(self.data))
+        postings.sort(key=len)
+        rows = postings[0]
+        for posting in postings[1:]:
+            if not len(rows):
+                break
+            rows = numpy.intersect1d(rows, posting, assume_unique=True)
+        return rows
+
+    def query(self, query_params):
+        """Filter, sort, and limit location data based on query parameters.
+
+        Args:
+            query_params: Query parameters for filtering, sorting, and limiting
+
+        Returns:
+            Filtered, sorted, and limited location data
+        """
+        key = canonical_query(query_params, self.categories)
+        rows = self._results.get(id(self.data), key)
+        if rows is None:
+            rows = self._query_rows(query_params)
+            self._results.put(id(self.data), key, rows)
+        return [self.data[i] for i in rows]
+
+    def _query_rows(self, query_params):
+        """Return the rows of locations matching a query, in the order they are returned."""
+        indices = self.filter_indices(query_params)
+        try:
+            coordinates = query_coordinates(query_params)
+        except ValueError:
+            coordinates = None
+        if coordinates is not None and self.positions is not None:
+            radius = query_radius(query_params)
+            if radius is not None:
+                indices = self.within(indices, coordinates, radius)
+            count = _query_limit(query_params)
+            if count is not None and 0 <= count < len(indices):
+                return numpy.asarray(self.nearest(indices, coordinates, count), dtype=numpy.intp)
+            indices = indices[numpy.argsort(self._distances(indices, coordinates), kind="stable")]
+            return limit(indices, query_params)
+        rows_by_id = {id(self.data[i]): i for i in indices}
+        filtered_data = within_radius([self.data[i] for i in indices], query_params)
+        filtered_data = sort_by_distance(filtered_data, query_params)
+        filtered_data = limit(filtered_data, query_params)
+        return numpy.array([rows_by_id[id(entry)] for entry in filtered_data], dtype=numpy.intp)
+
+    def _distances(self, rows, coordinates):
+        """Return the distances in km from coordinates to the locations in rows."""
+        if self.positions is None:
+            raise ValueError("Distances need valid positions for all locations")
+        return haversine_km(self.positions[rows], *coordinates)
+
+    def _spatial_index(self):
+        """Return the k-d tree of location unit vectors, built on first use."""
+        if self._tree is None:
+            self._tree = cKDTree(_unit_vectors(self.positions))
+        return self._tree
+
+    def _closest(self, rows, coordinates, count):
+        """Return the ``count`` rows closest to coordinates, ties broken by row order."""
+        distances = self._distances(rows, coordinates)
+        if count < len(rows):
+            kth = numpy.partition(distances, count - 1)[count - 1]
+            selected = numpy.flatnonzero(distances <= kth)
+            rows, distances = rows[selected], distances[selected]
+        return rows[numpy.lexsort((rows, distances))][:count]
+
+    def within(self, indices, coordinates, radius):
+        """Return the rows within a great-circle radius of coordinates.
+
+        Args:
+            indices: Sorted array of candidate rows, as returned by ``filter_indices``
+            coordinates: Tuple (lat, lon) to measure distance from
+            radius: Radius in kilometres
+
+        Returns:
+            Sorted array of the candidate rows at most ``radius`` kilometres away
+        """
+        if len(indices) > KNN_SCAN_MAX_ROWS:
+            rows = self._spatial_index().query_ball_point(
+                _unit_vectors([coordinates])[0],
+                _widen(_chord_length(radius)),
+                return_sorted=True,
+            )
+            indices = numpy.intersect1d(
+                numpy.array(rows, dtype=numpy.intp), indices, assume_unique=True
+            )
+        return indices[self._distances(indices, coordinates) <= radius]
+
+    def nearest(self, indices, coordinates, count):
+        """Return the rows nearest to coordinates among the given rows.
+
+        Uses the same distance and tie order as ``sort_by_distance``. Small row sets
+        are scanned with a partial selection; large ones are answered by a k-NN
+        query on a KD-tree over the positions as 3D unit vectors, where straight-line
+        distance grows with great-circle distance. The tree is built on first use.
+
+        Args:
+            indices: Sorted array of candidate rows, as returned by ``filter_indices``
+            coordinates: Tuple (lat, lon) to measure distance from
+            count: Number of rows to return
+
+        Returns:
+            Array of at most ``count`` rows, nearest first
+        """
+        if count <= 0 or not len(indices):
+            return indices[:0]
+        if len(indices) <= KNN_SCAN_MAX_ROWS:
+            return self._closest(indices, coordinates, count)
+
+        tree = self._spatial_index()
+        point = _unit_vectors([coordinates])[0]
+        total = len(self.data)
+        matching = None
+        if len(indices) < total:
+            matching = numpy.zeros(total, dtype=bool)
+            matching[indices] = True
+
+        k = count
+        while True:
+            k = min(k * 2, total)
+            distances, rows = tree.query(point, k=k)
+            if matching is not None:
+                distances = distances[matching[rows]]
+            if len(distances) >= count or k == total:
+                break
+        if len(distances) < count:
+            return self._closest(indices, coordinates, count)
+        # Widen to everything within the count-th distance, so ties are resolved in
+        # row order exactly like a full sort would
+        rows = numpy.array(
+            tree.query_ball_point(point, _widen(distances[count - 1])), dtype=numpy.intp
+        )
+        if matching is not None:
+            rows = rows[matching[rows]]
+        return self._closest(rows, coordinates, count)
+
+    def _index_row(self, row, entry):
+        """Add a location's row to the posting lists of its options."""
+        for category in self.categories:
+            options = _category_options(entry, category)
+            if options is None:
+                bisect.insort(self._irregular[category], row)
+                continue
+            category_postings = self._postings[category]
+            for option in options:
+                rows = category_postings.get(option, _NO_ROWS)
+                category_postings[option] = numpy.insert(rows, numpy.searchsorted(rows, row), row)
+
+    def _unindex_row(self, row, entry):
+        """Remove a location's row from the posting lists of its options."""
+        for category in self.categories:
+            options = _category_options(entry, category)
+            if options is None:
+                self._irregular[category].remove(row)
+                continue
+            category_postings = self._postings[category]
+            for option in options:
+                rows = category_postings[option]
+                rows = rows[rows != row]
+                if len(rows):
+                    category_postings[option] = rows
+                else:
+                    del category_postings[option]
+
+    def _derive(self, data):
+        """Return a copy of this store for ``data`` whose indexes can be changed.
+
+        Posting arrays are shared, as they are only ever replaced, never modified.
+        """
+        store = copy.copy(self)
+        store.data = data
+        store._tree = None
+        store._postings = {category: dict(options) for category, options in self._postings.items()}
+        store._irregular = {category: list(rows) for category, rows in self._irregular.items()}
+        store._results = VersionedLRUCache(max_entries=QUERY_RESULT_CACHE_SIZE)
+        return store
+
+    def _set_position(self, row, entry):
+        """Store a location's position, dropping the array if it is not usable."""
+        if self.positions is None:
+            return
+        try:
+            self.positions[row] = entry["position"]
+        except (ValueError, TypeError, KeyError):
+            self.positions = None
+
+    def add(self, data):
+        """Return a store for this store's data with one location appended.
+
+        Args:
+            data: New location list, ``data`` of this store plus the appended location
+
+        Returns:
+            LocationStore for ``data``
+        """
+        store = self._derive(data)
+        row = len(data) - 1
+        entry = data[row]
+        if store.positions is not None:
+            store.positions = numpy.append(store.positions, numpy.zeros((1, 2)), axis=0)
+        store._set_position(row, entry)
+        store._index_row(row, entry)
+        if entry.get("uuid") is not None and entry["uuid"] not in store._rows_by_uuid:
+            store._rows_by_uuid = {**store._rows_by_uuid, entry["uuid"]: row}
+        return store
+
+    def update(self, data, row):
+        """Return a store for this store's data with the location at ``row`` replaced.
+
+        Args:
+            data: New location list, ``data`` of this store with ``row`` replaced
+            row: Index of the replaced location
+
+        Returns:
+            LocationStore for ``data``
+        """
+        old_entry = self.data[row]
+        store = self._derive(data)
+        self._models.pop(id(old_entry), None)
+        store._unindex_row(row, old_entry)
+        if store.positions is not None:
+            store.positions = store.positions.copy()
+        store._set_position(row, data[row])
+        store._index_row(row, data[row])
+        if old_entry.get("uuid") != data[row].get("uuid"):
+            store._rows_by_uuid = _index_uuids(data)
+        return store
+
+    def delete(self, data, row):
+        """Return a store for this store's data with the location at ``row`` removed.
+
+        Args:
+            data: New location list, ``data`` of this store without ``row``
+            row: Index the location had in this store's data
+
+        Returns:
+            LocationStore for ``data``
+        """
+        old_entry = self.data[row]
+        store = self._derive(data)
+        self._models.pop(id(old_entry), None)
+        store._unindex_row(row, old_entry)
+        if store.positions is not None:
+            store.positions = numpy.delete(store.positions, row, axis=0)
+        for category_postings in store._postings.values():
+            for option, rows in category_postings.items():
+                category_postings[option] = rows - (rows > row)
+        for category, irregular in store._irregular.items():
+            store._irregular[category] = [i - 1 if i > row else i for i in irregular]
+        store._rows_by_uuid = _index_uuids(data)
+        return store
+
+
+_NO_ROWS = numpy.array([], dtype=numpy.intp)
+
+
+def _index_uuids(data):
+    """Map each UUID to the row of its first location."""
+    rows_by_uuid = {}
+    for row, entry in enumerate(data):
+        rows_by_uuid.setdefault(entry.get("uuid"), row)
+    rows_by_uuid.pop(None, None)
+    return rows_by_uuid
+
+
+def _unit_vectors(positions):
+    """Convert (latitude, longitude) rows in degrees to points on the unit sphere."""
+    positions = numpy.radians(numpy.asarray(positions, dtype=numpy.float64).reshape(-1, 2))
+    cos_lat = numpy.cos(positions[:, 0])
+    return numpy.column_stack(
+        (
+            cos_lat * numpy.cos(positions[:, 1]),
+            cos_lat * numpy.sin(positions[:, 1]),
+            numpy.sin(positions[:, 0]),
+        )
+    )
+
+
+def _chord_length(distance_km):
+    """Straight-line distance between unit sphere points a great-circle distance apart."""
+    return 2 * numpy.sin(min(distance_km / EARTH_RADIUS_KM, numpy.pi) / 2)
+
+
+def _widen(radius):
+    """Pad a search radius so rounding errors cannot exclude points on its edge."""
+    return radius * (1 + 1e-9) + 1e-12
+
+
+def _query_limit(query_params):
+    """Return the 'limit' query parameter as int, or None if missing or invalid."""
+    try:
+        return int(query_params["limit"][0])
+    except (ValueError, KeyError, IndexError):
+        return None
+
+
+def _category_options(entry, category):
+    """Return the distinct options of a location in a category, or None if irregular."""
+    values = entry.get(category)
+    if not isinstance(values, (list, tuple)) or not all(isinstance(v, str) for v in values):
+        return None
+    return set(values)
@@ -1,12 +1,14 @@
+import functools
+import hashlib
 import importlib.metadata
 import logging
 import uuid
+from itertools import islice
+from typing import Any
 
 import deprecation
-import numpy
-import pysupercluster
-from flask import Blueprint, jsonify, make_response, request
-from flask_babel import gettext
+from flask import Blueprint, current_app, jsonify, make_response, request
+from flask_babel import get_locale, gettext
 from platzky import FeatureFlagSet
 from platzky.attachment import AttachmentProtocol
 from platzky.config import AttachmentConfig, LanguagesMapping
@@ -21,9 +23,17 @@ from goodmap.api_models import (
     VersionResponse,
 )
 from goodmap.clustering import (
+    CLUSTER_INDEX_CACHE_SIZE,
+    TILE_CACHE_MAX_BYTES,
+    ClusterIndex,
+    location_query_params,
+    make_filter_key,
     map_clustering_data_to_proper_lazy_loading_object,
-    match_clusters_uuids,
+    parse_bbox,
+    tile_bbox,
 )
+from goodmap.core import add_distances
+from goodmap.db import BASIC_INFO_PROJECTION
 from goodmap.exceptions import LocationValidationError
 from goodmap.feature_flags import CategoriesHelp
 from goodmap.formatter import prepare_pin
@@ -33,6 +43,7 @@ from goodmap.json_security import (
     JSONSizeError,
     safe_json_loads,
 )
+from goodmap.versioned_cache import VersionedLRUCache
 
 # SuperCluster configuration constants
 MIN_ZOOM = 0
@@ -40,6 +51,20 @@ MAX_ZOOM = 16
 CLUSTER_RADIUS = 200
 CLUSTER_EXTENT = 512
 
+# Cluster tile configuration constants
+TILE_WARM_MAX_ZOOM = 2
+TILE_MAX_AGE = 60
+
+# Maximum number of category responses (path and language pairs) kept cached
+RESPONSE_CACHE_MAX_ENTRIES = 256
+
+# Number of locations encoded per chunk of a streamed /locations response
+LOCATIONS_BATCH_SIZE = 1000
+
+# Response formats of /locations
+LOCATIONS_FORMAT_LIST = "list"
+LOCATIONS_FORMAT_COLUMNAR = "columnar"
+
 # Report description validation constants
 MAX_DESCRIPTION_LENGTH = 500
 
@@ -47,6 +72,7 @@ MAX_DESCRIPTION_LENGTH = 500
 ERROR_INVALID_REQUEST_DATA = "Invalid request data"
 ERROR_INVALID_LOCATION_DATA = "Invalid location data"
 ERROR_LOCATION_NOT_FOUND = "Location not found"
+ERROR_CLUSTER_NOT_FOUND = "Cluster not found"
 ERROR_INVALID_DESCRIPTION = "Invalid report description"
 
 logger = logging.getLogger(__name__)
@@ -76,20 +102,90 @@ def get_or_none(data, *keys):
     return data
 
 
-def get_locations_from_request(database, request_args):
+def basic_info(location):
+    """Return the basic info of a location projected to BASIC_INFO_PROJECTION.
+
+    Same result as LocationBase.basic_info, without building a model.
     """
-    Shared helper to fetch locations from database based on request arguments.
+    return {
+        "uuid": location["uuid"],
+        "position": location["position"],
+        "remark": bool(location.get("remark")),
+    }
+
+
+def location_batches(locations, query_params, batch_size=LOCATIONS_BATCH_SIZE):
+    """Yield locations as lists of basic_info dicts, ``batch_size`` at a time.
+
+    Only one batch of dicts exists at a time, so callers can stream them out.
 
     Args:
-        database: Database instance
-        request_args: Request arguments (flask.request.args)
+        locations: Iterable of location dicts projected to BASIC_INFO_PROJECTION
+        query_params: Query parameters of the request; 'with_distance=true' adds
+            'distance_km' to every dict
+        batch_size: Number of locations per batch
+    """
+    with_distance = query_params.get("with_distance") == ["true"]
+    iterator = iter(locations)
+    while batch := [basic_info(x) for x in islice(iterator, batch_size)]:
+        if with_distance:
+            add_distances(batch, query_params)
+        yield batch
+
+
+def columnar_locations(batches):
+    """Collect batches of basic_info dicts into parallel arrays.
+
+    Key names are not repeated for every location, which makes the payload a
+    fraction of the size of the list of dicts.
+
+    Args:
+        batches: Iterable of lists of basic_info dicts, as yielded by location_batches
 
     Returns:
-        List of locations as basic_info dicts
+        Dict with 'uuid', 'lat', 'lon' and 'remark' lists (and 'distance_km' if the
+        dicts have it), where index i of every list describes the same location
+    """
+    columns = {"uuid": [], "lat": [], "lon": [], "remark": []}
+    for batch in batches:
+        if batch and "distance_km" in batch[0]:
+            columns.setdefault("distance_km", [])
+        for location in batch:
+            columns["uuid"].append(location["uuid"])
+            columns["lat"].append(location["position"][0])
+            columns["lon"].append(location["position"][1])
+            columns["remark"].append(location["remark"])
+            if "distance_km" in columns:
+                columns["distance_km"].append(location["distance_km"])
+    return columns
+
+
+def stream_json_array(batches, dumps):
+    """Yield the JSON encoding of a list, given as batches of its items, in chunks.
+
+    The output is the same as encoding the whole list at once with ``jsonify``.
+
+    Args:
+        batches: Iterable of lists of JSON-serializable items
+        dumps: JSON encoder, e.g. ``current_app.json.dumps``
+    """
+    yield "["
+    separator = ""
+    for batch in batches:
+        if batch:
+            yield separator + dumps(batch, separators=(",", ":"))[1:-1]
+            separator = ","
+    yield "]\n"
+
+
+def request_etag(*parts):
+    """Return an entity tag for the current request.
+
+    The tag covers the request path, its query arguments (in any order), the
+    selected locale and the given ``parts``, such as the data version.
     """
-    query_params = request_args.to_dict(flat=False)
-    all_locations = database.get_locations(query_params)
-    return [x.basic_info() for x in all_locations]
+    key = (parts, request.path, sorted(request.args.items(multi=True)), str(get_locale()))
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
 
 
 def core_pages(
@@ -125,6 +221,139 @@ def core_pages(
         naming_strategy=_clean_model_name,  # Use clean model names without hash
     )
 
+    # Anything besides the data that changes responses without changing their URL
+    try:
+        backend_version = importlib.metadata.version("goodmap")
+    except importlib.metadata.PackageNotFoundError:
+        backend_version = None
+    etag_salt = (backend_version, CategoriesHelp in feature_flags, sorted(field_renderers.items()))
+
+    def data_version():
+        """Return the version of the locations shared by all workers."""
+        return database.get_shared_data_version()
+
+    def config_version():
+        """Return the version of the map config."""
+        return database.get_config_version()
+
+    def data_and_config_version():
+        """Return the data and config versions, or None if either is unknown."""
+        versions = (data_version(), config_version())
+        return None if None in versions else versions
+
+    def conditional_on(get_version):
+        """Give responses of a read-only view an ETag derived from a version.
+
+        A request whose If-None-Match matches is answered with 304 Not Modified
+        without calling the view. Nothing is done when the version is unknown.
+
+        Args:
+            get_version: Returns the version of what the responses are built from.
+        """
+
+        def decorator(view):
+            """Wrap a view to answer conditional requests."""
+
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                """Answer 304 for a matching ETag, else call the view and set its ETag."""
+                version = get_version()
+                if version is None:
+                    return view(*args, **kwargs)
+                etag = request_etag(etag_salt, version)
+                if request.if_none_match.contains_weak(etag):
+                    response = make_response("", 304)
+                    response.set_etag(etag)
+                    return response
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    response.set_etag(etag)
+                return response
+
+            return wrapper
+
+        return decorator
+
+    # Category responses only depend on the map config and the language
+    category_response_cache: VersionedLRUCache[tuple[str, str], bytes] = VersionedLRUCache(
+        max_entries=RESPONSE_CACHE_MAX_ENTRIES
+    )
+
+    def cached_per_language(view):
+        """Cache successful responses of a view by config version, path and locale.
+
+        Only for views whose response does not depend on query arguments.
+        """
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            """Return the cached body, or call the view and cache a successful response."""
+            version = database.get_config_version()
+            key = (request.path, str(get_locale()))
+            body = category_response_cache.get(version, key)
+            if body is not None:
+                return current_app.response_class(body, mimetype="application/json")
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                category_response_cache.put(version, key, response.get_data())
+            return response
+
+        return wrapper
+
+    # Cluster indexes survive between requests and are rebuilt only when locations change
+    cluster_index_cache: VersionedLRUCache[tuple[Any, ...], ClusterIndex | None] = (
+        VersionedLRUCache(max_entries=CLUSTER_INDEX_CACHE_SIZE)
+    )
+
+    def build_cluster_index(location_query):
+        """Build the cluster index of the locations matching a query, or None if none match."""
+        points = [
+            basic_info(x)
+            for x in database.get_locations(location_query, projection=BASIC_INFO_PROJECTION)
+        ]
+        if not points:
+            return None
+        return ClusterIndex(
+            points,
+            min_zoom=MIN_ZOOM,
+            max_zoom=MAX_ZOOM,
+            radius=CLUSTER_RADIUS,
+            extent=CLUSTER_EXTENT,
+        )
+
+    # Serialized tiles, so repeated tile requests do no clustering work at all
+    cluster_tile_cache: VersionedLRUCache[tuple[Any, ...], bytes] = VersionedLRUCache(
+        max_size=TILE_CACHE_MAX_BYTES, sizeof=len
+    )
+
+    def render_cluster_tile(location_query, z, x, y):
+        """Return the serialized clusters of one tile, from the tile cache if possible."""
+        bbox = tile_bbox(z, x, y)
+        version = database.get_data_version()
+        filter_key = make_filter_key(location_query)
+        tile_key = (filter_key, z, x, y)
+        body = cluster_tile_cache.get(version, tile_key)
+        if body is not None:
+            return body
+
+        index = cluster_index_cache.get_or_build(
+            version, filter_key, lambda: build_cluster_index(location_query)
+        )
+        # Tiles partition the map, so no margin: every cluster belongs to one tile
+        clusters = index.get_clusters(z, bbox, margin=0) if index else []
+        # Encoded like jsonify, so tiles and /locations-clustered give the same bytes
+        tile = map_clustering_data_to_proper_lazy_loading_object(clusters)
+        body = f"{current_app.json.dumps(tile, separators=(',', ':'))}\n".encode()
+        cluster_tile_cache.put(version, tile_key, body)
+        return body
+
+    def warm_cluster_tiles():
+        """Render the unfiltered tiles of the lowest zoom levels into the tile cache."""
+        for z in range(MIN_ZOOM, min(TILE_WARM_MAX_ZOOM, MAX_ZOOM) + 1):
+            for x in range(2**z):
+                for y in range(2**z):
+                    render_cluster_tile({}, z, x, y)
+
     @core_api_blueprint.route("/suggest-new-point", methods=["POST"])
     @spec.validate(resp=Response(HTTP_200=SuccessResponse, HTTP_400=ErrorResponse))
     def suggest_new_point():
@@ -298,23 +527,48 @@ def core_pages(
         return make_response(jsonify({"message": gettext("Location reported")}), 200)
 
     @core_api_blueprint.route("/locations", methods=["GET"])
-    @spec.validate()
+    @conditional_on(data_version)
+    @spec.validate(resp=Response(HTTP_400=ErrorResponse))
     def get_locations():
         """Get list of locations with basic info.
 
         Returns locations filtered by query parameters,
-        showing only uuid, position, and remark flag.
+        showing only uuid, position, and remark flag. With 'lat' and 'lon'
+        locations are ordered by great-circle distance; 'radius_km' drops those
+        further away and 'with_distance=true' adds each one's 'distance_km'.
+        The JSON array is streamed, encoded a batch of locations at a time.
+        With 'format=columnar' an object of parallel 'uuid', 'lat', 'lon' and
+        'remark' (and 'distance_km') arrays is returned instead.
         """
-        locations = get_locations_from_request(database, request.args)
-        return jsonify(locations)
+        query_params = request.args.to_dict(flat=False)
+        response_format = query_params.get("format", [LOCATIONS_FORMAT_LIST])[0]
+        if response_format not in (LOCATIONS_FORMAT_LIST, LOCATIONS_FORMAT_COLUMNAR):
+            return make_response(
+                jsonify(
+                    {
+                        "message": f"Format must be {LOCATIONS_FORMAT_LIST} "
+                        f"or {LOCATIONS_FORMAT_COLUMNAR}"
+                    }
+                ),
+                400,
+            )
+        all_locations = database.get_locations(query_params, projection=BASIC_INFO_PROJECTION)
+        batches = location_batches(all_locations, query_params)
+        if response_format == LOCATIONS_FORMAT_COLUMNAR:
+            return jsonify(columnar_locations(batches))
+        body = stream_json_array(batches, current_app.json.dumps)
+        return current_app.response_class(body, mimetype="application/json")
 
     @core_api_blueprint.route("/locations-clustered", methods=["GET"])
+    @conditional_on(data_version)
     @spec.validate(resp=Response(HTTP_400=ErrorResponse))
     def get_locations_clustered():
         """Get clustered locations for map display.
 
         Returns locations grouped into clusters based on zoom level,
-        optimized for rendering on interactive maps.
+        optimized for rendering on interactive maps. When a viewport is given
+        (``bbox=west,south,east,north`` or ``north``/``south``/``east``/``west``),
+        only clusters inside it, plus a small margin, are returned.
         """
         try:
             query_params = request.args.to_dict(flat=False)
@@ -326,30 +580,18 @@ def core_pages(
                     jsonify({"message": f"Zoom must be between {MIN_ZOOM} and {MAX_ZOOM}"}),
                     400,
                 )
+            bbox = parse_bbox(query_params)
 
-            points = get_locations_from_request(database, request.args)
-            if not points:
-                return jsonify([])
-
-            points_numpy = numpy.array(
-                [(point["position"][0], point["position"][1]) for point in points]
+            location_query = location_query_params(query_params)
+            index = cluster_index_cache.get_or_build(
+                database.get_data_version(),
+                make_filter_key(location_query),
+                lambda: build_cluster_index(location_query),
             )
+            if index is None:
+                return jsonify([])
 
-            index = pysupercluster.SuperCluster(
-                points_numpy,
-                min_zoom=MIN_ZOOM,
-                max_zoom=MAX_ZOOM,
-                radius=CLUSTER_RADIUS,
-                extent=CLUSTER_EXTENT,
-            )
-
-            clusters = index.getClusters(
-                top_left=(-180.0, 90.0),
-                bottom_right=(180.0, -90.0),
-                zoom=zoom,
-            )
-            clusters = match_clusters_uuids(points, clusters)
-
+            clusters = index.get_clusters(zoom, bbox)
             return jsonify(map_clustering_data_to_proper_lazy_loading_object(clusters))
         except ValueError as e:
             logger.warning("Invalid parameter in clustering request: %s", e)
@@ -358,7 +600,74 @@ def core_pages(
             logger.exception("Clustering operation failed: %s", e)
             return make_response(jsonify({"message": "An error occurred during clustering"}), 500)
 
+    @core_api_blueprint.route("/locations-clustered/<int:z>/<int:x>/<int:y>", methods=["GET"])
+    @conditional_on(data_version)
+    @spec.validate(resp=Response(HTTP_400=ErrorResponse))
+    def get_locations_clustered_tile(z, x, y):
+        """Get clustered locations for a single slippy map tile.
+
+        Returns the clusters whose centre lies in tile z/x/y, filtered by the
+        same query parameters as /locations-clustered. Tiles are cached on the
+        server and may be cached by browsers and CDNs.
+        """
+        try:
+            if not MIN_ZOOM <= z <= MAX_ZOOM:
+                return make_response(
+                    jsonify({"message": f"Zoom must be between {MIN_ZOOM} and {MAX_ZOOM}"}),
+                    400,
+                )
+            location_query = location_query_params(request.args.to_dict(flat=False))
+            body = render_cluster_tile(location_query, z, x, y)
+        except ValueError as e:
+            logger.warning("Invalid parameter in cluster tile request: %s", e)
+            return make_response(jsonify({"message": "Invalid parameters provided"}), 400)
+        except Exception as e:
+            logger.exception("Cluster tile rendering failed: %s", e)
+            return make_response(jsonify({"message": "An error occurred during clustering"}), 500)
+
+        response = current_app.response_class(body, mimetype="application/json")
+        response.cache_control.public = True
+        response.cache_control.max_age = TILE_MAX_AGE
+        return response
+
+    @core_api_blueprint.route("/locations-clustered/cluster/<cluster_uuid>", methods=["GET"])
+    @conditional_on(data_version)
+    @spec.validate(resp=Response(HTTP_400=ErrorResponse, HTTP_404=ErrorResponse))
+    def get_cluster_expansion(cluster_uuid):
+        """Get the clusters and points a cluster expands into.
+
+        Takes a cluster_uuid from /locations-clustered and the same filter query
+        parameters, and returns the clusters shown around it at the zoom level
+        where it splits, so the map can zoom into it without re-clustering.
+        """
+        try:
+            location_query = location_query_params(request.args.to_dict(flat=False))
+            index = cluster_index_cache.get_or_build(
+                database.get_data_version(),
+                make_filter_key(location_query),
+                lambda: build_cluster_index(location_query),
+            )
+            cluster = index.find_cluster(cluster_uuid) if index is not None else None
+            if index is None or cluster is None:
+                return make_response(jsonify({"message": ERROR_CLUSTER_NOT_FOUND}), 404)
+
+            clusters = index.get_cluster_expansion(cluster)
+            return jsonify(
+                {
+                    "cluster_uuid": cluster_uuid,
+                    "zoom": index.expansion_zoom(cluster),
+                    "clusters": map_clustering_data_to_proper_lazy_loading_object(clusters),
+                }
+            )
+        except ValueError as e:
+            logger.warning("Invalid parameter in cluster expansion request: %s", e)
+            return make_response(jsonify({"message": "Invalid parameters provided"}), 400)
+        except Exception as e:
+            logger.exception("Cluster expansion failed: %s", e)
+            return make_response(jsonify({"message": "An error occurred during clustering"}), 500)
+
     @core_api_blueprint.route("/location/<location_id>", methods=["GET"])
+    @conditional_on(data_and_config_version)
     @spec.validate(resp=Response(HTTP_404=ErrorResponse))
     def get_location(location_id):
         """Get detailed information for a single location.
@@ -405,6 +714,8 @@ def core_pages(
         return {"csrf_token": csrf_token}
 
     @core_api_blueprint.route("/categories", methods=["GET"])
+    @conditional_on(config_version)
+    @cached_per_language
     @spec.validate()
     def get_categories():
         """Get all available location categories.
@@ -428,6 +739,8 @@ def core_pages(
         return jsonify({"categories": categories, "categories_help": proper_categories_help})
 
     @core_api_blueprint.route("/categories-full", methods=["GET"])
+    @conditional_on(config_version)
+    @cached_per_language
     @spec.validate()
     def get_categories_full():
         """Get all categories with their subcategory options in a single request.
@@ -479,6 +792,8 @@ def core_pages(
         return jsonify(languages)
 
     @core_api_blueprint.route("/category/<category_type>", methods=["GET"])
+    @conditional_on(config_version)
+    @cached_per_language
     @spec.validate()
     def get_category_types(category_type):
         """Get all available options for a specific category.
@@ -511,6 +826,15 @@ def core_pages(
     # Register Spectree with blueprint after all routes are defined
     spec.register(core_api_blueprint)
 
+    @core_api_blueprint.record_once
+    def warm_cluster_tiles_on_register(state):
+        """Warm the cluster tile cache once the blueprint is registered on an app."""
+        try:
+            with state.app.app_context():
+                warm_cluster_tiles()
+        except Exception:
+            logger.warning("Could not warm cluster tile cache", exc_info=True)
+
     @core_api_blueprint.route("/doc")
     def api_doc_index():
         """Return links to available API documentation formats."""
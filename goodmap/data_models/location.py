@@ -5,8 +5,11 @@ including position validation, UUID tracking, and dynamic model creation
 for location-based applications with custom fields.
 """
 
+import hashlib
+import importlib.metadata
+import json
 import warnings
-from typing import Annotated, Any, Type, cast
+from typing import Annotated, Any, ClassVar, Type, cast
 
 from annotated_types import Ge, Le
 from pydantic import (
@@ -20,6 +23,10 @@ from pydantic import (
 
 from goodmap.exceptions import LocationValidationError
 
+# Key of a map section marking its locations as already validated. Its value is the
+# fingerprint of the location model they passed (see goodmap.data_validator).
+VALIDATED_FOR_KEY = "validated_for"
+
 Latitude = Annotated[float, Ge(-90), Le(90)]
 Longitude = Annotated[float, Ge(-180), Le(180)]
 
@@ -37,6 +44,9 @@ class LocationBase(BaseModel, extra="allow"):
     uuid: str = Field(..., max_length=100)  # TODO make this UUID and deprecate string
     remark: str | None = None
 
+    # Set on models built by create_location_model, see location_model_fingerprint
+    __goodmap_fingerprint__: ClassVar[str | None] = None
+
     @model_validator(mode="before")
     @classmethod
     def validate_uuid_exists(cls, data: Any) -> Any:
@@ -243,6 +253,7 @@ def create_location_model(
         >>> model = create_location_model([("name", str), ("tags", list)])
     """
     fields: dict[str, Any] = {}
+    definition = []
 
     for field_name, field_type_input in obligatory_fields:
         field_type_str = _normalize_field_type(field_type_input)
@@ -254,10 +265,32 @@ def create_location_model(
         else:
             allowed = frozenset()
         fields[field_name] = _build_field_definition(field_type_str, allowed)
+        definition.append((field_name, field_type_str, sorted(allowed)))
 
-    return create_model(
+    model = create_model(
         "Location",
         __base__=LocationBase,
         __module__="goodmap.data_models.location",
         **fields,
     )
+    model.__goodmap_fingerprint__ = hashlib.sha256(
+        json.dumps([_goodmap_version(), definition]).encode("utf-8")
+    ).hexdigest()
+    return model
+
+
+def _goodmap_version() -> str | None:
+    try:
+        return importlib.metadata.version("goodmap")
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def location_model_fingerprint(location_model: Type[BaseModel]) -> str | None:
+    """Return a digest identifying the validation rules of a location model.
+
+    Models created by ``create_location_model`` from the same obligatory fields
+    and categories, by the same goodmap version, share a fingerprint. Other models
+    have none.
+    """
+    return getattr(location_model, "__goodmap_fingerprint__", None)
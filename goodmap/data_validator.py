@@ -0,0 +1,211 @@
+"""Validate the locations of a data file, optionally writing a pre-validated snapshot.
+
+Every location is checked against the location model the server builds from the
+file's ``location_obligatory_fields`` and ``categories``, in parallel across a
+process pool, and errors are reported per location UUID.
+
+With ``--snapshot`` a copy of the file is written in which every location is
+normalized by the model and the map section is marked with the model's
+fingerprint. The server loads the locations of such a file without validating
+them again, as long as its location model has the same fields and categories.
+Validate again after editing a snapshot by hand.
+
+The file is not streamed: it is parsed into memory as a whole, and with
+``--snapshot`` the normalized locations are kept in memory too until the snapshot
+is written. Validation results are collected chunk by chunk as workers finish.
+
+Usage::
+
+    python -m goodmap.data_validator path/to/data.json [--workers N] [--snapshot OUT]
+"""
+
+import argparse
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import repeat
+from typing import Any
+
+from pydantic import BaseModel
+
+from goodmap import json_codec
+from goodmap.data_models.location import (
+    VALIDATED_FOR_KEY,
+    create_location_model,
+    location_model_fingerprint,
+)
+from goodmap.db import json_file_atomic_dump
+from goodmap.exceptions import LocationValidationError
+
+# Number of locations handed to a worker process at a time
+VALIDATION_CHUNK_SIZE = 5000
+
+# Location model of the current worker process, set up by _init_worker
+_worker_model: type[BaseModel] | None = None
+
+
+@dataclass
+class ValidationReport:
+    """Result of validating the locations of a data file.
+
+    Attributes:
+        checked: Number of locations checked
+        errors: List of (uuid, message) tuples, in file order
+        locations: Locations as normalized by the model, if requested and all valid
+        fingerprint: Fingerprint of the location model used
+    """
+
+    checked: int = 0
+    errors: list[tuple[str | None, str]] = field(default_factory=list)
+    locations: list[dict[str, Any]] | None = None
+    fingerprint: str | None = None
+
+
+def _init_worker(obligatory_fields, categories):
+    """Build the location model and make it the model of the current process."""
+    global _worker_model
+    model = create_location_model(obligatory_fields, categories)
+    _worker_model = model
+    return model
+
+
+def _describe(error):
+    """Return the validation errors of a location as a single line."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'location'}: {detail['msg']}"
+        for detail in error.validation_errors
+    )
+
+
+def _validate_chunk(chunk, normalize):
+    """Validate a chunk of locations with the model of the current process.
+
+    Returns:
+        Tuple of the (uuid, message) errors and, if ``normalize``, the normalized
+        locations
+    """
+    model = _worker_model
+    if model is None:
+        raise ValueError("The location model of this process is not set up")
+    errors = []
+    normalized = []
+    for entry in chunk:
+        try:
+            location = model.model_validate(entry)
+        except LocationValidationError as e:
+            uuid = entry.get("uuid") if isinstance(entry, dict) else None
+            errors.append((uuid, _describe(e)))
+            continue
+        if normalize:
+            normalized.append(location.model_dump(mode="json"))
+    return errors, normalized
+
+
+def validate_locations(map_data, workers=None, chunk_size=VALIDATION_CHUNK_SIZE, normalize=False):
+    """Validate all locations of a map section.
+
+    Args:
+        map_data: Map section of a data file, with 'data', 'categories' and
+            'location_obligatory_fields' keys
+        workers: Number of worker processes; None uses one per CPU, 1 validates in
+            the current process
+        chunk_size: Number of locations validated per task
+        normalize: Whether to collect the normalized locations for a snapshot
+
+    Returns:
+        ValidationReport
+
+    Raises:
+        ValueError: If the location model cannot be built from the map section.
+    """
+    obligatory_fields = map_data.get("location_obligatory_fields", [])
+    categories = map_data.get("categories", {})
+    locations = map_data.get("data", [])
+    chunks = (locations[i : i + chunk_size] for i in range(0, len(locations), chunk_size))
+
+    model = _init_worker(obligatory_fields, categories)
+    report = ValidationReport(checked=len(locations), fingerprint=location_model_fingerprint(model))
+    normalized = []
+    if workers == 1 or len(locations) <= chunk_size:
+        for chunk in chunks:
+            errors, chunk_locations = _validate_chunk(chunk, normalize)
+            report.errors.extend(errors)
+            normalized.extend(chunk_locations)
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(obligatory_fields, categories),
+        ) as pool:
+            for errors, chunk_locations in pool.map(_validate_chunk, chunks, repeat(normalize)):
+                report.errors.extend(errors)
+                normalized.extend(chunk_locations)
+
+    uuid_counts = Counter(entry.get("uuid") for entry in locations if isinstance(entry, dict))
+    for uuid, count in uuid_counts.items():
+        if uuid is not None and count > 1:
+            report.errors.append((uuid, f"uuid is used by {count} locations"))
+
+    if normalize and not report.errors:
+        report.locations = normalized
+    return report
+
+
+def write_snapshot(json_file, report, path):
+    """Write a pre-validated copy of a data file.
+
+    Args:
+        json_file: Parsed data file; either a ``{"map": ...}`` file or a bare map section
+        report: ValidationReport of the file, created with ``normalize=True``
+        path: Path to write the snapshot to
+    """
+    snapshot = dict(json_file)
+    map_data = dict(snapshot["map"] if "map" in snapshot else snapshot)
+    map_data["data"] = report.locations
+    map_data[VALIDATED_FOR_KEY] = report.fingerprint
+    if "map" in snapshot:
+        snapshot["map"] = map_data
+    else:
+        snapshot = map_data
+    json_file_atomic_dump(snapshot, path)
+
+
+def main(argv=None):
+    """Validate a data file from the command line; returns the process exit code."""
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("data_file", help="JSON data file to validate")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes")
+    parser.add_argument(
+        "--chunk-size", type=int, default=VALIDATION_CHUNK_SIZE, help="locations per task"
+    )
+    parser.add_argument("--snapshot", help="write a pre-validated copy of the file here")
+    args = parser.parse_args(argv)
+
+    with open(args.data_file, "rb") as file:
+        json_file = json_codec.load(file)
+    map_data = json_file["map"] if "map" in json_file else json_file
+
+    try:
+        report = validate_locations(
+            map_data, args.workers, args.chunk_size, normalize=args.snapshot is not None
+        )
+    except ValueError as e:
+        print(f"Invalid location model configuration: {e}", file=sys.stderr)
+        return 2
+
+    for uuid, message in report.errors:
+        print(f"{uuid}: {message}")
+    print(f"{report.checked} locations checked, {len(report.errors)} errors")
+    if report.errors:
+        if args.snapshot:
+            print("Snapshot not written because of errors", file=sys.stderr)
+        return 1
+    if args.snapshot:
+        write_snapshot(json_file, report, args.snapshot)
+        print(f"Pre-validated snapshot written to {args.snapshot}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
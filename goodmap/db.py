@@ -1,21 +1,75 @@
-import json
+import contextlib
+import hashlib
 import logging
+import math
 import os
 import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Callable, Generator
 from functools import partial
 from typing import Any
 
-from goodmap.core import get_queried_data
-from goodmap.data_models.location import LocationBase
+from goodmap import json_codec
+from goodmap.core import (
+    EARTH_RADIUS_KM,
+    LOCATION_QUERY_PARAMS,
+    QUERY_RESULT_CACHE_SIZE,
+    LocationStore,
+    canonical_query,
+    get_queried_data,
+    limit,
+    query_coordinates,
+    query_radius,
+    sort_by_distance,
+    within_radius,
+)
+from goodmap.data_models.location import VALIDATED_FOR_KEY, LocationBase
 from goodmap.exceptions import (
     AlreadyExistsError,
+    ConcurrentModificationError,
     LocationAlreadyExistsError,
     LocationNotFoundError,
     ReportNotFoundError,
 )
+from goodmap.json_file_writer import InterProcessLock, PendingWrite, WriteBatcher
+from goodmap.json_journal import (
+    JOURNAL_COMPACT_BYTES,
+    JOURNAL_SUFFIX,
+    Journal,
+    append_records,
+    apply_records,
+    delete_record,
+    put_record,
+    read_records,
+    set_record,
+)
+from goodmap.versioned_cache import VersionedLRUCache
 
 logger = logging.getLogger(__name__)
 
+_JSON_FILE_WRITER_INIT_LOCK = threading.Lock()
+
+# Serializes location writes of in-memory JSON databases, which replace the location
+# list instead of changing it while it is being read
+_JSON_DB_WRITE_LOCK = threading.RLock()
+
+# Top-level key of the version counter incremented by every json_file transaction
+JSON_FILE_VERSION_KEY = "data_version"
+JSON_FILE_COMMIT_ATTEMPTS = 3
+
+
+class _ActiveJsonFileTransactions(threading.local):
+    """Transactions open on the current thread, by id of their database."""
+
+    def __init__(self):
+        self.by_db = {}
+
+
+# Lets writes made inside ``db.transaction()`` join it instead of committing on their own
+_ACTIVE_JSON_FILE_TRANSACTIONS = _ActiveJsonFileTransactions()
+
 # TODO file is temporary solution to be compatible with old, static code,
 #  it should be replaced with dynamic solution
 
@@ -64,18 +118,378 @@ def __build_pagination_response(items, total, page, per_page):
 def json_file_atomic_dump(data, file_path):
     """Write JSON data to a file atomically using a temporary file and rename.
 
+    Data is serialized with the fastest available JSON backend (see ``json_codec``).
+
     Args:
         data: Data to serialize as JSON.
         file_path: Destination file path.
     """
     dir_name = os.path.dirname(file_path)
-    with tempfile.NamedTemporaryFile("w", dir=dir_name, delete=False) as temp_file:
-        json.dump(data, temp_file)
+    with tempfile.NamedTemporaryFile(
+        json_codec.write_mode(), dir=dir_name, delete=False
+    ) as temp_file:
+        json_codec.dump(data, temp_file)
         temp_file.flush()
         os.fsync(temp_file.fileno())
     os.replace(temp_file.name, file_path)
 
 
+def _json_file_load(db):
+    """Return the parsed contents of a JSON file database, parsing the file only when needed.
+
+    The parsed file is kept on the database object and reused while the file's
+    data version (inode, size and mtime) is unchanged. In journal mode the journal
+    is replayed over the file, and records appended since the last load are applied
+    to a copy of the cached data instead of parsing the file again. Callers must
+    not modify the returned data; writers change a copy in a transaction.
+    """
+    version = json_file_db_get_data_version(db)
+    cached = getattr(db, "_goodmap_file_cache", None)
+    if version is not None and cached is not None and cached[0] == version:
+        return cached[1]
+    journal = getattr(db, "_goodmap_journal", None)
+    if journal is None:
+        with open(db.data_file_path, "rb") as file:
+            json_file = json_codec.load(file)
+        db._goodmap_file_cache = (version, json_file, 0) if version is not None else None
+        return json_file
+    with journal.lock:
+        if cached is not None and _journal_appended_only(cached, version):
+            json_file = _json_file_copy(cached[1])
+            records, offset = read_records(journal.path, cached[2])
+            apply_records(json_file, records)
+        else:
+            json_file, offset = _json_file_read_with_journal(db.data_file_path, journal.path)
+        db._goodmap_file_cache = (version, json_file, offset) if version is not None else None
+    return json_file
+
+
+def _json_file_copy(json_file):
+    """Return a copy of parsed file contents that a writer can change without affecting readers.
+
+    Only the top-level dict and the map section are copied. Writers replace the
+    lists and items below them instead of changing them in place, so readers of
+    the original keep a consistent view, and the location list keeps the identity
+    its cached LocationStore is keyed by.
+    """
+    copied = dict(json_file)
+    if isinstance(copied.get("map"), dict):
+        copied["map"] = dict(copied["map"])
+    return copied
+
+
+def _journal_appended_only(cached, version):
+    """Tell whether the only change since ``cached`` was loaded is a grown journal."""
+    if cached is None or cached[0] is None or version is None:
+        return False
+    (cached_file, cached_journal), (file_stat, journal_stat) = cached[0], version
+    return (
+        cached_file == file_stat
+        and cached_journal is not None
+        and journal_stat is not None
+        and cached_journal[0] == journal_stat[0]
+    )
+
+
+def _json_file_read_with_journal(data_file_path, journal_path):
+    """Parse a JSON file database and replay its journal over it.
+
+    Returns:
+        Tuple ``(json_file, offset)`` where ``offset`` is the journal position read up to.
+    """
+    with open(data_file_path, "rb") as file:
+        json_file = json_codec.load(file)
+    records, offset = read_records(journal_path)
+    apply_records(json_file, records)
+    return json_file, offset
+
+
+def _json_file_write(db, operation):
+    """Apply a mutation to a JSON file database.
+
+    Mutations submitted concurrently are committed together: the file is loaded
+    once under the inter-process write lock, every mutation is applied to it and
+    the result is saved once. A mutation made inside ``db.transaction()`` joins
+    that transaction and is saved with it; one made by a thread already holding
+    the write lock is committed on its own, as the batch it would wait for may be
+    waiting for that lock.
+
+    Args:
+        db: JSON file database instance.
+        operation: Callable mutating the parsed file passed to it in place and
+            returning the journal records describing the change. It must raise
+            before changing anything if the mutation is not possible.
+
+    Raises:
+        Exception: Whatever ``operation`` or saving the file raised.
+    """
+    transaction = _active_json_file_transaction(db)
+    if transaction is None:
+        lock, batcher = _json_file_writer(db)
+        if not lock.held():
+            batcher.submit(operation)
+            return
+        # The batch leader may be waiting for the lock this thread holds
+        pending = PendingWrite(operation)
+        _json_file_commit(db, [pending])
+        if pending.error is not None:
+            raise pending.error
+        return
+    records = operation(transaction.data)
+    # Without logged records the transaction rewrites the whole file, which also
+    # holds the changes it made to ``data`` directly
+    if transaction.records is not None:
+        transaction.log(records)
+
+
+def _active_json_file_transaction(db):
+    """Return the transaction the current thread has open on ``db``, if any."""
+    return _ACTIVE_JSON_FILE_TRANSACTIONS.by_db.get(id(db))
+
+
+def _json_file_writer(db):
+    """Return the ``(InterProcessLock, WriteBatcher)`` pair of a JSON file database."""
+    writer = getattr(db, "_goodmap_writer", None)
+    if writer is None:
+        with _JSON_FILE_WRITER_INIT_LOCK:
+            writer = getattr(db, "_goodmap_writer", None)
+            if writer is None:
+                writer = (
+                    InterProcessLock(db.data_file_path),
+                    WriteBatcher(partial(_json_file_commit, db)),
+                )
+                db._goodmap_writer = writer
+    return writer
+
+
+def _json_file_commit(db, batch):
+    """Apply a batch of pending mutations to a JSON file database in one transaction.
+
+    The batch is retried on fresh data if the file was changed by a writer that
+    does not take the write lock.
+    """
+    for attempt in range(JSON_FILE_COMMIT_ATTEMPTS):
+        try:
+            with json_file_db_transaction(db) as transaction:
+                # Only the logged records are changes; a batch of rejected writes saves nothing
+                transaction.log([])
+                for pending in batch:
+                    pending.error = None
+                    try:
+                        transaction.log(pending.operation(transaction.data))
+                    except Exception as exc:
+                        pending.error = exc
+            return
+        except ConcurrentModificationError:
+            if attempt == JSON_FILE_COMMIT_ATTEMPTS - 1:
+                raise
+            logger.warning("Data file %s changed during a write, retrying", db.data_file_path)
+
+
+class JsonFileTransaction:
+    """Read-modify-write of a JSON file database, opened with ``db.transaction()``.
+
+    ``data`` is a copy of the cached file contents that replaces them once saved,
+    so readers never see a transaction half-applied. Only the top-level dict and
+    the map section are copied: replace lists and their items (e.g.
+    ``map["suggestions"] = [*suggestions, item]``) instead of changing them in
+    place. Changes made to ``data`` are saved when the transaction ends without
+    an exception. By default the whole file is rewritten; once journal records
+    describing the changes are passed to :meth:`log`, only those are saved (and
+    appended to the journal in journal mode), so a transaction that logged no
+    records writes nothing.
+
+    Attributes:
+        source: Cached contents of the file the transaction started from.
+        data: Copy of ``source`` to change.
+        version: Version counter stored in the file when the transaction began.
+        records: Logged journal records, or None if none were logged.
+        discarded: Whether :meth:`discard` was called.
+    """
+
+    def __init__(self, data):
+        self.source = data
+        self.data = _json_file_copy(data)
+        self.version = data.get(JSON_FILE_VERSION_KEY, 0)
+        self.records = None
+        self.discarded = False
+
+    def log(self, records):
+        """Describe changes made to ``data`` with journal records."""
+        if self.records is None:
+            self.records = []
+        self.records.extend(records)
+
+    def discard(self):
+        """End the transaction without saving; changes made to ``data`` are dropped."""
+        self.discarded = True
+
+
+@contextlib.contextmanager
+def json_file_db_transaction(self) -> Generator[JsonFileTransaction, None, None]:
+    """Run a read-modify-write of the JSON file database under the inter-process write lock.
+
+    Yields a :class:`JsonFileTransaction` with the current contents of the file.
+    On success the file's version counter is incremented and the changes are saved.
+    A transaction opened while the current thread already has one open on the
+    database joins the outer one: its changes are saved when the outer one ends.
+
+    Raises:
+        ConcurrentModificationError: If the file was changed by a writer that does
+            not take the write lock while the transaction was running. Nothing is
+            saved in that case.
+    """
+    active = _active_json_file_transaction(self)
+    if active is not None:
+        yield active
+        return
+    with _json_file_writer(self)[0]:
+        file_version = json_file_db_get_data_version(self)
+        transaction = JsonFileTransaction(_json_file_load(self))
+        transactions = _ACTIVE_JSON_FILE_TRANSACTIONS.by_db
+        transactions[id(self)] = transaction
+        try:
+            yield transaction
+        except BaseException:
+            _drop_json_file_caches(self)
+            raise
+        finally:
+            del transactions[id(self)]
+        if transaction.discarded:
+            _drop_json_file_caches(self)
+            return
+        if transaction.records == []:
+            return
+        if json_file_db_get_data_version(self) != file_version:
+            _drop_json_file_caches(self)
+            raise ConcurrentModificationError(self.data_file_path)
+        version = transaction.version + 1
+        transaction.data[JSON_FILE_VERSION_KEY] = version
+        records = transaction.records
+        if records is not None:
+            records = [*records, set_record(JSON_FILE_VERSION_KEY, version)]
+        _json_file_save(self, transaction.data, records, transaction.source)
+
+
+def _drop_json_file_caches(db):
+    """Forget the cached file contents and LocationStore, e.g. after a failed write."""
+    # The cached data may hold changes that were not saved
+    db._goodmap_file_cache = None
+    db._goodmap_location_store = None
+
+
+def _json_file_save(db, json_file, records=None, source=None):
+    """Persist mutations of a JSON file database and keep the data as its parsed contents.
+
+    Without a journal, or without ``records``, the whole file is rewritten (merging
+    and removing the journal). In journal mode ``records``, describing the mutations
+    already applied to ``json_file``, are appended to the journal instead; a
+    background compaction is started once the journal is large enough. The cached
+    LocationStore, kept in sync by the mutations, is moved to the new data version.
+
+    Args:
+        db: JSON file database instance.
+        json_file: Contents to save.
+        records: Journal records describing the change, or None to rewrite the file.
+        source: Cached contents ``json_file`` was derived from; defaults to ``json_file``.
+    """
+    if source is None:
+        source = json_file
+    previous_version = json_file_db_get_data_version(db)
+    journal = getattr(db, "_goodmap_journal", None)
+    if journal is None or records is None:
+        try:
+            json_file_atomic_dump(json_file, db.data_file_path)
+            if journal is not None:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(journal.path)
+        except BaseException:
+            _drop_json_file_caches(db)
+            raise
+        version = json_file_db_get_data_version(db)
+        db._goodmap_file_cache = (version, json_file, 0) if version is not None else None
+        _rekey_location_store(db, previous_version, version)
+        return
+
+    with journal.lock:
+        try:
+            start, end = append_records(journal.path, records)
+        except BaseException:
+            _drop_json_file_caches(db)
+            raise
+        cached = getattr(db, "_goodmap_file_cache", None)
+        version = json_file_db_get_data_version(db)
+        if (
+            version is not None
+            and cached is not None
+            and cached[1] is source
+            and cached[2] == start
+        ):
+            db._goodmap_file_cache = (version, json_file, end)
+            _rekey_location_store(db, previous_version, version)
+        else:
+            # Records written without the write lock precede ours; replay them on next load
+            db._goodmap_file_cache = None
+        if end >= journal.compact_bytes and not journal.compacting:
+            journal.compacting = True
+            threading.Thread(target=_compact_in_background, args=(db,), daemon=True).start()
+
+
+def _rekey_location_store(db, previous_version, version):
+    """Move the cached LocationStore to a new data version if it was built for the previous one."""
+    cached = getattr(db, "_goodmap_location_store", None)
+    if previous_version is None or version is None or cached is None:
+        return
+    key, store = cached
+    if key[0] == previous_version:
+        db._goodmap_location_store = ((version, *key[1:]), store)
+
+
+def enable_json_file_journal(db, compact_bytes=JOURNAL_COMPACT_BYTES):
+    """Switch a JSON file database to journal mode.
+
+    Args:
+        db: JSON file database instance.
+        compact_bytes: Journal size that triggers a background compaction.
+    """
+    db._goodmap_journal = Journal(db.data_file_path + JOURNAL_SUFFIX, compact_bytes)
+    db._goodmap_file_cache = None
+
+
+def compact_json_file_journal(db):
+    """Merge the journal of a JSON file database into the data file and remove it.
+
+    Does nothing if there is no journal file. Also works when journal mode is off,
+    so a journal left behind by an earlier run is not lost.
+    """
+    journal = getattr(db, "_goodmap_journal", None)
+    with _json_file_writer(db)[0]:
+        if journal is None:
+            journal_path = db.data_file_path + JOURNAL_SUFFIX
+            if not os.path.exists(journal_path):
+                return
+            json_file, _ = _json_file_read_with_journal(db.data_file_path, journal_path)
+            json_file_atomic_dump(json_file, db.data_file_path)
+            os.remove(journal_path)
+            db._goodmap_file_cache = None
+            return
+
+        with journal.lock:
+            if os.path.exists(journal.path):
+                _json_file_save(db, _json_file_load(db))
+
+
+def _compact_in_background(db):
+    """Compact the journal of a database, logging failures; run in a background thread."""
+    journal = db._goodmap_journal
+    try:
+        compact_json_file_journal(db)
+    except Exception:
+        logger.exception("Compacting journal %s failed", journal.path)
+    finally:
+        journal.compacting = False
+
+
 class PaginationHelper:
     """Common pagination utility to eliminate duplication across backends."""
 
@@ -96,7 +510,9 @@ class PaginationHelper:
         # Apply sorting
         if sort_by:
             reverse = sort_order == "desc"
-            items.sort(
+            # Items may be the cached data of the backend, so sort a copy
+            items = sorted(
+                items,
                 key=lambda item: PaginationHelper.get_sort_key(item, sort_by),  # type: ignore[reportUnknownLambdaType]
                 reverse=reverse,
             )
@@ -228,8 +644,8 @@ class FileIOHelper:
     @staticmethod
     def read_json_file(file_path):
         """Read and parse JSON file."""
-        with open(file_path, "r") as file:
-            return json.load(file)
+        with open(file_path, "rb") as file:
+            return json_codec.load(file)
 
     @staticmethod
     def write_json_file_atomic(data, file_path):
@@ -248,35 +664,12 @@ class CRUDHelper:
 
     @staticmethod
     def add_item_to_json_db(db_data, collection_name, item_data, default_status=None):
-        """Add item to JSON in-memory database."""
-        collection = db_data.setdefault(collection_name, [])
-        uuid = item_data.get("uuid")
-        resource_type = collection_name.rstrip("s").capitalize()
-
-        # Check if item already exists
-        existing = next(
-            (
-                item
-                for item in collection
-                if (item.get("uuid") if isinstance(item, dict) else getattr(item, "uuid", None))
-                == uuid
-            ),
-            None,
-        )
-        if existing:
-            raise AlreadyExistsError(uuid, resource_type)
-
-        record = dict(item_data)
-        if default_status:
-            record["status"] = default_status
-        collection.append(record)
-
-    @staticmethod
-    def add_item_to_json_file_db(file_path, collection_name, item_data, default_status=None):
-        """Add item to JSON file database."""
-        json_file = FileIOHelper.read_json_file(file_path)
-        collection = json_file["map"].get(collection_name, [])
+        """Add item to JSON in-memory database.
 
+        The collection list is replaced rather than appended to, as readers may be
+        iterating it.
+        """
+        collection = db_data.get(collection_name, [])
         uuid = item_data.get("uuid")
         resource_type = collection_name.rstrip("s").capitalize()
 
@@ -296,10 +689,7 @@ class CRUDHelper:
         record = dict(item_data)
         if default_status:
             record["status"] = default_status
-        collection.append(record)
-        json_file["map"][collection_name] = collection
-
-        FileIOHelper.write_json_file_atomic(json_file, file_path)
+        db_data[collection_name] = [*collection, record]
 
     @staticmethod
     def add_item_to_mongodb(db_collection, item_data, item_type, default_status=None):
@@ -314,6 +704,69 @@ class CRUDHelper:
         db_collection.insert_one(record)
 
 
+# ------------------------------------------------
+# MongoDB map_config snapshot
+#
+# All MongoDB config readers share one copy of the map_config document, re-read at most
+# every MONGODB_CONFIG_TTL seconds, or as soon as a change stream reports a change.
+
+MONGODB_CONFIG_ID = "map_config"
+MONGODB_CONFIG_TTL = 10.0
+
+
+def _mongodb_config(db):
+    """Return the map_config document (or None), read through the config snapshot."""
+    return _mongodb_config_snapshot(db)[1]
+
+
+def _mongodb_config_snapshot(db):
+    """Return the current ``(expires_at, config_doc, version)`` snapshot, refreshing it if stale."""
+    snapshot = getattr(db, "_goodmap_config_snapshot", None)
+    now = time.monotonic()
+    if snapshot is None or snapshot[0] <= now:
+        config_doc = db.db.config.find_one({"_id": MONGODB_CONFIG_ID})
+        version = hashlib.blake2b(repr(config_doc).encode(), digest_size=16).hexdigest()
+        snapshot = (now + MONGODB_CONFIG_TTL, config_doc, version)
+        db._goodmap_config_snapshot = snapshot
+    return snapshot
+
+
+def invalidate_mongodb_config(db):
+    """Drop the map_config snapshot, so the next reader fetches the document again."""
+    db._goodmap_config_snapshot = None
+
+
+def watch_mongodb_config(db):
+    """Invalidate the map_config snapshot whenever the document changes.
+
+    Starts a daemon thread following a MongoDB change stream on the config
+    collection. Change streams need a replica set or sharded cluster; if the stream
+    cannot be opened or breaks, a warning is logged and the snapshot falls back to
+    expiring after its TTL.
+
+    Returns:
+        The watcher thread.
+    """
+
+    def watch():
+        """Drop the config snapshot on every change until the change stream ends."""
+        pipeline = [{"$match": {"documentKey._id": MONGODB_CONFIG_ID}}]
+        try:
+            with db.db.config.watch(pipeline) as stream:
+                for _change in stream:
+                    invalidate_mongodb_config(db)
+        except Exception:
+            logger.warning(
+                "map_config change stream stopped, relying on the %ss snapshot TTL",
+                MONGODB_CONFIG_TTL,
+                exc_info=True,
+            )
+
+    thread = threading.Thread(target=watch, name="goodmap-config-watch", daemon=True)
+    thread.start()
+    return thread
+
+
 # ------------------------------------------------
 # get_location_obligatory_fields
 
@@ -325,8 +778,7 @@ def json_db_get_location_obligatory_fields(db):
 
 def json_file_db_get_location_obligatory_fields(db):
     """Return location obligatory fields from JSON file database."""
-    with open(db.data_file_path, "r") as file:
-        return json.load(file)["map"]["location_obligatory_fields"]
+    return _json_file_load(db)["map"]["location_obligatory_fields"]
 
 
 def google_json_db_get_location_obligatory_fields(db):
@@ -336,7 +788,7 @@ def google_json_db_get_location_obligatory_fields(db):
 
 def mongodb_db_get_location_obligatory_fields(db):
     """Return location obligatory fields from MongoDB."""
-    config_doc = db.db.config.find_one({"_id": "map_config"})
+    config_doc = _mongodb_config(db)
     if config_doc and "location_obligatory_fields" in config_doc:
         return config_doc["location_obligatory_fields"]
     return []
@@ -358,8 +810,7 @@ def json_db_get_issue_options(self):
 
 def json_file_db_get_issue_options(self):
     """Return reported issue types from JSON file database."""
-    with open(self.data_file_path, "r") as file:
-        return json.load(file)["map"].get("reported_issue_types", [])
+    return _json_file_load(self)["map"].get("reported_issue_types", [])
 
 
 def google_json_db_get_issue_options(self):
@@ -369,7 +820,7 @@ def google_json_db_get_issue_options(self):
 
 def mongodb_db_get_issue_options(self):
     """Return reported issue types from MongoDB."""
-    config_doc = self.db.config.find_one({"_id": "map_config"})
+    config_doc = _mongodb_config(self)
     if config_doc and "reported_issue_types" in config_doc:
         return config_doc["reported_issue_types"]
     return []
@@ -391,8 +842,7 @@ def google_json_db_get_data(self):
 
 def json_file_db_get_data(self):
     """Return map data from JSON file database."""
-    with open(self.data_file_path, "r") as file:
-        return json.load(file)["map"]
+    return _json_file_load(self)["map"]
 
 
 def json_db_get_data(self):
@@ -402,7 +852,7 @@ def json_db_get_data(self):
 
 def mongodb_db_get_data(self):
     """Return map data from MongoDB, including locations and config."""
-    config_doc = self.db.config.find_one({"_id": "map_config"})
+    config_doc = _mongodb_config(self)
     if config_doc:
         return {
             "data": list(self.db.locations.find({}, {"_id": 0})),
@@ -426,6 +876,135 @@ def get_data(db):
     return globals()[f"{db.module_name}_get_data"]
 
 
+# ------------------------------------------------
+# get_data_version
+#
+# A data version is an opaque, hashable token that changes whenever location data changes.
+# Callers use it to decide whether anything derived from location data (cluster indexes,
+# response caches) is still valid. ``None`` means the version is unknown and nothing
+# derived from the data should be cached.
+
+MONGODB_DATA_VERSION_ID = "data_version"
+
+
+def _bump_data_version(db):
+    """Advance the in-process data version after a location mutation."""
+    db._goodmap_data_version = getattr(db, "_goodmap_data_version", 0) + 1
+
+
+def json_db_get_data_version(self):
+    """Return the in-process data version of the in-memory JSON database."""
+    return getattr(self, "_goodmap_data_version", 0)
+
+
+def json_file_db_get_data_version(self):
+    """Return a data version derived from the data file's inode, size and mtime.
+
+    Writes replace the file atomically, so changes made by other processes are
+    detected as well. In journal mode the journal's inode, size and mtime (or None
+    when there is no journal) are part of the version. Returns None if the data
+    file cannot be stat-ed.
+    """
+    try:
+        stat = os.stat(self.data_file_path)
+    except OSError:
+        return None
+    file_stat = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    journal = getattr(self, "_goodmap_journal", None)
+    if journal is None:
+        return file_stat
+    try:
+        stat = os.stat(journal.path)
+    except OSError:
+        return (file_stat, None)
+    return (file_stat, (stat.st_ino, stat.st_size, stat.st_mtime_ns))
+
+
+def google_json_db_get_data_version(self):
+    """Return the data version of Google Cloud Storage JSON (read-only, loaded once)."""
+    return getattr(self, "_goodmap_data_version", 0)
+
+
+def mongodb_db_get_data_version(self):
+    """Return the data version counter stored in the MongoDB config collection.
+
+    The counter is shared by all processes using the database, so it is bumped
+    by every location mutation made through goodmap.
+    """
+    version_doc = self.db.config.find_one({"_id": MONGODB_DATA_VERSION_ID})
+    return version_doc.get("version", 0) if version_doc else 0
+
+
+def _mongodb_bump_data_version(self):
+    """Increment the shared data version counter in MongoDB."""
+    self.db.config.update_one(
+        {"_id": MONGODB_DATA_VERSION_ID}, {"$inc": {"version": 1}}, upsert=True
+    )
+
+
+def get_data_version(db):
+    """Dispatch to the backend-specific get_data_version function."""
+    return globals()[f"{db.module_name}_get_data_version"]
+
+
+# Versions of backends whose data lives in process memory restart from zero and may
+# differ between workers, so they are only comparable within the current process.
+_PROCESS_LOCAL_VERSION_BACKENDS = ("json_db", "google_json_db")
+_PROCESS_DATA_TOKEN = uuid.uuid4().hex
+
+
+def get_shared_data_version(db):
+    """Return a data version that is comparable across processes and restarts.
+
+    Used for HTTP validators, which clients keep between requests that may reach
+    any worker. Versions of in-memory backends are qualified with a per-process
+    token, so they only ever match within the process that produced them.
+    Returns None when the data version is unknown.
+    """
+    version = globals()[f"{db.module_name}_get_data_version"](db)
+    if version is None or db.module_name not in _PROCESS_LOCAL_VERSION_BACKENDS:
+        return version
+    return (_PROCESS_DATA_TOKEN, version)
+
+
+# ------------------------------------------------
+# get_config_version
+#
+# A config version is an opaque, hashable token that changes whenever the map configuration
+# (categories and their help texts, visible data, meta data) changes. Like shared data
+# versions it is comparable across processes, so it can also back HTTP validators.
+# ``None`` means the version is unknown.
+
+
+def json_db_get_config_version(self):
+    """Return the config version of the in-memory JSON database.
+
+    The configuration is only replaced, never edited, so the identity of the
+    objects holding it identifies it within the process.
+    """
+    return (_PROCESS_DATA_TOKEN, id(self.data), id(self.data.get("categories")))
+
+
+def json_file_db_get_config_version(self):
+    """Return the config version of the JSON file database, i.e. its data version."""
+    return json_file_db_get_data_version(self)
+
+
+def google_json_db_get_config_version(self):
+    """Return the config version of Google Cloud Storage JSON (read-only, loaded once)."""
+    return (_PROCESS_DATA_TOKEN, id(self.data))
+
+
+def mongodb_db_get_config_version(self):
+    """Return a digest of the map_config document in MongoDB, taken from its snapshot."""
+    return _mongodb_config_snapshot(self)[2]
+
+
+def get_config_version(db):
+    """Dispatch to the backend-specific get_config_version function."""
+    return globals()[f"{db.module_name}_get_config_version"]
+
+
 # ------------------------------------------------
 # get_visible_data
 
@@ -475,7 +1054,7 @@ def mongodb_db_get_visible_data(self) -> dict[str, Any]:
         pymongo.errors.ConnectionFailure: If database connection fails.
         pymongo.errors.OperationFailure: If database operation fails.
     """
-    config_doc = self.db.config.find_one({"_id": "map_config"})
+    config_doc = _mongodb_config(self)
     if config_doc:
         return config_doc.get("visible_data", {})
     return {}
@@ -543,7 +1122,7 @@ def mongodb_db_get_meta_data(self) -> dict[str, Any]:
         pymongo.errors.ConnectionFailure: If database connection fails.
         pymongo.errors.OperationFailure: If database operation fails.
     """
-    config_doc = self.db.config.find_one({"_id": "map_config"})
+    config_doc = _mongodb_config(self)
     if config_doc:
         return config_doc.get("meta_data", {})
     return {}
@@ -573,8 +1152,7 @@ def json_db_get_categories(self):
 
 def json_file_db_get_categories(self):
     """Return category keys from JSON file database."""
-    with open(self.data_file_path, "r") as file:
-        return json.load(file)["map"]["categories"].keys()
+    return _json_file_load(self)["map"]["categories"].keys()
 
 
 def google_json_db_get_categories(self):
@@ -584,7 +1162,7 @@ def google_json_db_get_categories(self):
 
 def mongodb_db_get_categories(self):
     """Return category keys from MongoDB."""
-    config_doc = self.db.config.find_one({"_id": "map_config"})
+    config_doc = _mongodb_config(self)
     if config_doc and "categories" in config_doc:
         return list(config_doc["categories"].keys())
     return []
@@ -618,21 +1196,20 @@ def json_db_get_category_data(self, category_type=None):
 
 def json_file_db_get_category_data(self, category_type=None):
     """Return category data from JSON file database, optionally filtered by type."""
-    with open(self.data_file_path, "r") as file:
-        data = json.load(file)["map"]
-        if category_type:
-            return {
-                "categories": {category_type: data["categories"].get(category_type, [])},
-                "categories_help": data.get("categories_help", []),
-                "categories_options_help": {
-                    category_type: data.get("categories_options_help", {}).get(category_type, [])
-                },
-            }
+    data = _json_file_load(self)["map"]
+    if category_type:
         return {
-            "categories": data["categories"],
+            "categories": {category_type: data["categories"].get(category_type, [])},
             "categories_help": data.get("categories_help", []),
-            "categories_options_help": data.get("categories_options_help", {}),
+            "categories_options_help": {
+                category_type: data.get("categories_options_help", {}).get(category_type, [])
+            },
         }
+    return {
+        "categories": data["categories"],
+        "categories_help": data.get("categories_help", []),
+        "categories_options_help": data.get("categories_options_help", {}),
+    }
 
 
 def google_json_db_get_category_data(self, category_type=None):
@@ -655,7 +1232,7 @@ def google_json_db_get_category_data(self, category_type=None):
 
 def mongodb_db_get_category_data(self, category_type=None):
     """Return category data from MongoDB, optionally filtered by type."""
-    config_doc = self.db.config.find_one({"_id": "map_config"})
+    config_doc = _mongodb_config(self)
     if config_doc:
         if category_type:
             return {
@@ -686,36 +1263,54 @@ def get_category_data(db):
 # get_location
 
 
-def get_location_from_raw_data(raw_data, uuid, location_model):
+def get_location_from_raw_data(raw_data, uuid, location_model, store=None):
     """Find and validate a single location by UUID from raw data.
 
     Args:
         raw_data: Dict containing a 'data' key with a list of location dicts.
         uuid: UUID string of the location to find.
         location_model: Pydantic model class to validate the location.
+        store: Optional LocationStore built from ``raw_data`` to look the UUID up in
+            (and to reuse the location's validated instance from).
 
     Returns:
         Validated location model instance, or None if not found.
     """
+    if store is not None:
+        row = store.find(uuid)
+        return store.model(store.data[row], location_model) if row is not None else None
     point = next((point for point in raw_data["data"] if point["uuid"] == uuid), None)
     return location_model.model_validate(point) if point else None
 
 
+def _find_location_row(db, map_data, uuid):
+    """Return the index of a location in ``map_data["data"]`` by UUID, or None."""
+    if not map_data.get("data"):
+        return None
+    return get_location_store(db, map_data).find(uuid)
+
+
 def google_json_db_get_location(self, uuid, location_model):
     """Retrieve a single location by UUID from Google Cloud Storage JSON."""
-    return get_location_from_raw_data(self.data.get("map", {}), uuid, location_model)
+    data = self.data.get("map", {})
+    return get_location_from_raw_data(
+        data, uuid, location_model, store=get_location_store(self, data)
+    )
 
 
 def json_file_db_get_location(self, uuid, location_model):
     """Retrieve a single location by UUID from JSON file database."""
-    with open(self.data_file_path, "r") as file:
-        point = get_location_from_raw_data(json.load(file)["map"], uuid, location_model)
-        return point
+    data = _json_file_load(self)["map"]
+    return get_location_from_raw_data(
+        data, uuid, location_model, store=get_location_store(self, data)
+    )
 
 
 def json_db_get_location(self, uuid, location_model):
     """Retrieve a single location by UUID from in-memory JSON database."""
-    return get_location_from_raw_data(self.data, uuid, location_model)
+    return get_location_from_raw_data(
+        self.data, uuid, location_model, store=get_location_store(self, self.data)
+    )
 
 
 def mongodb_db_get_location(self, uuid, location_model):
@@ -733,49 +1328,248 @@ def get_location(db, location_model):
 # get_locations
 
 
-def get_locations_list_from_raw_data(map_data, query, location_model):
+def get_location_store(db, map_data):
+    """Return a LocationStore for the backend's current location data.
+
+    The store is kept on the database object and rebuilt when the data version
+    changes or the location list is replaced, so in-memory backends build it once
+    per data load instead of once per query.
+
+    Args:
+        db: Database instance
+        map_data: Dict containing 'data' and 'categories' keys, as returned by get_data.
+
+    Returns:
+        LocationStore
+    """
+    version = globals()[f"{db.module_name}_get_data_version"](db)
+    # Writers replace the location list instead of changing it, so read it once
+    data = map_data["data"]
+    key = _location_store_key(version, {**map_data, "data": data})
+    cached = getattr(db, "_goodmap_location_store", None)
+    if version is not None and cached is not None and cached[0] == key:
+        return cached[1]
+    store = LocationStore(data, map_data.get("categories", {}), map_data.get(VALIDATED_FOR_KEY))
+    if version is not None:
+        db._goodmap_location_store = (key, store)
+    return store
+
+
+def _location_store_key(version, map_data):
+    """Return the key identifying the map data a LocationStore was built from."""
+    return (version, id(map_data["data"]), len(map_data["data"]), id(map_data.get("categories")))
+
+
+def _apply_location_change(db, previous_key, update: Callable[[LocationStore], LocationStore]):
+    """Bump the data version of a Json database and patch its store; see _patch_location_store."""
+    _bump_data_version(db)
+    _patch_location_store(db, previous_key, update, json_db_get_data_version(db), db.data)
+
+
+def _patch_location_store(
+    db, previous_key, update: Callable[[LocationStore], LocationStore], version, map_data
+):
+    """Replace the cached LocationStore after a location mutation.
+
+    The store is derived from the previous one instead of being rebuilt, as long as
+    that was built from the data as it was right before the mutation; otherwise it
+    is dropped.
+
+    Args:
+        db: Database instance
+        previous_key: Store key of the data before the mutation
+        update: Callable returning the LocationStore for the mutated data, given
+            the previous one
+        version: Data version the patched store belongs to
+        map_data: Mutated dict containing 'data' and 'categories' keys
+    """
+    cached = getattr(db, "_goodmap_location_store", None)
+    if cached is None:
+        return
+    key, store = cached
+    if key != previous_key:
+        db._goodmap_location_store = None
+        return
+    db._goodmap_location_store = (_location_store_key(version, map_data), update(store))
+
+
+# Fields of a location needed for its basic info (see LocationBase.basic_info)
+BASIC_INFO_PROJECTION = ("uuid", "position", "remark")
+
+# Query parameters that sort or render API results and are not MongoDB location filters
+MONGODB_NON_FILTER_PARAMS = (*LOCATION_QUERY_PARAMS, "with_distance", "format")
+
+# Filters matching more locations than this are not cached, keeping the cache small
+# and the fetch by _id well below MongoDB's maximum query document size
+MONGODB_CACHED_IDS_MAX = 50_000
+
+
+def project_location(location, projection):
+    """Return the given fields of a location model as a dict, leaving out unset ones."""
+    projected = {}
+    for field in projection:
+        value = getattr(location, field, None)
+        if value is not None:
+            projected[field] = value
+    return projected
+
+
+def get_locations_list_from_raw_data(map_data, query, location_model, store=None, projection=None):
     """Filter and validate locations from raw map data based on query parameters.
 
+    Locations are filtered right away, then validated (and projected) one at a
+    time as the result is iterated, so no list of all of them is built.
+
     Args:
         map_data: Dict containing 'data' and 'categories' keys.
         query: Dict of query parameters for filtering.
         location_model: Pydantic model class to validate each location.
+        store: Optional LocationStore built from ``map_data`` to filter with. Its
+            locations are validated once and the instances reused across reads.
+        projection: Optional field names; when given, each location is returned as
+            a dict of just these fields.
 
     Returns:
-        List of validated location model instances.
+        Iterator of validated location model instances, or of dicts with the
+        projected fields.
     """
-    filtered_locations = get_queried_data(map_data["data"], map_data["categories"], query)
-    return [location_model.model_validate(point) for point in filtered_locations]
+    if store is not None:
+        points = store.query(query)
+        locations = (store.model(point, location_model) for point in points)
+    else:
+        filtered_locations = get_queried_data(map_data["data"], map_data["categories"], query)
+        locations = (location_model.model_validate(point) for point in filtered_locations)
+    if projection is not None:
+        return (project_location(location, projection) for location in locations)
+    return locations
 
 
-def google_json_db_get_locations(self, query, location_model):
+def google_json_db_get_locations(self, query, location_model, projection=None):
     """Retrieve filtered locations from Google Cloud Storage JSON."""
-    return get_locations_list_from_raw_data(self.data.get("map", {}), query, location_model)
+    data = self.data.get("map", {})
+    return get_locations_list_from_raw_data(
+        data, query, location_model, store=get_location_store(self, data), projection=projection
+    )
 
 
-def json_file_db_get_locations(self, query, location_model):
+def json_file_db_get_locations(self, query, location_model, projection=None):
     """Retrieve filtered locations from JSON file database."""
-    with open(self.data_file_path, "r") as file:
-        return get_locations_list_from_raw_data(json.load(file)["map"], query, location_model)
+    data = _json_file_load(self)["map"]
+    return get_locations_list_from_raw_data(
+        data, query, location_model, store=get_location_store(self, data), projection=projection
+    )
 
 
-def json_db_get_locations(self, query, location_model):
+def json_db_get_locations(self, query, location_model, projection=None):
     """Retrieve filtered locations from in-memory JSON database."""
-    return get_locations_list_from_raw_data(self.data, query, location_model)
+    return get_locations_list_from_raw_data(
+        self.data,
+        query,
+        location_model,
+        store=get_location_store(self, self.data),
+        projection=projection,
+    )
 
 
-def mongodb_db_get_locations(self, query, location_model):
-    """Retrieve filtered locations from MongoDB."""
-    mongo_query = {}
-    for key, values in query.items():
-        if values:
-            mongo_query[key] = {"$in": values}
+def mongodb_db_get_locations(self, query, location_model, projection=None):
+    """Retrieve filtered locations from MongoDB.
+
+    With a projection only those fields are fetched, and documents are returned
+    as dicts without validation, since they were validated when written.
 
-    projection = {"_id": 0, "uuid": 1, "position": 1, "remark": 1}
-    data = self.db.locations.find(mongo_query, projection)
+    Every query parameter other than those in LOCATION_QUERY_PARAMS filters on the
+    location field of that name; the parameters the API uses for rendering are
+    ignored. 'lat', 'lon', 'radius_km' and 'limit' work as for the JSON backends:
+    the collection is queried for the latitude band the radius covers, and the
+    distance filter, the sort by distance and the limit are applied to the result.
+
+    The ``_id``s of the documents matching each category filter are cached per
+    canonical filter until the shared data version changes, and a cached filter
+    is answered by fetching those documents by ``_id``. Only the ids are cached,
+    and coordinates are not part of the key: a query with coordinates uses the
+    ids cached for its filter, but only queries without coordinates cache them.
+    The data version is only bumped by writes made through goodmap, so cached
+    ids never reflect documents added, removed or changed directly in the
+    collection.
+    """
+    filter_keys = [key for key in query if key not in MONGODB_NON_FILTER_PARAMS]
+    canonical = dict(canonical_query(query, filter_keys))
+    filters = tuple((key, canonical[key]) for key in sorted(filter_keys) if key in canonical)
+    try:
+        coordinates = query_coordinates(canonical)
+    except ValueError:
+        coordinates = None
+    radius = query_radius(canonical)
+    band = {}
+    fields = {"_id": 0, **dict.fromkeys(projection or BASIC_INFO_PROJECTION, 1)}
+    if coordinates is not None:
+        fields["position"] = 1
+        if radius is not None:
+            band = _mongodb_latitude_band(coordinates[0], radius)
+
+    data = _mongodb_find_filtered(self, filters, band, fields, cache_ids=coordinates is None)
+    data = limit(sort_by_distance(within_radius(data, canonical), canonical), canonical)
+    if projection is not None:
+        return (
+            {field: doc[field] for field in projection if doc.get(field) is not None}
+            for doc in data
+        )
     return (LocationBase.model_validate(loc) for loc in data)
 
 
+def _mongodb_find_filtered(self, filters, band, fields, cache_ids):
+    """Return the documents matching category filters and a latitude band, in collection order.
+
+    Args:
+        self: MongoDB database instance
+        filters: Canonical category filters, as (field, values) tuples
+        band: Latitude band filter, see _mongodb_latitude_band
+        fields: MongoDB projection of the documents
+        cache_ids: Whether to cache the ids matching ``filters`` on a cache miss
+
+    Returns:
+        List of documents, without their ``_id``
+    """
+    mongo_query: dict[str, Any] = {key: {"$in": list(values)} for key, values in filters}
+    if not filters:
+        return list(self.db.locations.find({**mongo_query, **band}, fields))
+
+    cache = _mongodb_query_results(self)
+    version = mongodb_db_get_data_version(self)
+    ids = cache.get(version, filters)
+    if ids is None and not cache_ids:
+        return list(self.db.locations.find({**mongo_query, **band}, fields))
+
+    if ids is None:
+        docs = list(self.db.locations.find(mongo_query, {**fields, "_id": 1}))
+        if len(docs) <= MONGODB_CACHED_IDS_MAX:
+            cache.put(version, filters, tuple(doc["_id"] for doc in docs))
+    else:
+        found = self.db.locations.find({"_id": {"$in": list(ids)}, **band}, {**fields, "_id": 1})
+        by_id = {doc["_id"]: doc for doc in found}
+        docs = [by_id[doc_id] for doc_id in ids if doc_id in by_id]
+    return [{key: value for key, value in doc.items() if key != "_id"} for doc in docs]
+
+
+def _mongodb_latitude_band(lat, radius):
+    """Return a filter for the latitudes within ``radius`` kilometres of ``lat``.
+
+    Positions are stored as [latitude, longitude] arrays.
+    """
+    band = math.degrees(radius / EARTH_RADIUS_KM)
+    if lat - band <= -90 and lat + band >= 90:
+        return {}
+    return {"position.0": {"$gte": lat - band, "$lte": lat + band}}
+
+
+def _mongodb_query_results(db):
+    """Return the cache of the ids matching get_locations filters attached to ``db``."""
+    cache = getattr(db, "_goodmap_query_results", None)
+    if cache is None:
+        cache = db._goodmap_query_results = VersionedLRUCache(max_entries=QUERY_RESULT_CACHE_SIZE)
+    return cache
+
+
 def get_locations(db, location_model):
     """Dispatch to the backend-specific get_locations function."""
     return partial(globals()[f"{db.module_name}_get_locations"], location_model=location_model)
@@ -785,22 +1579,34 @@ def google_json_db_get_locations_paginated(self, query, location_model):
     """Google JSON locations with improved pagination."""
     # Get all locations from raw data
     data = self.data.get("map", {})
-    all_locations = list(get_locations_list_from_raw_data(data, query, location_model))
+    all_locations = list(
+        get_locations_list_from_raw_data(
+            data, query, location_model, store=get_location_store(self, data)
+        )
+    )
     return PaginationHelper.create_paginated_response(all_locations, query)
 
 
 def json_db_get_locations_paginated(self, query, location_model):
     """JSON locations with improved pagination."""
     # Get all locations from raw data
-    all_locations = list(get_locations_list_from_raw_data(self.data, query, location_model))
+    all_locations = list(
+        get_locations_list_from_raw_data(
+            self.data, query, location_model, store=get_location_store(self, self.data)
+        )
+    )
     return PaginationHelper.create_paginated_response(all_locations, query)
 
 
 def json_file_db_get_locations_paginated(self, query, location_model):
     """JSON file locations with improved pagination."""
-    data = FileIOHelper.get_data_from_file(self.data_file_path)
+    data = _json_file_load(self).get("map", {})
     # Get all locations from raw data
-    all_locations = list(get_locations_list_from_raw_data(data, query, location_model))
+    all_locations = list(
+        get_locations_list_from_raw_data(
+            data, query, location_model, store=get_location_store(self, data)
+        )
+    )
     return PaginationHelper.create_paginated_response(all_locations, query)
 
 
@@ -863,20 +1669,23 @@ def json_file_db_add_location(self, location_data, location_model):
         LocationAlreadyExistsError: If a location with the same UUID already exists.
     """
     location = location_model.model_validate(location_data)
-    with open(self.data_file_path, "r") as file:
-        json_file = json.load(file)
-
-    map_data = json_file["map"].get("data", [])
-    idx = next(
-        (i for i, point in enumerate(map_data) if point.get("uuid") == location_data["uuid"]), None
-    )
-    if idx is not None:
-        raise LocationAlreadyExistsError(location_data["uuid"])
-
-    map_data.append(location.model_dump())
-    json_file["map"]["data"] = map_data
+    entry = location.model_dump()
+
+    def add(json_file):
+        """Append the location and patch the LocationStore."""
+        if _find_location_row(self, json_file["map"], location_data["uuid"]) is not None:
+            raise LocationAlreadyExistsError(location_data["uuid"])
+        map_data = json_file["map"]
+        map_data.setdefault("data", [])
+        version = json_file_db_get_data_version(self)
+        previous_key = _location_store_key(version, map_data)
+        data = map_data["data"] = [*map_data["data"], entry]
+        _patch_location_store(
+            self, previous_key, partial(LocationStore.add, data=data), version, map_data
+        )
+        return [put_record("data", entry)]
 
-    json_file_atomic_dump(json_file, self.data_file_path)
+    _json_file_write(self, add)
 
 
 def json_db_add_location(self, location_data, location_model):
@@ -886,17 +1695,13 @@ def json_db_add_location(self, location_data, location_model):
         LocationAlreadyExistsError: If a location with the same UUID already exists.
     """
     location = location_model.model_validate(location_data)
-    idx = next(
-        (
-            i
-            for i, point in enumerate(self.data.get("data", []))
-            if point.get("uuid") == location_data["uuid"]
-        ),
-        None,
-    )
-    if idx is not None:
-        raise LocationAlreadyExistsError(location_data["uuid"])
-    self.data["data"].append(location.model_dump())
+    entry = location.model_dump()
+    with _JSON_DB_WRITE_LOCK:
+        if _find_location_row(self, self.data, location_data["uuid"]) is not None:
+            raise LocationAlreadyExistsError(location_data["uuid"])
+        previous_key = _location_store_key(json_db_get_data_version(self), self.data)
+        data = self.data["data"] = [*self.data["data"], entry]
+        _apply_location_change(self, previous_key, partial(LocationStore.add, data=data))
 
 
 def mongodb_db_add_location(self, location_data, location_model):
@@ -910,6 +1715,7 @@ def mongodb_db_add_location(self, location_data, location_model):
     if existing:
         raise LocationAlreadyExistsError(location_data["uuid"])
     self.db.locations.insert_one(location.model_dump())
+    _mongodb_bump_data_version(self)
 
 
 def add_location(db, location_data, location_model):
@@ -928,18 +1734,24 @@ def json_file_db_update_location(self, uuid, location_data, location_model):
         LocationNotFoundError: If no location with the given UUID exists.
     """
     location = location_model.model_validate(location_data)
-    with open(self.data_file_path, "r") as file:
-        json_file = json.load(file)
-
-    map_data = json_file["map"].get("data", [])
-    idx = next((i for i, point in enumerate(map_data) if point.get("uuid") == uuid), None)
-    if idx is None:
-        raise LocationNotFoundError(uuid)
-
-    map_data[idx] = location.model_dump()
-    json_file["map"]["data"] = map_data
+    entry = location.model_dump()
+
+    def update(json_file):
+        """Replace the location and patch the LocationStore."""
+        map_data = json_file["map"]
+        idx = _find_location_row(self, map_data, uuid)
+        if idx is None:
+            raise LocationNotFoundError(uuid)
+        version = json_file_db_get_data_version(self)
+        previous_key = _location_store_key(version, map_data)
+        data = map_data["data"] = list(map_data["data"])
+        data[idx] = entry
+        _patch_location_store(
+            self, previous_key, partial(LocationStore.update, data=data, row=idx), version, map_data
+        )
+        return [put_record("data", entry)]
 
-    json_file_atomic_dump(json_file, self.data_file_path)
+    _json_file_write(self, update)
 
 
 def json_db_update_location(self, uuid, location_data, location_model):
@@ -949,12 +1761,16 @@ def json_db_update_location(self, uuid, location_data, location_model):
         LocationNotFoundError: If no location with the given UUID exists.
     """
     location = location_model.model_validate(location_data)
-    idx = next(
-        (i for i, point in enumerate(self.data.get("data", [])) if point.get("uuid") == uuid), None
-    )
-    if idx is None:
-        raise LocationNotFoundError(uuid)
-    self.data["data"][idx] = location.model_dump()
+    with _JSON_DB_WRITE_LOCK:
+        idx = _find_location_row(self, self.data, uuid)
+        if idx is None:
+            raise LocationNotFoundError(uuid)
+        previous_key = _location_store_key(json_db_get_data_version(self), self.data)
+        data = self.data["data"] = list(self.data["data"])
+        data[idx] = location.model_dump()
+        _apply_location_change(
+            self, previous_key, partial(LocationStore.update, data=data, row=idx)
+        )
 
 
 def mongodb_db_update_location(self, uuid, location_data, location_model):
@@ -967,6 +1783,7 @@ def mongodb_db_update_location(self, uuid, location_data, location_model):
     result = self.db.locations.update_one({"uuid": uuid}, {"$set": location.model_dump()})
     if result.matched_count == 0:
         raise LocationNotFoundError(uuid)
+    _mongodb_bump_data_version(self)
 
 
 def update_location(db, uuid, location_data, location_model):
@@ -984,18 +1801,22 @@ def json_file_db_delete_location(self, uuid):
     Raises:
         LocationNotFoundError: If no location with the given UUID exists.
     """
-    with open(self.data_file_path, "r") as file:
-        json_file = json.load(file)
-
-    map_data = json_file["map"].get("data", [])
-    idx = next((i for i, point in enumerate(map_data) if point.get("uuid") == uuid), None)
-    if idx is None:
-        raise LocationNotFoundError(uuid)
 
-    del map_data[idx]
-    json_file["map"]["data"] = map_data
+    def delete(json_file):
+        """Remove the location and patch the LocationStore."""
+        map_data = json_file["map"]
+        idx = _find_location_row(self, map_data, uuid)
+        if idx is None:
+            raise LocationNotFoundError(uuid)
+        version = json_file_db_get_data_version(self)
+        previous_key = _location_store_key(version, map_data)
+        data = map_data["data"] = [*map_data["data"][:idx], *map_data["data"][idx + 1 :]]
+        _patch_location_store(
+            self, previous_key, partial(LocationStore.delete, data=data, row=idx), version, map_data
+        )
+        return [delete_record("data", uuid)]
 
-    json_file_atomic_dump(json_file, self.data_file_path)
+    _json_file_write(self, delete)
 
 
 def json_db_delete_location(self, uuid):
@@ -1004,12 +1825,15 @@ def json_db_delete_location(self, uuid):
     Raises:
         LocationNotFoundError: If no location with the given UUID exists.
     """
-    idx = next(
-        (i for i, point in enumerate(self.data.get("data", [])) if point.get("uuid") == uuid), None
-    )
-    if idx is None:
-        raise LocationNotFoundError(uuid)
-    del self.data["data"][idx]
+    with _JSON_DB_WRITE_LOCK:
+        idx = _find_location_row(self, self.data, uuid)
+        if idx is None:
+            raise LocationNotFoundError(uuid)
+        previous_key = _location_store_key(json_db_get_data_version(self), self.data)
+        data = self.data["data"] = [*self.data["data"][:idx], *self.data["data"][idx + 1 :]]
+        _apply_location_change(
+            self, previous_key, partial(LocationStore.delete, data=data, row=idx)
+        )
 
 
 def mongodb_db_delete_location(self, uuid):
@@ -1021,6 +1845,7 @@ def mongodb_db_delete_location(self, uuid):
     result = self.db.locations.delete_one({"uuid": uuid})
     if result.deleted_count == 0:
         raise LocationNotFoundError(uuid)
+    _mongodb_bump_data_version(self)
 
 
 def delete_location(db, uuid):
@@ -1039,9 +1864,13 @@ def json_db_add_suggestion(self, suggestion_data):
 
 def json_file_db_add_suggestion(self, suggestion_data):
     """Add a suggestion to the JSON file database with 'pending' status."""
-    CRUDHelper.add_item_to_json_file_db(
-        self.data_file_path, "suggestions", suggestion_data, "pending"
-    )
+
+    def add(json_file):
+        """Append the suggestion as pending."""
+        CRUDHelper.add_item_to_json_db(json_file["map"], "suggestions", suggestion_data, "pending")
+        return [put_record("suggestions", json_file["map"]["suggestions"][-1])]
+
+    _json_file_write(self, add)
 
 
 def mongodb_db_add_suggestion(self, suggestion_data):
@@ -1084,8 +1913,7 @@ def json_db_get_suggestions_paginated(self, query):
 
 def json_file_db_get_suggestions(self, query_params):
     """Return suggestions from JSON file database, optionally filtered by status."""
-    with open(self.data_file_path, "r") as file:
-        json_file = json.load(file)
+    json_file = _json_file_load(self)
 
     suggestions = json_file["map"].get("suggestions", [])
 
@@ -1098,8 +1926,7 @@ def json_file_db_get_suggestions(self, query_params):
 
 def json_file_db_get_suggestions_paginated(self, query):
     """JSON file suggestions with improved pagination."""
-    with open(self.data_file_path, "r") as file:
-        json_file = json.load(file)
+    json_file = _json_file_load(self)
 
     suggestions = json_file["map"].get("suggestions", [])
     return PaginationHelper.create_paginated_response(suggestions, query)
@@ -1184,8 +2011,7 @@ def json_db_get_suggestion(self, suggestion_id):
 
 def json_file_db_get_suggestion(self, suggestion_id):
     """Return a single suggestion by UUID from JSON file database."""
-    with open(self.data_file_path, "r") as file:
-        json_file = json.load(file)
+    json_file = _json_file_load(self)
     return next(
         (s for s in json_file["map"].get("suggestions", []) if s.get("uuid") == suggestion_id), None
     )
@@ -1231,20 +2057,22 @@ def json_file_db_update_suggestion(self, suggestion_id, status):
     Raises:
         ValueError: If no suggestion with the given UUID exists.
     """
-    with open(self.data_file_path, "r") as file:
-        json_file = json.load(file)
 
-    suggestions = json_file["map"].get("suggestions", [])
-    for s in suggestions:
-        if s.get("uuid") == suggestion_id:
-            s["status"] = status
-            break
-    else:
+    def update(json_file):
+        """Replace the suggestion with a copy with the new status."""
+        suggestions = json_file["map"].get("suggestions", [])
+        for idx, s in enumerate(suggestions):
+            if s.get("uuid") == suggestion_id:
+                updated = {**s, "status": status}
+                json_file["map"]["suggestions"] = [
+                    *suggestions[:idx],
+                    updated,
+                    *suggestions[idx + 1 :],
+                ]
+                return [put_record("suggestions", updated)]
         raise ValueError(f"Suggestion with uuid {suggestion_id} not found")
 
-    json_file["map"]["suggestions"] = suggestions
-
-    json_file_atomic_dump(json_file, self.data_file_path)
+    _json_file_write(self, update)
 
 
 def mongodb_db_update_suggestion(self, suggestion_id, status):
@@ -1293,18 +2121,17 @@ def json_file_db_delete_suggestion(self, suggestion_id):
     Raises:
         ValueError: If no suggestion with the given UUID exists.
     """
-    with open(self.data_file_path, "r") as file:
-        json_file = json.load(file)
 
-    suggestions = json_file["map"].get("suggestions", [])
-    idx = next((i for i, s in enumerate(suggestions) if s.get("uuid") == suggestion_id), None)
-    if idx is None:
-        raise ValueError(f"Suggestion with uuid {suggestion_id} not found")
+    def delete(json_file):
+        """Remove the suggestion."""
+        suggestions = json_file["map"].get("suggestions", [])
+        idx = next((i for i, s in enumerate(suggestions) if s.get("uuid") == suggestion_id), None)
+        if idx is None:
+            raise ValueError(f"Suggestion with uuid {suggestion_id} not found")
+        json_file["map"]["suggestions"] = [*suggestions[:idx], *suggestions[idx + 1 :]]
+        return [delete_record("suggestions", suggestion_id)]
 
-    del suggestions[idx]
-    json_file["map"]["suggestions"] = suggestions
-
-    json_file_atomic_dump(json_file, self.data_file_path)
+    _json_file_write(self, delete)
 
 
 def mongodb_db_delete_suggestion(self, suggestion_id):
@@ -1352,17 +2179,16 @@ def json_file_db_add_report(self, report_data):
     Raises:
         ValueError: If a report with the same UUID already exists.
     """
-    with open(self.data_file_path, "r") as file:
-        json_file = json.load(file)
-
-    reports = json_file["map"].get("reports", [])
-    if any(r.get("uuid") == report_data.get("uuid") for r in reports):
-        raise ValueError(f"Report with uuid {report_data['uuid']} already exists")
 
-    reports.append(report_data)
-    json_file["map"]["reports"] = reports
+    def add(json_file):
+        """Append the report unless its uuid is taken."""
+        reports = json_file["map"].get("reports", [])
+        if any(r.get("uuid") == report_data.get("uuid") for r in reports):
+            raise ValueError(f"Report with uuid {report_data['uuid']} already exists")
+        json_file["map"]["reports"] = [*reports, report_data]
+        return [put_record("reports", report_data)]
 
-    json_file_atomic_dump(json_file, self.data_file_path)
+    _json_file_write(self, add)
 
 
 def mongodb_db_add_report(self, report_data):
@@ -1417,8 +2243,7 @@ def json_db_get_reports_paginated(self, query):
 
 def json_file_db_get_reports(self, query_params):
     """Return reports from JSON file database, optionally filtered by status and priority."""
-    with open(self.data_file_path, "r") as file:
-        json_file = json.load(file)
+    json_file = _json_file_load(self)
 
     reports = json_file["map"].get("reports", [])
 
@@ -1435,7 +2260,7 @@ def json_file_db_get_reports(self, query_params):
 
 def json_file_db_get_reports_paginated(self, query):
     """JSON file reports with improved pagination."""
-    data = FileIOHelper.get_data_from_file(self.data_file_path)
+    data = _json_file_load(self).get("map", {})
     reports = data.get("reports", [])
     return PaginationHelper.create_paginated_response(reports, query)
 
@@ -1527,8 +2352,7 @@ def json_db_get_report(self, report_id):
 
 def json_file_db_get_report(self, report_id):
     """Return a single report by UUID from JSON file database."""
-    with open(self.data_file_path, "r") as file:
-        json_file = json.load(file)
+    json_file = _json_file_load(self)
 
     return next(
         (r for r in json_file["map"].get("reports", []) if r.get("uuid") == report_id), None
@@ -1578,23 +2402,22 @@ def json_file_db_update_report(self, report_id, status=None, priority=None):
     Raises:
         ReportNotFoundError: If no report with the given UUID exists.
     """
-    with open(self.data_file_path, "r") as file:
-        json_file = json.load(file)
 
-    reports = json_file["map"].get("reports", [])
-    for r in reports:
-        if r.get("uuid") == report_id:
-            if status:
-                r["status"] = status
-            if priority:
-                r["priority"] = priority
-            break
-    else:
+    def update(json_file):
+        """Replace the report with a copy with the new status and priority."""
+        reports = json_file["map"].get("reports", [])
+        for idx, r in enumerate(reports):
+            if r.get("uuid") == report_id:
+                updated = dict(r)
+                if status:
+                    updated["status"] = status
+                if priority:
+                    updated["priority"] = priority
+                json_file["map"]["reports"] = [*reports[:idx], updated, *reports[idx + 1 :]]
+                return [put_record("reports", updated)]
         raise ReportNotFoundError(report_id)
 
-    json_file["map"]["reports"] = reports
-
-    json_file_atomic_dump(json_file, self.data_file_path)
+    _json_file_write(self, update)
 
 
 def mongodb_db_update_report(self, report_id, status=None, priority=None):
@@ -1649,18 +2472,17 @@ def json_file_db_delete_report(self, report_id):
     Raises:
         ReportNotFoundError: If no report with the given UUID exists.
     """
-    with open(self.data_file_path, "r") as file:
-        json_file = json.load(file)
 
-    reports = json_file["map"].get("reports", [])
-    idx = next((i for i, r in enumerate(reports) if r.get("uuid") == report_id), None)
-    if idx is None:
-        raise ReportNotFoundError(report_id)
-
-    del reports[idx]
-    json_file["map"]["reports"] = reports
+    def delete(json_file):
+        """Remove the report."""
+        reports = json_file["map"].get("reports", [])
+        idx = next((i for i, r in enumerate(reports) if r.get("uuid") == report_id), None)
+        if idx is None:
+            raise ReportNotFoundError(report_id)
+        json_file["map"]["reports"] = [*reports[:idx], *reports[idx + 1 :]]
+        return [delete_record("reports", report_id)]
 
-    json_file_atomic_dump(json_file, self.data_file_path)
+    _json_file_write(self, delete)
 
 
 def mongodb_db_delete_report(self, report_id):
@@ -1705,6 +2527,9 @@ def extend_db_with_goodmap_queries(db, location_model):
     """
     db.extend("get_issue_options", get_issue_options(db))
     db.extend("get_data", get_data(db))
+    db.extend("get_data_version", get_data_version(db))
+    db.extend("get_shared_data_version", get_shared_data_version)
+    db.extend("get_config_version", get_config_version(db))
     db.extend("get_visible_data", get_visible_data(db))
     db.extend("get_meta_data", get_meta_data(db))
     db.extend("get_locations", get_locations(db, location_model))
@@ -1727,4 +2552,6 @@ def extend_db_with_goodmap_queries(db, location_model):
     db.extend("get_report", get_report(db))
     db.extend("update_report", update_report)
     db.extend("delete_report", delete_report)
+    if db.module_name == "json_file_db":
+        db.extend("transaction", json_file_db_transaction)
     return db
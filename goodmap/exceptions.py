@@ -98,3 +98,11 @@ class ReportNotFoundError(NotFoundError):
 
     def __init__(self, uuid: str):
         super().__init__(uuid, "Report")
+
+
+class ConcurrentModificationError(GoodmapError):
+    """Data file was changed by another writer during a transaction."""
+
+    def __init__(self, path: str):
+        self.path = path
+        super().__init__(f"Data file '{path}' was modified by another writer")
@@ -8,6 +8,10 @@ Flags:
     UseLazyLoading: Defer loading of location fields until they are needed,
         improving initial page load performance.
     EnableAdminPanel: Expose the admin panel for managing map data.
+    JsonFileJournal: Append json_file database mutations to a sidecar journal
+        instead of rewriting the whole data file on every change.
+    MongoConfigChangeStream: Follow a MongoDB change stream to pick up map_config
+        changes immediately instead of after the config snapshot expires.
 """
 
 from platzky import FeatureFlag
@@ -17,3 +21,9 @@ UseLazyLoading = FeatureFlag(
     alias="USE_LAZY_LOADING", description="Enable lazy loading of location fields"
 )
 EnableAdminPanel = FeatureFlag(alias="ENABLE_ADMIN_PANEL", description="Enable admin panel")
+JsonFileJournal = FeatureFlag(
+    alias="JSON_FILE_JOURNAL", description="Journal json_file database mutations"
+)
+MongoConfigChangeStream = FeatureFlag(
+    alias="MONGODB_CONFIG_CHANGE_STREAM", description="Watch MongoDB map_config for changes"
+)
@@ -20,10 +20,19 @@ from goodmap.config import GoodmapConfig
 from goodmap.core_api import core_pages
 from goodmap.data_models.location import create_location_model
 from goodmap.db import (
+    compact_json_file_journal,
+    enable_json_file_journal,
     extend_db_with_goodmap_queries,
     get_location_obligatory_fields,
+    watch_mongodb_config,
 )
-from goodmap.feature_flags import EnableAdminPanel, UseLazyLoading
+from goodmap.feature_flags import (
+    EnableAdminPanel,
+    JsonFileJournal,
+    MongoConfigChangeStream,
+    UseLazyLoading,
+)
+from goodmap.json_codec import FastJSONProvider
 
 logger = logging.getLogger(__name__)
 
@@ -140,6 +149,9 @@ def create_app_from_config(config: GoodmapConfig) -> platzky.Engine:
     if "MAX_CONTENT_LENGTH" not in app.config:
         app.config["MAX_CONTENT_LENGTH"] = 100 * 1024  # 100KB
 
+    # Render JSON responses with orjson when it is installed
+    app.json = FastJSONProvider(app)
+
     if app.is_enabled(UseLazyLoading):
         location_obligatory_fields, _, location_model, app.db = _setup_location_model(app.db)
     else:
@@ -147,6 +159,15 @@ def create_app_from_config(config: GoodmapConfig) -> platzky.Engine:
         location_model = create_location_model([], {})
         app.db = extend_db_with_goodmap_queries(app.db, location_model)
 
+    if app.db.module_name == "json_file_db":
+        if app.is_enabled(JsonFileJournal):
+            enable_json_file_journal(app.db)
+        else:
+            # Merge a journal left behind by a run with journaling enabled
+            compact_json_file_journal(app.db)
+    elif app.db.module_name == "mongodb_db" and app.is_enabled(MongoConfigChangeStream):
+        watch_mongodb_config(app.db)
+
     app.extensions["goodmap"] = {"location_obligatory_fields": location_obligatory_fields}
 
     field_renderers: dict[str, str] = {}
@@ -0,0 +1,81 @@
+"""JSON encoding and decoding with an optional fast backend.
+
+When `orjson <https://github.com/ijl/orjson>`_ is installed it is used to read and
+write the JSON file database and to render API responses; otherwise the standard
+library ``json`` module is used. Both produce equivalent JSON documents.
+"""
+
+import json
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def backend_name():
+    """Return the name of the JSON backend in use, ``"orjson"`` or ``"json"``."""
+    return "orjson" if orjson is not None else "json"
+
+
+def dumps(obj, sort_keys=False):
+    """Serialize ``obj`` to compact JSON bytes."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, separators=(",", ":"), sort_keys=sort_keys).encode()
+
+
+def loads(data):
+    """Deserialize JSON from ``str`` or ``bytes``."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dump(obj, file):
+    """Serialize ``obj`` as JSON to a file opened with :func:`write_mode`."""
+    if orjson is not None:
+        file.write(orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS))
+    else:
+        json.dump(obj, file)
+
+
+def load(file):
+    """Deserialize JSON from a file opened for reading (text or binary)."""
+    if orjson is not None:
+        return orjson.loads(file.read())
+    return json.load(file)
+
+
+def write_mode():
+    """Return the file mode :func:`dump` expects: binary for orjson, text otherwise."""
+    return "wb" if orjson is not None else "w"
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider rendering responses with orjson.
+
+    Output matches :class:`~flask.json.provider.DefaultJSONProvider`: keys are
+    sorted and values orjson does not handle natively, as well as dates (which
+    Flask renders as HTTP dates), go through the default provider's conversion.
+    Indented output (debug mode) is left to the default provider.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serialize ``obj`` to a JSON string."""
+        if orjson is None or kwargs.get("indent") is not None:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        """Deserialize JSON from ``str`` or ``bytes``."""
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
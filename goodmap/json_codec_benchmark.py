@@ -0,0 +1,88 @@
+"""Benchmark the available JSON backends on a data file.
+
+Compares the standard library ``json`` module with orjson (when installed) on
+the operations goodmap performs: parsing the data file, writing it back and
+rendering the location list returned by ``/api/locations``.
+
+Usage::
+
+    python -m goodmap.json_codec_benchmark path/to/data.json [--repeat N]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from collections.abc import Callable
+from functools import partial
+from typing import Any
+
+from goodmap import json_codec
+
+Operation = Callable[[Any], object]
+
+
+def _json_response(obj: Any) -> str:
+    """Render a response body the way the standard library backend does."""
+    return json.dumps(obj, separators=(",", ":"), sort_keys=True)
+
+
+def _backends() -> dict[str, dict[str, Operation]]:
+    """Return the operations to time for each available backend."""
+    backends: dict[str, dict[str, Operation]] = {
+        "json": {"load": json.loads, "dump": json.dumps, "response": _json_response}
+    }
+    if json_codec.backend_name() == "orjson":
+        backends["orjson"] = {
+            "load": json_codec.loads,
+            "dump": json_codec.dumps,
+            "response": partial(json_codec.dumps, sort_keys=True),
+        }
+    return backends
+
+
+def run_benchmark(raw, repeat=5):
+    """Time each backend on the given JSON file contents.
+
+    Args:
+        raw: Contents of a JSON file database as bytes.
+        repeat: Number of runs per operation; the best run is reported.
+
+    Returns:
+        Dict mapping backend name to a dict of operation name to seconds.
+    """
+    json_file = json.loads(raw)
+    locations = json_file.get("map", {}).get("data", [])
+    payloads = {"load": raw, "dump": json_file, "response": locations}
+    results = {}
+    for name, operations in _backends().items():
+        results[name] = {
+            operation: min(
+                timeit.repeat(lambda: func(payloads[operation]), number=1, repeat=repeat)
+            )
+            for operation, func in operations.items()
+        }
+    return results
+
+
+def main(argv=None):
+    """Run the benchmark from the command line and print a comparison table."""
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("data_file", help="JSON data file to benchmark on")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per operation")
+    args = parser.parse_args(argv)
+
+    with open(args.data_file, "rb") as file:
+        raw = file.read()
+    results = run_benchmark(raw, args.repeat)
+
+    print(f"{len(raw) / 1e6:.1f} MB, best of {args.repeat} runs (ms)")
+    print(f"{'backend':<10}" + "".join(f"{op:>12}" for op in results["json"]))
+    for name, timings in results.items():
+        print(f"{name:<10}" + "".join(f"{seconds * 1000:>12.1f}" for seconds in timings.values()))
+    if json_codec.backend_name() != "orjson":
+        print("orjson is not installed; install the fast-json extra to enable it", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
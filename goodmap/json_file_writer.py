@@ -0,0 +1,171 @@
+"""Write coordination for the JSON file database.
+
+Every json_file mutation is a read-modify-write of the whole data file (or an
+append to its journal). :class:`InterProcessLock` makes these cycles exclusive
+across threads and processes (e.g. gunicorn workers), so concurrent writers no
+longer overwrite each other's changes. :class:`WriteBatcher` groups mutations that
+arrive close together, so they share one read-modify-write and a single fsync.
+"""
+
+import os
+import threading
+import time
+from collections.abc import Callable
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+WRITE_BATCH_WINDOW = 0.002
+WRITE_BATCH_MAX_SIZE = 64
+
+
+class InterProcessLock:
+    """Exclusive, reentrant lock shared by all threads and processes writing a file.
+
+    The lock is an ``flock`` on the directory holding the file, because the file
+    itself is replaced on every write and cannot carry a lock. Where ``fcntl`` is
+    not available only threads of the current process are excluded.
+
+    Args:
+        file_path: Path of the file whose writes are guarded.
+    """
+
+    def __init__(self, file_path):
+        self.directory = os.path.dirname(os.path.abspath(file_path))
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd: int | None = None
+        self._owner: int | None = None
+
+    def held(self):
+        """Return whether the current thread holds the lock."""
+        return self._owner == threading.get_ident()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            if self._depth == 0 and fcntl is not None:
+                fd = os.open(self.directory, os.O_RDONLY)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                except BaseException:
+                    os.close(fd)
+                    raise
+                self._fd = fd
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        self._depth += 1
+        self._owner = threading.get_ident()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        try:
+            if self._depth == 0:
+                self._owner = None
+                if self._fd is not None:
+                    fd, self._fd = self._fd, None
+                    try:
+                        if fcntl is not None:
+                            fcntl.flock(fd, fcntl.LOCK_UN)
+                    finally:
+                        os.close(fd)
+        finally:
+            self._thread_lock.release()
+
+
+class PendingWrite:
+    """A mutation waiting in a :class:`WriteBatcher`.
+
+    Attributes:
+        operation: Callable applying the mutation.
+        error: Exception raised while committing the mutation, if any.
+        done: Whether the batch containing the mutation was committed.
+    """
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.error: BaseException | None = None
+        self.done = False
+
+
+class WriteBatcher:
+    """Group-commit mutations submitted by concurrent threads.
+
+    The first thread to submit becomes the leader: it waits up to ``window``
+    seconds (or until ``max_size`` mutations are queued) and then commits the whole
+    queue at once while the other submitters wait. Mutations queued during a commit
+    form the next batch.
+
+    Args:
+        commit: Callable receiving a list of :class:`PendingWrite`. It applies them,
+            setting ``error`` on those that fail, and persists the result once.
+            If it raises, every mutation of the batch fails with that exception.
+        window: Seconds the leader waits for more mutations before committing.
+        max_size: Number of queued mutations that triggers an immediate commit.
+    """
+
+    def __init__(
+        self,
+        commit: Callable[[list[PendingWrite]], object],
+        window=WRITE_BATCH_WINDOW,
+        max_size=WRITE_BATCH_MAX_SIZE,
+    ):
+        self.commit = commit
+        self.window = window
+        self.max_size = max_size
+        self._queue: list[PendingWrite] = []
+        self._committing = False
+        self._condition = threading.Condition()
+
+    def submit(self, operation):
+        """Queue a mutation and return once it is committed.
+
+        Raises:
+            Exception: Whatever applying or persisting the mutation raised.
+        """
+        pending = PendingWrite(operation)
+        with self._condition:
+            self._queue.append(pending)
+            self._condition.notify_all()
+            while not pending.done:
+                if self._committing:
+                    self._condition.wait()
+                    continue
+                self._committing = True
+                batch = self._collect_batch()
+                self._condition.release()
+                try:
+                    self._commit_batch(batch)
+                finally:
+                    self._condition.acquire()
+                    self._committing = False
+                    for item in batch:
+                        item.done = True
+                    self._condition.notify_all()
+        if pending.error is not None:
+            raise pending.error
+
+    def _collect_batch(self):
+        """Wait up to ``window`` for more writes, then take at most ``max_size`` of them."""
+        deadline = time.monotonic() + self.window
+        while len(self._queue) < self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._condition.wait(remaining)
+        batch = self._queue[: self.max_size]
+        del self._queue[: self.max_size]
+        return batch
+
+    def _commit_batch(self, batch):
+        """Commit a batch, giving its writes the error if committing failed."""
+        try:
+            self.commit(batch)
+        except BaseException as exc:
+            for item in batch:
+                if item.error is None:
+                    item.error = exc
@@ -0,0 +1,159 @@
+"""Append-only journal for the JSON file database.
+
+In journal mode a mutation does not rewrite the whole data file. It is appended
+as a JSON-lines record to a sidecar file next to it (``<data file>.journal``),
+and readers replay the journal over the data file. Once the journal grows past
+a size threshold it is compacted: the merged data is written to the data file
+and the journal is removed.
+
+Records are idempotent, so replaying a journal that was already merged into the
+data file (e.g. after a crash during compaction) gives the same result:
+
+* ``{"op": "put", "collection": ..., "item": {...}}`` replaces the item with the
+  same UUID, or appends it if there is none.
+* ``{"op": "delete", "collection": ..., "uuid": ...}`` removes the item with the
+  given UUID, if present.
+* ``{"op": "set", "key": ..., "value": ...}`` sets a top-level key of the file,
+  such as its version counter.
+
+Collections are lists of dicts in the file's ``map`` section.
+"""
+
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+
+from goodmap import json_codec
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_COMPACT_BYTES = 1024 * 1024
+
+_DELETED = object()
+
+
+@dataclass
+class Journal:
+    """Journal settings and state attached to a JSON file database.
+
+    Attributes:
+        path: Path of the journal file.
+        compact_bytes: Journal size that triggers a background compaction.
+        lock: Serializes writers and compaction within the process.
+        compacting: Whether a background compaction is currently running.
+    """
+
+    path: str
+    compact_bytes: int = JOURNAL_COMPACT_BYTES
+    lock: threading.RLock = field(default_factory=threading.RLock)
+    compacting: bool = False
+
+
+def put_record(collection, item):
+    """Return a journal record that inserts or replaces ``item`` in ``collection``."""
+    return {"op": "put", "collection": collection, "item": item}
+
+
+def delete_record(collection, uuid):
+    """Return a journal record that removes the item with ``uuid`` from ``collection``."""
+    return {"op": "delete", "collection": collection, "uuid": uuid}
+
+
+def set_record(key, value):
+    """Return a journal record that sets the top-level ``key`` of the file to ``value``."""
+    return {"op": "set", "key": key, "value": value}
+
+
+def append_records(path, records):
+    """Append records to a journal file and flush them to disk.
+
+    Returns:
+        Tuple ``(start, end)`` of the byte offsets the records were written at.
+    """
+    payload = b"".join(json_codec.dumps(record) + b"\n" for record in records)
+    with open(path, "a+b") as file:
+        start = file.tell()
+        if start and os.pread(file.fileno(), 1, start - 1) != b"\n":
+            # A previous writer died mid-record; keep our records on their own lines
+            file.write(b"\n")
+        file.write(payload)
+        file.flush()
+        os.fsync(file.fileno())
+        end = file.tell()
+    return start, end
+
+
+def read_records(path, offset=0):
+    """Read complete journal records starting at ``offset``.
+
+    A trailing line without a newline is a record still being written and is left
+    for the next read. Lines that are not valid JSON are logged and skipped.
+
+    Returns:
+        Tuple ``(records, offset)`` where ``offset`` is the position after the last
+        complete line. Both are empty/unchanged if the journal does not exist.
+    """
+    try:
+        with open(path, "rb") as file:
+            file.seek(offset)
+            chunk = file.read()
+    except FileNotFoundError:
+        return [], offset
+    complete = chunk.rfind(b"\n") + 1
+    records = []
+    for line in chunk[:complete].splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(json_codec.loads(line))
+        except ValueError:
+            logger.warning("Skipping malformed journal record in %s", path)
+    return records, offset + complete
+
+
+def apply_records(json_file, records):
+    """Apply journal records to the parsed contents of a JSON file database.
+
+    The top-level dict and the map section are changed in place. Collections are
+    replaced by changed copies, so lists shared with readers are left as they were.
+    """
+    map_data = json_file["map"]
+    positions = {}
+    touched = set()
+    for record in records:
+        if record.get("op") == "set":
+            json_file[record["key"]] = record["value"]
+            continue
+        name = record.get("collection")
+        if name not in positions:
+            map_data[name] = list(map_data.get(name, []))
+            positions[name] = _uuid_positions(map_data[name])
+        collection = map_data[name]
+        by_uuid = positions[name]
+        if record.get("op") == "put":
+            item = record["item"]
+            idx = by_uuid.get(item.get("uuid"))
+            if idx is None:
+                by_uuid[item.get("uuid")] = len(collection)
+                collection.append(item)
+            else:
+                collection[idx] = item
+        elif record.get("op") == "delete":
+            idx = by_uuid.pop(record.get("uuid"), None)
+            if idx is not None:
+                collection[idx] = _DELETED
+                touched.add(name)
+        else:
+            logger.warning("Skipping journal record with unknown op %r", record.get("op"))
+    for name in touched:
+        map_data[name] = [item for item in map_data[name] if item is not _DELETED]
+
+
+def _uuid_positions(collection):
+    """Map the uuids of a collection to the index of their first item."""
+    positions = {}
+    for idx, item in enumerate(collection):
+        positions.setdefault(item.get("uuid"), idx)
+    return positions
@@ -0,0 +1,160 @@
+"""In-process LRU cache for values derived from versioned data.
+
+Used for cluster indexes and tiles, category responses and query results. All
+entries of a cache belong to a single version (e.g. the data or config version)
+and are dropped together when a value of another version is stored, so a cache
+never returns anything built from outdated data.
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class VersionedLRUCache(Generic[K, V]):
+    """LRU cache whose entries all belong to one version.
+
+    Entries are evicted least recently used first once there are more than
+    ``max_entries`` of them, or once their total ``sizeof`` exceeds ``max_size``.
+    A ``None`` version means the version is unknown, and disables caching.
+
+    Attributes:
+        max_entries: Maximum number of entries, or None for no limit
+        max_size: Maximum total size of the entries, or None for no limit
+        size: Total size of the entries, as measured by ``sizeof``
+    """
+
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        max_size: int | None = None,
+        sizeof: Callable[[V], int] | None = None,
+    ):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.size = 0
+        self._sizeof = sizeof
+        self._version: Hashable | None = None
+        self._entries: OrderedDict[K, V] = OrderedDict()
+        self._building: dict[tuple[Hashable, K], Future[V]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, version: Hashable | None, key: K) -> V | None:
+        """Return the cached value for a key, or None if it is not cached.
+
+        Args:
+            version: Current version of the data the value is built from
+            key: Cache key
+
+        Returns:
+            Cached value or None
+        """
+        if version is None:
+            return None
+        with self._lock:
+            if version != self._version:
+                return None
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, version: Hashable | None, key: K, value: V) -> None:
+        """Store a value; a value larger than ``max_size`` is not stored.
+
+        Args:
+            version: Version the value was built from; ``None`` skips caching
+            key: Cache key
+            value: Value to cache; callers must not modify it afterwards
+        """
+        if version is None:
+            return
+        if self.max_size is not None and self._size_of(value) > self.max_size:
+            return
+        with self._lock:
+            self._switch_version(version)
+            self._store(key, value)
+
+    def get_or_build(self, version: Hashable | None, key: K, build: Callable[[], V]) -> V:
+        """Return the cached value for a key, building and storing it if needed.
+
+        Values are built without holding the cache lock, so a slow build does not
+        delay requests for other keys. Concurrent requests for a key that is being
+        built wait for that build instead of building it again, and get its
+        exception if it fails. ``None`` values are cached too.
+
+        Args:
+            version: Current version of the data; ``None`` builds without caching
+            key: Cache key
+            build: Callable returning the value for ``key``
+
+        Returns:
+            Cached or newly built value
+        """
+        if version is None:
+            return build()
+        with self._lock:
+            self._switch_version(version)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            building_key = (version, key)
+            future = self._building.get(building_key)
+            builds_here = future is None
+            if future is None:
+                future = self._building[building_key] = Future()
+        if not builds_here:
+            return future.result()
+
+        try:
+            value = build()
+        except BaseException as exc:
+            with self._lock:
+                del self._building[building_key]
+            future.set_exception(exc)
+            raise
+        with self._lock:
+            del self._building[building_key]
+            # A value built from outdated data is returned but not stored
+            if version == self._version:
+                self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self._version = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _size_of(self, value: V) -> int:
+        """Return the size of a value, 0 without a ``sizeof``."""
+        return self._sizeof(value) if self._sizeof is not None else 0
+
+    def _switch_version(self, version: Hashable) -> None:
+        """Drop all entries if they belong to another version; call with the lock held."""
+        if version != self._version:
+            self._entries.clear()
+            self.size = 0
+            self._version = version
+
+    def _store(self, key: K, value: V) -> None:
+        """Store a value and evict entries beyond the limits; call with the lock held."""
+        if key in self._entries:
+            self.size -= self._size_of(self._entries.pop(key))
+        self._entries[key] = value
+        self.size += self._size_of(value)
+        while (self.max_entries is not None and len(self._entries) > self.max_entries) or (
+            self.max_size is not None and self.size > self.max_size
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= self._size_of(evicted)
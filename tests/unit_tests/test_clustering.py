@@ -2,15 +2,25 @@
 
 from unittest import mock
 
+import pytest
+
 from goodmap.clustering import (
+    ClusterIndex,
+    cluster_uuid_zoom,
+    location_query_params,
+    make_cluster_uuid,
+    make_filter_key,
     map_clustering_data_to_proper_lazy_loading_object,
     match_clusters_uuids,
+    parse_bbox,
+    tile_bbox,
+    viewport_boxes,
 )
 
 
 def test_map_clustering_data_single_point():
     """Test mapping clustering data for a single point"""
-    input_data = [{"longitude": 50.0, "latitude": 60.0, "count": 1, "uuid": "test-uuid"}]
+    input_data = [{"longitude": 60.0, "latitude": 50.0, "count": 1, "uuid": "test-uuid"}]
 
     result = map_clustering_data_to_proper_lazy_loading_object(input_data)
 
@@ -24,7 +34,7 @@ def test_map_clustering_data_single_point():
 
 def test_map_clustering_data_cluster():
     """Test mapping clustering data for a cluster"""
-    input_data = [{"longitude": 50.0, "latitude": 60.0, "count": 5, "uuid": None}]
+    input_data = [{"longitude": 60.0, "latitude": 50.0, "count": 5, "uuid": None}]
 
     result = map_clustering_data_to_proper_lazy_loading_object(input_data)
 
@@ -36,36 +46,30 @@ def test_map_clustering_data_cluster():
     assert result[0]["position"] == [50.0, 60.0]
 
 
-def test_match_clusters_uuids_exact_match():
-    """Test matching cluster UUIDs with exact coordinate match"""
-    points = [
-        {"position": [50.0, 60.0], "uuid": "uuid-1"},
-        {"position": [51.0, 61.0], "uuid": "uuid-2"},
-    ]
+def test_match_clusters_uuids_by_id():
+    """Test matching single-point clusters to UUIDs by their SuperCluster id"""
+    uuids = ["uuid-1", "uuid-2"]
 
     clusters = [
-        {"longitude": 50.0, "latitude": 60.0, "count": 1},
-        {"longitude": 51.0, "latitude": 61.0, "count": 1},
+        {"id": 1, "longitude": 61.0, "latitude": 51.0, "count": 1},
+        {"id": 0, "longitude": 60.0, "latitude": 50.0, "count": 1},
     ]
 
-    result = match_clusters_uuids(points, clusters)
+    result = match_clusters_uuids(uuids, clusters)
 
-    assert result[0]["uuid"] == "uuid-1"
-    assert result[1]["uuid"] == "uuid-2"
+    assert result[0]["uuid"] == "uuid-2"
+    assert result[1]["uuid"] == "uuid-1"
 
 
 def test_match_clusters_uuids_multi_point_cluster():
     """Test that multi-point clusters don't get UUIDs assigned"""
-    points = [
-        {"position": [50.0, 60.0], "uuid": "uuid-1"},
-        {"position": [51.0, 61.0], "uuid": "uuid-2"},
-    ]
+    uuids = ["uuid-1", "uuid-2"]
 
     clusters = [
-        {"longitude": 50.5, "latitude": 60.5, "count": 5},  # Multi-point cluster
+        {"id": 2, "longitude": 60.5, "latitude": 50.5, "count": 2},  # Multi-point cluster
     ]
 
-    result = match_clusters_uuids(points, clusters)
+    result = match_clusters_uuids(uuids, clusters)
 
     # Multi-point cluster should not get a uuid assigned
     assert "uuid" not in result[0]
@@ -73,17 +77,14 @@ def test_match_clusters_uuids_multi_point_cluster():
 
 def test_match_clusters_uuids_no_match_warning():
     """Test that a warning is logged when no matching UUID is found for a single-point cluster"""
-    points = [
-        {"position": [50.0, 60.0], "uuid": "uuid-1"},
-    ]
+    uuids = ["uuid-1"]
 
-    # Cluster with coordinates far from any point
     clusters = [
-        {"longitude": 100.0, "latitude": 100.0, "count": 1},
+        {"id": 5, "longitude": 100.0, "latitude": 80.0, "count": 1},
     ]
 
     with mock.patch("goodmap.clustering.logger") as mock_logger:
-        result = match_clusters_uuids(points, clusters)
+        result = match_clusters_uuids(uuids, clusters)
 
         # Should have logged a warning
         mock_logger.warning.assert_called_once()
@@ -92,18 +93,232 @@ def test_match_clusters_uuids_no_match_warning():
         assert result[0]["uuid"] is None
 
 
-def test_match_clusters_uuids_floating_point_precision():
-    """Test that clusters within floating point threshold match correctly"""
+def test_cluster_index_keeps_co_located_points_apart():
+    """Test that points at the same position keep their own UUIDs"""
     points = [
         {"position": [50.0, 60.0], "uuid": "uuid-1"},
+        {"position": [50.0, 60.0], "uuid": "uuid-2"},
+        {"position": [50.0 + 1e-9, 60.0 + 1e-9], "uuid": "uuid-3"},
     ]
+    index = ClusterIndex(points, min_zoom=0, max_zoom=16, radius=200, extent=512)
 
-    # Cluster with tiny floating point difference
-    clusters = [
-        {"longitude": 50.0 + 1e-9, "latitude": 60.0 + 1e-9, "count": 1},
+    clusters = index.get_clusters(17)
+
+    assert sorted(c["uuid"] for c in clusters) == ["uuid-1", "uuid-2", "uuid-3"]
+
+
+def test_make_filter_key_ignores_order():
+    """Test that filter keys do not depend on parameter order"""
+    first = {"b": ["2", "1"], "a": ["x"]}
+    second = {"a": ["x"], "b": ["1", "2"]}
+
+    assert make_filter_key(first) == make_filter_key(second)
+    assert make_filter_key(first) != make_filter_key({"a": ["y"]})
+
+
+def test_location_query_params_strips_viewport_and_zoom():
+    """Test that zoom and viewport parameters are not used as location filters"""
+    query = {"zoom": ["3"], "bbox": ["0,0,1,1"], "north": ["1"], "a": ["x"]}
+
+    assert location_query_params(query) == {"a": ["x"]}
+
+
+def test_cluster_index_returns_points_with_uuids():
+    """Test that a ClusterIndex can be queried repeatedly at different zooms"""
+    points = [
+        {"position": [50.0, 50.0], "uuid": "uuid-1"},
+        {"position": [60.0, 60.0], "uuid": "uuid-2"},
     ]
+    index = ClusterIndex(points, min_zoom=0, max_zoom=16, radius=200, extent=512)
+
+    assert sorted(c["uuid"] for c in index.get_clusters(16)) == ["uuid-1", "uuid-2"]
+    assert [c["count"] for c in index.get_clusters(1)] == [2]
+
+
+@pytest.mark.parametrize(
+    "query,expected",
+    [
+        ({}, None),
+        ({"bbox": ["16.9,51.0,17.1,51.2"]}, (16.9, 51.0, 17.1, 51.2)),
+        (
+            {"north": ["51.2"], "south": ["51.0"], "east": ["17.1"], "west": ["16.9"]},
+            (16.9, 51.0, 17.1, 51.2),
+        ),
+    ],
+)
+def test_parse_bbox(query, expected):
+    """Test reading the viewport from bbox or separate bound parameters"""
+    assert parse_bbox(query) == expected
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        {"bbox": ["1,2,3"]},
+        {"bbox": ["a,b,c,d"]},
+        {"north": ["51.2"], "south": ["51.0"], "east": ["17.1"]},
+        {"bbox": ["0,10,1,5"]},
+        {"bbox": ["0,-91,1,5"]},
+        {"bbox": ["-181,0,1,5"]},
+    ],
+)
+def test_parse_bbox_invalid(query):
+    """Test that incomplete or out of range viewports are rejected"""
+    with pytest.raises(ValueError):
+        parse_bbox(query)
+
+
+def test_viewport_boxes_adds_margin():
+    """Test that the viewport is widened by the margin on every side"""
+    [(top_left, bottom_right)] = viewport_boxes((10.0, 40.0, 20.0, 50.0), margin=0.1)
+
+    assert top_left == pytest.approx((9.0, 51.0))
+    assert bottom_right == pytest.approx((21.0, 39.0))
+
+
+def test_viewport_boxes_splits_at_antimeridian():
+    """Test that viewports crossing the antimeridian are queried as two boxes"""
+    boxes = viewport_boxes((170.0, -10.0, -170.0, 10.0), margin=0)
+
+    assert boxes == [((170.0, 10.0), (180.0, -10.0)), ((-180.0, 10.0), (-170.0, -10.0))]
+
+
+def test_viewport_boxes_whole_world():
+    """Test that a viewport wider than the world covers all longitudes"""
+    boxes = viewport_boxes((-180.0, -90.0, 180.0, 90.0))
+
+    assert boxes == [((-180.0, 90.0), (180.0, -90.0))]
+
+
+def test_cluster_index_returns_only_points_in_viewport():
+    """Test that querying with a viewport skips points outside it"""
+    points = [
+        {"position": [51.1, 17.0], "uuid": "wroclaw"},
+        {"position": [52.2, 21.0], "uuid": "warsaw"},
+        {"position": [35.7, 139.7], "uuid": "tokyo"},
+    ]
+    index = ClusterIndex(points, min_zoom=0, max_zoom=16, radius=200, extent=512)
+
+    clusters = index.get_clusters(16, (16.5, 50.5, 17.5, 51.5))
+    assert [c["uuid"] for c in clusters] == ["wroclaw"]
+
+    clusters = index.get_clusters(16, (139.0, 35.0, 140.0, 36.0))
+    assert [c["uuid"] for c in clusters] == ["tokyo"]
+    assert clusters[0]["latitude"] == pytest.approx(35.7)
+
+
+def test_make_cluster_uuid_is_deterministic():
+    """Test that cluster identifiers depend only on the cluster itself"""
+    cluster = {"id": 7, "count": 5, "longitude": 60.0, "latitude": 50.0}
+
+    assert make_cluster_uuid(cluster) == make_cluster_uuid(dict(cluster))
+    assert make_cluster_uuid(cluster) != make_cluster_uuid({**cluster, "count": 6})
+    assert make_cluster_uuid(cluster) != make_cluster_uuid({**cluster, "latitude": 50.5})
+
+
+def test_make_cluster_uuid_holds_expansion_zoom():
+    """Test that the expansion zoom can be read back from a cluster identifier"""
+    cluster = {"id": 7, "count": 5, "longitude": 60.0, "latitude": 50.0, "expansion_zoom": 6}
+
+    assert cluster_uuid_zoom(make_cluster_uuid(cluster)) == 6
+    assert make_cluster_uuid(cluster) != make_cluster_uuid({**cluster, "expansion_zoom": 7})
+    assert cluster_uuid_zoom("unknown") is None
+
+
+def test_map_clustering_data_cluster_uuid_is_stable():
+    """Test that mapping the same clusters twice gives identical results"""
+    input_data = [{"id": 7, "longitude": 60.0, "latitude": 50.0, "count": 5, "uuid": None}]
+
+    first = map_clustering_data_to_proper_lazy_loading_object(input_data)
+    second = map_clustering_data_to_proper_lazy_loading_object(input_data)
+
+    assert first == second
+
+
+def _grid_points():
+    return [
+        {"position": [50.0 + i * 0.01, 19.0 + j * 0.01], "uuid": f"uuid-{i}-{j}"}
+        for i in range(5)
+        for j in range(5)
+    ]
+
+
+def test_cluster_index_find_cluster():
+    """Test finding a cluster by identifier, also on an index that never served it"""
+    points = _grid_points()
+    index = ClusterIndex(points, min_zoom=0, max_zoom=16, radius=200, extent=512)
+    (cluster,) = index.get_clusters(5)
+    cluster_uuid = make_cluster_uuid(cluster)
+
+    fresh_index = ClusterIndex(points, min_zoom=0, max_zoom=16, radius=200, extent=512)
+    for found in (fresh_index.find_cluster(cluster_uuid), index.find_cluster(cluster_uuid)):
+        assert found is not None
+        assert found["count"] == 25
+    assert index.find_cluster("unknown") is None
+
+
+def test_cluster_index_find_cluster_clusters_one_zoom_level():
+    """Test that an unknown identifier is looked up at its own zoom level only, once"""
+    index = ClusterIndex(_grid_points(), min_zoom=0, max_zoom=16, radius=200, extent=512)
+    (cluster,) = index.get_clusters(5)
+    cluster_uuid = make_cluster_uuid(cluster)
+    fresh_index = ClusterIndex(_grid_points(), min_zoom=0, max_zoom=16, radius=200, extent=512)
+    unknown = make_cluster_uuid({**cluster, "count": 24})
+
+    with mock.patch(
+        "goodmap.clustering.match_clusters_uuids", wraps=match_clusters_uuids
+    ) as clustered:
+        found = fresh_index.find_cluster(cluster_uuid)
+        assert found is not None
+        assert found["count"] == 25
+        assert clustered.call_count == 1
+        assert fresh_index.find_cluster(unknown) is None
+        assert fresh_index.find_cluster(unknown) is None
+        too_deep = make_cluster_uuid({**cluster, "expansion_zoom": 40})
+        assert fresh_index.find_cluster(too_deep) is None
+        assert clustered.call_count == 1
+
+
+def test_cluster_index_expansion_zoom_capped_at_max_zoom():
+    """Test that points too close to ever split expand at max_zoom"""
+    points = [{"position": [50.0, 19.0], "uuid": "a"}, {"position": [50.0, 19.0], "uuid": "b"}]
+    index = ClusterIndex(points, min_zoom=0, max_zoom=16, radius=200, extent=512)
+    (cluster,) = index.get_clusters(16)
+    assert cluster["expansion_zoom"] > 16
+
+    assert index.expansion_zoom(cluster) == 16
+    assert [c["count"] for c in index.get_cluster_expansion(cluster)] == [2]
+    assert index.find_cluster(make_cluster_uuid(cluster)) == cluster
+
+
+def test_cluster_index_expansion_contains_all_points():
+    """Test that a cluster expands into clusters covering all of its points"""
+    points = [*_grid_points(), {"position": [-33.9, 151.2], "uuid": "sydney"}]
+    index = ClusterIndex(points, min_zoom=0, max_zoom=16, radius=200, extent=512)
+    (cluster,) = [c for c in index.get_clusters(5) if c["count"] > 1]
+
+    expansion = index.get_cluster_expansion(cluster)
+
+    assert sum(c["count"] for c in expansion) == 25
+    assert len(expansion) > 1
+    assert "sydney" not in [c.get("uuid") for c in expansion]
+
+
+def test_tile_bbox():
+    """Test slippy map tile bounds, with edge rows extended to the poles"""
+    assert tile_bbox(0, 0, 0) == (-180.0, -90.0, 180.0, 90.0)
+
+    west, south, east, north = tile_bbox(1, 1, 0)
+    assert (west, south, east, north) == (0.0, 0.0, 180.0, 90.0)
+
+    west, south, east, north = tile_bbox(2, 1, 1)
+    assert (west, east) == (-90.0, 0.0)
+    assert south == pytest.approx(0.0)
+    assert north == pytest.approx(66.51326)
 
-    result = match_clusters_uuids(points, clusters)
 
-    # Should match despite tiny floating point difference
-    assert result[0]["uuid"] == "uuid-1"
+@pytest.mark.parametrize("z,x,y", [(0, 1, 0), (1, 0, 2), (2, -1, 0)])
+def test_tile_bbox_outside_grid(z, x, y):
+    """Test that tiles outside the grid are rejected"""
+    with pytest.raises(ValueError):
+        tile_bbox(z, x, y)
@@ -1,4 +1,23 @@
-from goodmap.core import does_fulfill_requirement, get_queried_data, limit, sort_by_distance
+from typing import cast
+from unittest import mock
+
+import numpy
+import pytest
+
+from goodmap.core import (
+    LocationStore,
+    add_distances,
+    canonical_query,
+    compile_requirements,
+    does_fulfill_requirement,
+    get_queried_data,
+    haversine_km,
+    limit,
+    sort_by_distance,
+    within_radius,
+)
+from goodmap.data_models.location import LocationBase, create_location_model
+from goodmap.exceptions import LocationValidationError
 
 test_data = [
     {
@@ -65,6 +84,54 @@ def test_category_match_if_not_specified():
     assert filtered_data == expected_data
 
 
+def _naive_requirement_check(entry, requirements):
+    return all(
+        all(value in entry[category] for value in values)
+        for category, values in requirements
+        if values
+    )
+
+
+@pytest.mark.parametrize(
+    "entry",
+    [
+        {"types": ["shoes", "clothes"], "gender": ["male"]},
+        {"types": "shoes and clothes", "gender": ["male", "female"]},
+        {"types": [{"nested": True}, "shoes"], "gender": ["female"]},
+        {"types": [], "gender": []},
+    ],
+)
+@pytest.mark.parametrize(
+    "requirements",
+    [
+        [("types", ["shoes"]), ("gender", ["male"])],
+        [("types", ["shoes", "clothes", "shoes"]), ("gender", None)],
+        [("types", []), ("gender", ["female"])],
+        [("types", None), ("gender", [])],
+    ],
+)
+def test_compiled_requirements_match_naive_check(entry, requirements):
+    assert does_fulfill_requirement(entry, requirements) == _naive_requirement_check(
+        entry, requirements
+    )
+
+
+def test_compiled_requirements_cached_by_normalized_query():
+    predicate = compile_requirements([("types", ["shoes", "clothes"]), ("gender", ["male"])])
+    assert predicate is compile_requirements(
+        [("gender", ["male", "male"]), ("types", ["clothes", "shoes"]), ("other", [])]
+    )
+    assert predicate is not compile_requirements([("types", ["shoes"])])
+
+
+def test_compiled_requirements_check_most_demanding_category_first():
+    predicate = compile_requirements([("gender", ["male"]), ("types", ["shoes", "clothes"])])
+    # 'gender' is never looked at, because the 'types' check already fails
+    assert predicate({"types": ["shoes"]}) is False
+    with pytest.raises(KeyError):
+        predicate({"types": ["shoes", "clothes"]})
+
+
 def test_that_limit_works_properly():
     test_data_15_items = [
         {
@@ -159,3 +226,329 @@ def test_that_limit_returns_data_when_query_params_are_corrupted():
     query_params = {"limit": ["1c0rupte0d"]}
     limit_data = limit(test_data, query_params)
     assert limit_data == expected_data
+
+
+store_test_data = [
+    {"name": "A", "position": [51.2, 17.1], "types": ["shoes"], "gender": ["male", "female"]},
+    {"name": "B", "position": [51.1, 17.05], "types": ["clothes"], "gender": ["male"]},
+    {"name": "C", "position": [51.0, 17.0], "types": ["clothes", "shoes"], "gender": []},
+    {"name": "D", "position": [51.1, 17.05], "types": "clothes shop", "gender": ["female"]},
+]
+store_test_categories = {"types": ["clothes", "shoes"], "gender": ["male", "female"]}
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        {},
+        {"types": ["clothes"]},
+        {"types": ["clothes", "shoes"]},
+        {"types": ["clothes"], "gender": ["female"]},
+        {"types": ["unknown"]},
+        {"types": []},
+        {"name": ["A"]},
+        {"lat": ["51.1"], "lon": ["17.05"]},
+        {"lat": ["51.1"], "lon": ["17.05"], "limit": ["2"], "gender": ["male"]},
+        {"lat": ["corrupted"], "lon": ["17.05"]},
+        {"limit": ["1"]},
+    ],
+)
+def test_location_store_query_matches_get_queried_data(query):
+    store = LocationStore(store_test_data, store_test_categories)
+    expected = get_queried_data(list(store_test_data), store_test_categories, query)
+    assert store.query(query) == expected
+
+
+def test_location_store_builds_position_array():
+    store = LocationStore(store_test_data, store_test_categories)
+    assert store.positions is not None
+    assert store.positions.dtype == numpy.float64
+    assert store.positions.shape == (4, 2)
+    assert store.positions[1].tolist() == [51.1, 17.05]
+
+
+def test_location_store_without_usable_positions():
+    data = [{"name": "A", "types": ["shoes"]}, {"name": "B", "position": [1, 2], "types": []}]
+    store = LocationStore(data, {"types": ["shoes"]})
+    assert store.positions is None
+    assert store.query({"types": ["shoes"], "lat": ["1"], "lon": ["2"]}) == [data[0]]
+
+
+def test_location_store_empty():
+    store = LocationStore([], store_test_categories)
+    assert store.query({"types": ["clothes"]}) == []
+
+
+def test_location_store_filters_by_intersecting_postings():
+    store = LocationStore(store_test_data, store_test_categories)
+    assert store.filter_indices({"types": ["shoes"]}).tolist() == [0, 2]
+    assert store.filter_indices({"types": ["shoes"], "gender": ["male"]}).tolist() == [0]
+    assert store.filter_indices({"types": ["clothes"]}).tolist() == [1, 2, 3]
+    assert store.filter_indices({"gender": ["unknown"], "types": ["clothes"]}).tolist() == []
+
+
+def test_location_store_add_update_delete():
+    data = [dict(entry) for entry in store_test_data]
+    store = LocationStore(data, store_test_categories)
+
+    data = [
+        *data,
+        {"name": "E", "position": [50.0, 16.0], "types": ["shoes"], "gender": ["male"]},
+    ]
+    store = store.add(data)
+    data = [{"name": "A2", "position": [52.0, 18.0], "types": ["clothes"], "gender": []}, *data[1:]]
+    store = store.update(data, 0)
+    data = [data[0], *data[2:]]
+    store = store.delete(data, 1)
+
+    fresh = LocationStore(data, store_test_categories)
+    for query in [
+        {"types": ["shoes"]},
+        {"types": ["clothes"]},
+        {"gender": ["male"]},
+        {"gender": ["female"], "types": ["clothes"]},
+        {"lat": ["51.1"], "lon": ["17.05"]},
+    ]:
+        assert store.query(query) == fresh.query(query)
+        assert store.query(query) == get_queried_data(list(data), store_test_categories, query)
+    assert store.positions is not None and fresh.positions is not None
+    assert store.positions.tolist() == fresh.positions.tolist()
+
+
+def _grid_store_data():
+    return [
+        {
+            "name": f"P{i}",
+            "position": [float(i % 7), float(i % 5)],
+            "types": ["shoes"] if i % 3 else ["clothes"],
+        }
+        for i in range(60)
+    ]
+
+
+@pytest.mark.parametrize("scan_max_rows", [0, 10_000])
+@pytest.mark.parametrize(
+    "query",
+    [
+        {"lat": ["3.2"], "lon": ["2"], "limit": ["5"]},
+        {"lat": ["3"], "lon": ["2"], "limit": ["4"]},
+        {"lat": ["0"], "lon": ["0"], "limit": ["9"], "types": ["clothes"]},
+        {"lat": ["6"], "lon": ["4"], "limit": ["0"]},
+        {"lat": ["6"], "lon": ["4"], "limit": ["100"], "types": ["shoes"]},
+        {"lat": ["3"], "lon": ["2"], "radius_km": ["250"]},
+        {"lat": ["3"], "lon": ["2"], "radius_km": ["250"], "limit": ["3"], "types": ["shoes"]},
+        {"lat": ["3"], "lon": ["2"], "radius_km": ["0"]},
+        {"lat": ["3"], "lon": ["2"], "radius_km": ["-1"], "limit": ["2"]},
+        {"lat": ["nan"], "lon": ["0"], "limit": ["1"]},
+        {"lat": ["inf"], "lon": ["0"], "limit": ["1"]},
+        {"lat": ["0"], "lon": ["-inf"], "radius_km": ["250"]},
+    ],
+)
+def test_location_store_nearest_matches_full_sort(query, scan_max_rows):
+    data = _grid_store_data()
+    store = LocationStore(data, {"types": ["clothes", "shoes"]})
+    with mock.patch("goodmap.core.KNN_SCAN_MAX_ROWS", scan_max_rows):
+        result = store.query(query)
+    assert result == get_queried_data(list(data), {"types": ["clothes", "shoes"]}, query)
+
+
+def test_location_store_spatial_index_follows_changes():
+    data = _grid_store_data()
+    store = LocationStore(data, {"types": ["clothes", "shoes"]})
+    query = {"lat": ["10"], "lon": ["10"], "limit": ["1"]}
+    with mock.patch("goodmap.core.KNN_SCAN_MAX_ROWS", 0):
+        assert store.query(query)[0]["name"] == "P34"
+        data = [*data, {"name": "new", "position": [10.0, 10.0], "types": []}]
+        new_store = store.add(data)
+        assert new_store.query(query)[0]["name"] == "new"
+        assert store.query(query)[0]["name"] == "P34"
+
+
+def test_location_store_changes_leave_previous_store_intact():
+    data = [dict(entry) for entry in store_test_data]
+    store = LocationStore(data, store_test_categories)
+    queries = [
+        {"types": ["shoes"]},
+        {"types": ["clothes"]},
+        {"gender": ["male"]},
+        {"lat": ["51.1"], "lon": ["17.05"]},
+    ]
+    before = [store.query(query) for query in queries]
+    assert store.positions is not None
+    positions = store.positions.copy()
+
+    store.delete(data[1:], 0)
+    store.update([{**data[0], "types": ["socks"], "position": [0, 0]}, *data[1:]], 0)
+    store.add([*data, {"name": "E", "position": [50.0, 16.0], "types": ["shoes"], "gender": []}])
+
+    assert [store.query(query) for query in queries] == before
+    assert store.positions.tolist() == positions.tolist()
+    assert store.find("missing") is None
+
+
+def test_haversine_km():
+    warsaw, krakow = (52.2297, 21.0122), (50.0647, 19.945)
+    assert haversine_km([krakow], *warsaw)[0] == pytest.approx(252.1, abs=0.5)
+    assert haversine_km([warsaw], *warsaw)[0] == 0.0
+
+
+def test_sort_by_distance_uses_great_circle_distance():
+    # One degree of longitude near the pole is much shorter than one degree of latitude
+    data = [
+        {"name": "south", "position": [79.0, 0.0]},
+        {"name": "east", "position": [80.0, 1.5]},
+    ]
+    sorted_data = sort_by_distance(data, {"lat": ["80"], "lon": ["0"]})
+    assert [x["name"] for x in sorted_data] == ["east", "south"]
+
+
+def test_within_radius():
+    data = [{"name": "near", "position": [51.11, 17.03]}, {"name": "far", "position": [52.2, 21.0]}]
+    query = {"lat": ["51.1"], "lon": ["17.0"], "radius_km": ["10"]}
+    assert [x["name"] for x in within_radius(data, query)] == ["near"]
+    assert within_radius(data, {**query, "radius_km": ["wide"]}) == data
+    assert within_radius(data, {"radius_km": ["10"]}) == data
+
+
+def test_query_with_radius():
+    query = {"lat": ["51.1"], "lon": ["17.05"], "radius_km": ["1"]}
+    result = get_queried_data(list(store_test_data), store_test_categories, query)
+    assert [x["name"] for x in result] == ["B", "D"]
+    assert LocationStore(store_test_data, store_test_categories).query(query) == result
+
+
+def test_add_distances():
+    data = [{"position": [51.1, 17.05]}, {"position": [51.2, 17.05]}]
+    add_distances(data, {"lat": ["51.1"], "lon": ["17.05"]})
+    assert data[0]["distance_km"] == 0.0
+    assert data[1]["distance_km"] == pytest.approx(11.12, abs=0.01)
+    assert add_distances([{"position": [1, 2]}], {}) == [{"position": [1, 2]}]
+
+
+def test_location_store_validates_each_location_once():
+    Location = create_location_model([], {})
+    data = [{"uuid": "a", "position": [1, 2]}, {"uuid": "b", "position": [3, 4]}]
+    store = LocationStore(data, {})
+    with mock.patch.object(Location, "model_validate", wraps=Location.model_validate) as validate:
+        first = cast(LocationBase, store.model(data[0], Location))
+        assert store.model(data[0], Location) is first
+        assert first.position == (1, 2)
+        assert validate.call_count == 1
+
+        data = [{"uuid": "a", "position": [5, 6]}, *data[1:]]
+        store = store.update(data, 0)
+        assert cast(LocationBase, store.model(data[0], Location)).position == (5, 6)
+        assert validate.call_count == 2
+
+    Other = create_location_model([("name", "str")], {})
+    with pytest.raises(LocationValidationError):
+        store.model(data[1], Other)
+
+
+def test_location_store_finds_rows_by_uuid():
+    data = [
+        {"uuid": "a", "position": [1, 2]},
+        {"uuid": "b", "position": [3, 4]},
+        {"uuid": "a", "position": [5, 6]},
+        {"position": [7, 8]},
+    ]
+    store = LocationStore(data, {})
+    assert store.find("a") == 0
+    assert store.find("b") == 1
+    assert store.find("missing") is None
+
+    data = [*data, {"uuid": "c", "position": [0, 0]}]
+    store = store.add(data)
+    data = data[1:]
+    store = store.delete(data, 0)
+    assert (store.find("a"), store.find("b"), store.find("c")) == (1, 0, 3)
+
+    data = [{"uuid": "d", "position": [3, 4]}, *data[1:]]
+    store = store.update(data, 0)
+    assert store.find("b") is None
+    assert store.find("d") == 0
+
+
+def test_canonical_query_ignores_order_duplicates_and_unknown_params():
+    categories = {"types": [], "gender": []}
+    key = canonical_query(
+        {
+            "types": ["shoes", "socks", "shoes"],
+            "gender": ["male"],
+            "format": ["columnar"],
+            "limit": ["5", "6"],
+            "lat": ["51.1"],
+            "lon": ["17.05"],
+            "sizes": [],
+        },
+        categories,
+    )
+    assert key == (
+        ("gender", ("male",)),
+        ("lat", ("51.1",)),
+        ("limit", ("5",)),
+        ("lon", ("17.05",)),
+        ("types", ("shoes", "socks")),
+    )
+    assert key == canonical_query(
+        {
+            "lon": ["17.05"],
+            "lat": ["51.1"],
+            "limit": ["5"],
+            "gender": ["male", "male"],
+            "types": ["socks", "shoes"],
+        },
+        categories,
+    )
+    assert canonical_query({"with_distance": ["true"], "types": []}, categories) == ()
+
+
+def test_get_queried_data_ignores_unknown_params_and_duplicate_values():
+    categories = {"types": [], "gender": []}
+    expected = get_queried_data(test_data, categories, {"types": ["shoes"]})
+    assert expected
+    assert (
+        get_queried_data(
+            test_data, categories, {"types": ["shoes", "shoes"], "format": ["columnar"]}
+        )
+        == expected
+    )
+
+
+def test_location_store_caches_query_rows():
+    data = [
+        {"uuid": "a", "position": [1, 2], "types": ["shoes"]},
+        {"uuid": "b", "position": [3, 4], "types": ["socks"]},
+    ]
+    store = LocationStore(data, {"types": []})
+    with mock.patch.object(
+        LocationStore, "filter_indices", autospec=True, side_effect=LocationStore.filter_indices
+    ) as filter_indices:
+        assert store.query({"types": ["shoes"]}) == [data[0]]
+        assert store.query({"types": ["shoes", "shoes"], "format": ["list"]}) == [data[0]]
+        assert filter_indices.call_count == 1
+
+        data = [*data, {"uuid": "c", "position": [5, 6], "types": ["shoes"]}]
+        added = store.add(data)
+        assert added.query({"types": ["shoes"]}) == [data[0], data[2]]
+        assert filter_indices.call_count == 2
+
+        data = data[1:]
+        deleted = added.delete(data, 0)
+        assert deleted.query({"types": ["shoes"]}) == [data[1]]
+        assert filter_indices.call_count == 3
+        assert added.query({"types": ["shoes"]})[0]["uuid"] == "a"
+        assert filter_indices.call_count == 3
+
+
+def test_location_store_caches_rows_without_positions():
+    data = [
+        {"uuid": "a", "position": [1, 2], "types": ["shoes"]},
+        {"uuid": "b", "types": ["shoes"]},
+        {"uuid": "c", "position": [0, 0], "types": ["socks"]},
+    ]
+    store = LocationStore(data, {"types": []})
+    query = {"lat": ["0"], "lon": ["0"], "limit": ["1"]}
+    expected = get_queried_data(data, {"types": []}, query)
+    assert store.query(query) == expected
+    assert store.query(query) == expected
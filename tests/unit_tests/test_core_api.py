@@ -2,10 +2,20 @@ import json
 from io import BytesIO
 from unittest import mock
 
+import pysupercluster
 import pytest
+from flask import jsonify, request
 
 from goodmap.config import GoodmapConfig
-from goodmap.core_api import get_or_none, make_tuple_translation
+from goodmap.core_api import (
+    basic_info,
+    get_or_none,
+    location_batches,
+    make_tuple_translation,
+    stream_json_array,
+)
+from goodmap.data_models.location import LocationBase
+from goodmap.db import BASIC_INFO_PROJECTION, project_location
 from goodmap.feature_flags import CategoriesHelp
 from goodmap.goodmap import create_app_from_config
 from tests.unit_tests.conftest import (
@@ -251,6 +261,88 @@ def test_get_locations(test_app):
     ]
 
 
+def test_get_locations_nearest_within_radius(test_app):
+    response = test_app.get("/api/locations?lat=59&lon=59&radius_km=500")
+    assert [x["uuid"] for x in response.json] == ["2"]
+
+    response = test_app.get("/api/locations?lat=59&lon=59&with_distance=true")
+    assert [x["uuid"] for x in response.json] == ["2", "1"]
+    assert response.json[0]["distance_km"] == pytest.approx(124.7, abs=0.1)
+
+
+def test_get_locations_is_streamed_like_jsonify(test_app):
+    response = test_app.get("/api/locations?lat=59&lon=59&with_distance=true")
+    assert response.is_streamed
+    assert response.mimetype == "application/json"
+
+    with test_app.application.test_request_context("/?lat=59&lon=59&with_distance=true"):
+        query_params = request.args.to_dict(flat=False)
+        all_locations = test_app.application.db.get_locations(
+            query_params, projection=BASIC_INFO_PROJECTION
+        )
+        locations = [x for batch in location_batches(all_locations, query_params) for x in batch]
+        assert response.get_data() == jsonify(locations).get_data()
+
+
+def test_get_locations_columnar(test_app):
+    response = test_app.get("/api/locations?format=columnar")
+    assert response.status_code == 200
+    assert response.json == {
+        "uuid": ["1", "2"],
+        "lat": [50, 60],
+        "lon": [50, 60],
+        "remark": [True, False],
+    }
+
+    response = test_app.get("/api/locations?format=columnar&lat=59&lon=59&with_distance=true")
+    assert response.json["uuid"] == ["2", "1"]
+    assert response.json["distance_km"][0] == pytest.approx(124.7, abs=0.1)
+
+
+def test_get_locations_invalid_format(test_app):
+    response = test_app.get("/api/locations?format=xml")
+    assert response.status_code == 400
+    assert response.json == {"message": "Format must be list or columnar"}
+
+
+def test_location_batches_add_distances_per_batch():
+    locations = [{"uuid": str(i), "position": [50 + i, 17]} for i in range(5)]
+    query_params = {"lat": ["50"], "lon": ["17"], "with_distance": ["true"]}
+
+    batches = list(location_batches(locations, query_params, batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0][0]["distance_km"] == 0
+    assert batches[2][0]["distance_km"] == pytest.approx(444.8, abs=0.1)
+
+
+@pytest.mark.parametrize(
+    "location",
+    [
+        {"uuid": "1", "position": [1, 2], "remark": "closed", "name": "one"},
+        {"uuid": "2", "position": [3.5, 4]},
+    ],
+)
+def test_basic_info_matches_location_model(location):
+    model = LocationBase.model_validate(location)
+    projected = project_location(model, BASIC_INFO_PROJECTION)
+    assert basic_info(projected) == model.basic_info()
+
+
+def test_locations_endpoints_fetch_projected_locations(test_app):
+    db = test_app.application.db
+    with mock.patch.object(db, "get_locations", wraps=db.get_locations) as mock_get_locations:
+        test_app.get("/api/locations")
+    assert mock_get_locations.call_args.kwargs == {"projection": BASIC_INFO_PROJECTION}
+
+
+@pytest.mark.parametrize("batches", [[], [[]], [[1], [], [2, 3]]])
+def test_stream_json_array(batches):
+    body = "".join(stream_json_array(batches, json.dumps))
+    assert json.loads(body) == [x for batch in batches for x in batch]
+    assert body.endswith("]\n")
+
+
 @mock.patch("goodmap.core_api.gettext", fake_translation)
 @mock.patch("goodmap.formatter.gettext", fake_translation)
 @mock.patch("flask_babel.gettext", fake_translation)
@@ -695,9 +787,10 @@ def test_location_clustering_empty_locations():
 
 def test_location_clustering_exception_handling(test_app):
     with mock.patch(
-        "goodmap.core_api.pysupercluster.SuperCluster", side_effect=Exception("Clustering failed")
+        "goodmap.clustering.pysupercluster.SuperCluster", side_effect=Exception("Clustering failed")
     ):
-        response = test_app.get("/api/locations-clustered?zoom=10")
+        # The unfiltered index is built at startup, filter to force a new build
+        response = test_app.get("/api/locations-clustered?zoom=10&test_category=test")
         assert response.status_code == 500
         assert "An error occurred during clustering" in response.json["message"]
 
@@ -712,16 +805,224 @@ def test_location_clustering_logs_on_invalid_parameter(test_app):
 def test_location_clustering_logs_on_exception(test_app):
     with (
         mock.patch(
-            "goodmap.core_api.pysupercluster.SuperCluster",
+            "goodmap.clustering.pysupercluster.SuperCluster",
             side_effect=Exception("Clustering failed"),
         ),
         mock.patch("goodmap.core_api.logger") as mock_logger,
     ):
-        test_app.get("/api/locations-clustered?zoom=10")
+        test_app.get("/api/locations-clustered?zoom=10&test_category=test")
         mock_logger.exception.assert_called_once()
         assert "Clustering operation failed" in mock_logger.exception.call_args[0][0]
 
 
+def test_location_clustering_with_viewport(test_app):
+    response = test_app.get("/api/locations-clustered?zoom=16&bbox=45,45,55,55")
+    assert response.status_code == 200
+    assert [item["uuid"] for item in response.json] == ["1"]
+    assert response.json[0]["position"] == pytest.approx([50, 50])
+
+    response = test_app.get("/api/locations-clustered?zoom=16&north=65&south=55&east=65&west=55")
+    assert [item["uuid"] for item in response.json] == ["2"]
+
+
+def test_location_clustering_invalid_viewport(test_app):
+    response = test_app.get("/api/locations-clustered?zoom=16&north=65&south=55")
+    assert response.status_code == 400
+    assert "Invalid parameters provided" in response.json["message"]
+
+
+def test_location_clustering_viewport_does_not_rebuild_index(test_app):
+    with mock.patch(
+        "goodmap.clustering.pysupercluster.SuperCluster",
+        wraps=pysupercluster.SuperCluster,
+    ) as mock_supercluster:
+        test_app.get("/api/locations-clustered?zoom=16&bbox=45,45,55,55&test_category=test")
+        test_app.get("/api/locations-clustered?zoom=16&bbox=55,55,65,65&test_category=test")
+        assert mock_supercluster.call_count == 1
+
+
+def test_location_clustering_reuses_index_between_requests(test_app):
+    with mock.patch(
+        "goodmap.clustering.pysupercluster.SuperCluster",
+        wraps=pysupercluster.SuperCluster,
+    ) as mock_supercluster:
+        test_app.get("/api/locations-clustered?zoom=1&test_category=test")
+        test_app.get("/api/locations-clustered?zoom=16&test_category=test")
+        assert mock_supercluster.call_count == 1
+
+        test_app.get("/api/locations-clustered?zoom=16&test_category=test2")
+        assert mock_supercluster.call_count == 2
+
+
+def test_location_clustering_index_rebuilt_after_location_change(test_app):
+    assert len(test_app.get("/api/locations-clustered?zoom=16").json) == 2
+
+    api_post(
+        test_app,
+        "/api/admin/locations",
+        {
+            "name": "new",
+            "position": [40, 40],
+            "test_category": ["test"],
+            "type_of_place": "test-place",
+        },
+    )
+
+    assert len(test_app.get("/api/locations-clustered?zoom=16").json) == 3
+
+
+def test_location_clustering_index_built_at_startup(test_app):
+    with mock.patch("goodmap.clustering.pysupercluster.SuperCluster") as mock_supercluster:
+        response = test_app.get("/api/locations-clustered?zoom=16")
+        assert response.status_code == 200
+        assert len(response.json) == 2
+        mock_supercluster.assert_not_called()
+
+
+def test_location_clustering_tile(test_app):
+    # Locations at (50, 50) and (60, 60) are both in tile 1/1/0 (north-east quarter)
+    response = test_app.get("/api/locations-clustered/1/1/0")
+    assert response.status_code == 200
+    assert response.json[0]["type"] == "cluster"
+    assert response.json[0]["cluster_count"] == 2
+    assert response.cache_control.public
+    assert response.cache_control.max_age == 60
+
+    assert test_app.get("/api/locations-clustered/1/0/0").json == []
+
+    response = test_app.get("/api/locations-clustered/16/0/0")
+    assert response.status_code == 200
+    assert response.json == []
+
+
+def test_location_clustering_tile_points_at_high_zoom(test_app):
+    # Tile containing (50, 50) at zoom 10
+    response = test_app.get("/api/locations-clustered/10/654/347")
+    assert response.status_code == 200
+    assert [item["uuid"] for item in response.json] == ["1"]
+
+
+def test_location_clustering_tile_body_matches_clustered_endpoint(test_app):
+    tile = test_app.get("/api/locations-clustered/0/0/0")
+    clustered = test_app.get("/api/locations-clustered?zoom=0")
+    assert tile.json
+    assert tile.get_data() == clustered.get_data()
+
+
+@pytest.mark.parametrize("path", ["17/0/0", "1/2/0", "1/0/2", "2/5/1"])
+def test_location_clustering_tile_validation(test_app, path):
+    response = test_app.get(f"/api/locations-clustered/{path}")
+    assert response.status_code == 400
+
+
+def test_location_clustering_tile_served_from_cache(test_app):
+    with mock.patch("goodmap.core_api.VersionedLRUCache.get_or_build") as mock_index_get:
+        # Low zoom tiles are warmed at startup
+        response = test_app.get("/api/locations-clustered/2/2/1")
+        assert response.status_code == 200
+        assert response.json[0]["cluster_count"] == 2
+        mock_index_get.assert_not_called()
+
+
+def test_location_clustering_tile_cache_invalidated_by_location_change(test_app):
+    assert test_app.get("/api/locations-clustered/1/0/1").json == []
+
+    api_post(
+        test_app,
+        "/api/admin/locations",
+        {
+            "name": "south-west",
+            "position": [-40, -40],
+            "test_category": ["test"],
+            "type_of_place": "test-place",
+        },
+    )
+
+    response = test_app.get("/api/locations-clustered/1/0/1")
+    assert response.json[0]["type"] == "point"
+
+
+def test_location_clustering_tile_exception_handling(test_app):
+    with mock.patch(
+        "goodmap.clustering.pysupercluster.SuperCluster", side_effect=Exception("Clustering failed")
+    ):
+        response = test_app.get("/api/locations-clustered/3/4/2?test_category=test")
+        assert response.status_code == 500
+
+
+def test_location_clustering_warm_failure_does_not_break_startup():
+    with (
+        mock.patch(
+            "goodmap.clustering.pysupercluster.SuperCluster",
+            side_effect=Exception("Clustering failed"),
+        ),
+        mock.patch("goodmap.core_api.logger") as mock_logger,
+    ):
+        test_app = create_test_app()
+        mock_logger.warning.assert_called_once()
+    assert test_app.get("/api/locations-clustered?zoom=16").status_code == 200
+
+
+def test_location_clustering_responses_are_deterministic(test_app):
+    first = test_app.get("/api/locations-clustered?zoom=1")
+    second = test_app.get("/api/locations-clustered?zoom=1")
+    assert first.data == second.data
+
+
+def test_cluster_expansion(test_app):
+    (cluster,) = test_app.get("/api/locations-clustered?zoom=1").json
+
+    response = test_app.get(f"/api/locations-clustered/cluster/{cluster['cluster_uuid']}")
+
+    assert response.status_code == 200
+    data = response.json
+    assert data["cluster_uuid"] == cluster["cluster_uuid"]
+    assert data["zoom"] > 1
+    assert sorted(x["uuid"] for x in data["clusters"]) == ["1", "2"]
+
+
+def test_cluster_expansion_zoom_capped_at_max_zoom():
+    location = {"name": "test", "test_category": ["test"], "type_of_place": "test-place"}
+    test_app = create_test_app(
+        db_overrides={
+            "data": [
+                {**location, "position": [50, 50], "uuid": "1"},
+                {**location, "position": [50, 50], "uuid": "2"},
+            ]
+        }
+    )
+    clusters = test_app.get("/api/locations-clustered?zoom=16").json
+    assert clusters is not None
+    (cluster,) = clusters
+
+    response = test_app.get(f"/api/locations-clustered/cluster/{cluster['cluster_uuid']}")
+
+    assert response.status_code == 200
+    data = response.json
+    assert data is not None
+    assert data["zoom"] == 16
+
+
+def test_cluster_expansion_unknown_cluster(test_app):
+    response = test_app.get("/api/locations-clustered/cluster/unknown")
+    assert response.status_code == 404
+    assert response.json["message"] == "Cluster not found"
+
+
+def test_cluster_expansion_empty_locations():
+    test_app = create_test_app(db_overrides={"data": []})
+    response = test_app.get("/api/locations-clustered/cluster/unknown")
+    assert response.status_code == 404
+
+
+def test_cluster_expansion_exception_handling(test_app):
+    with mock.patch(
+        "goodmap.clustering.pysupercluster.SuperCluster", side_effect=Exception("Clustering failed")
+    ):
+        response = test_app.get("/api/locations-clustered/cluster/unknown?test_category=test")
+        assert response.status_code == 500
+
+
 # --- Helper function tests ---
 
 
@@ -772,19 +1073,152 @@ def test_issue_options_defaults_to_empty_when_missing():
     assert db.get_issue_options() == []  # type: ignore[attr-defined]
 
 
-def test_get_locations_from_request_helper(test_app):
-    from goodmap.core_api import get_locations_from_request
+def test_location_batches_of_database_locations(test_app):
+    locations = test_app.application.db.get_locations({}, projection=BASIC_INFO_PROJECTION)
+    batches = list(location_batches(locations, {}, batch_size=1))
+
+    assert batches == [
+        [{"uuid": "1", "position": (50, 50), "remark": True}],
+        [{"uuid": "2", "position": (60, 60), "remark": False}],
+    ]
+
+
+# --- Conditional GET tests ---
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/api/locations",
+        "/api/locations?format=columnar",
+        "/api/locations-clustered?zoom=5",
+        "/api/locations-clustered/0/0/0",
+        "/api/categories",
+        "/api/categories-full",
+        "/api/category/test-category",
+    ],
+)
+def test_read_endpoints_answer_matching_etag_with_not_modified(test_app, path):
+    response = test_app.get(path)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
 
-    class MockArgs:
-        def to_dict(self, flat=False):
-            return {}
+    response = test_app.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.data == b""
+
+
+def test_location_etag(test_app):
+    location_id = test_app.get("/api/locations").json[0]["uuid"]
+    response = test_app.get(f"/api/location/{location_id}")
+    assert response.status_code == 200
+    response = test_app.get(
+        f"/api/location/{location_id}", headers={"If-None-Match": response.headers["ETag"]}
+    )
+    assert response.status_code == 304
+
+
+def test_location_etag_changes_with_config(test_app):
+    location_id = test_app.get("/api/locations").json[0]["uuid"]
+    etag = test_app.get(f"/api/location/{location_id}").headers["ETag"]
+    db = test_app.application.db
+
+    with mock.patch.object(db, "get_config_version", return_value="changed"):
+        response = test_app.get(f"/api/location/{location_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    with mock.patch.object(db, "get_config_version", return_value=None):
+        response = test_app.get(f"/api/location/{location_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+
+
+def test_not_modified_skips_view(test_app):
+    etag = test_app.get("/api/locations").headers["ETag"]
+    with mock.patch.object(test_app.application.db, "get_locations") as mock_get_locations:
+        response = test_app.get("/api/locations", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    mock_get_locations.assert_not_called()
+
+
+def test_etag_changes_after_location_change(test_app):
+    etag = test_app.get("/api/locations").headers["ETag"]
+    api_post(
+        test_app,
+        "/api/admin/locations",
+        {
+            "name": "new",
+            "position": [40, 40],
+            "test_category": ["test"],
+            "type_of_place": "test-place",
+        },
+    )
+
+    response = test_app.get("/api/locations", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(response.json) == 3
+
+
+def test_etag_depends_on_query_and_locale(test_app):
+    def etag(path):
+        return test_app.get(path).headers["ETag"]
+
+    path = "/api/locations?test_category=test&type_of_place=test-place"
+    assert etag("/api/locations?type_of_place=test-place&test_category=test") == etag(path)
+    assert etag("/api/locations?test_category=test2") != etag(path)
+    assert etag("/api/locations-clustered?zoom=5") != etag(path)
+    with mock.patch("goodmap.core_api.get_locale", return_value="pl"):
+        localized = etag(path)
+    assert localized != etag(path)
+
+
+def test_error_responses_have_no_etag(test_app):
+    response = test_app.get("/api/location/does-not-exist")
+    assert response.status_code == 404
+    assert "ETag" not in response.headers
+
+
+def test_no_etag_when_data_version_unknown(test_app):
+    with mock.patch.object(test_app.application.db, "get_shared_data_version", return_value=None):
+        response = test_app.get("/api/locations", headers={"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+
+
+# --- Category response cache tests ---
+
+
+@pytest.mark.parametrize(
+    "path", ["/api/categories", "/api/categories-full", "/api/category/test-category"]
+)
+def test_category_responses_cached_per_language(test_app, path):
+    db = test_app.application.db
+    with mock.patch.object(db, "get_category_data", wraps=db.get_category_data) as mock_data:
+        first = test_app.get(path)
+        assert test_app.get(path).data == first.data
+        assert mock_data.call_count == 1
+
+        with mock.patch("goodmap.core_api.get_locale", return_value="pl"):
+            assert test_app.get(path).status_code == 200
+        assert mock_data.call_count == 2
+
+
+def test_category_response_cache_invalidated_on_config_change(test_app):
+    db = test_app.application.db
+    first = test_app.get("/api/categories-full")
+    db.data["categories"] = {"other-category": ["x"]}
+
+    response = test_app.get(
+        "/api/categories-full", headers={"If-None-Match": first.headers["ETag"]}
+    )
+    assert response.status_code == 200
+    assert [c["key"] for c in response.json["categories"]] == ["other-category"]
 
-    mock_request_args = MockArgs()
 
-    with test_app.application.app_context():
-        locations = get_locations_from_request(test_app.application.db, mock_request_args)
-        assert isinstance(locations, list)
-        if locations:
-            assert isinstance(locations[0], dict)
-            assert "uuid" in locations[0]
-            assert "position" in locations[0]
+def test_category_response_cache_skips_errors(test_app):
+    with mock.patch.object(test_app.application.db, "get_category_data", side_effect=KeyError):
+        assert test_app.get("/api/categories-full").status_code == 500
+    assert test_app.get("/api/categories-full").status_code == 200
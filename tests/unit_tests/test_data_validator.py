@@ -0,0 +1,146 @@
+import json
+from typing import cast
+from unittest import mock
+
+import pytest
+from platzky.db.json_file_db import JsonFile
+
+from goodmap.data_models.location import (
+    VALIDATED_FOR_KEY,
+    LocationBase,
+    create_location_model,
+    location_model_fingerprint,
+)
+from goodmap.data_validator import main, validate_locations
+from goodmap.db import json_file_db_get_location, json_file_db_get_locations
+
+OBLIGATORY_FIELDS = [("name", "str"), ("kind", "list")]
+CATEGORIES = {"kind": ["a", "b"]}
+
+
+def _map_data(locations):
+    return {
+        "data": locations,
+        "categories": CATEGORIES,
+        "location_obligatory_fields": OBLIGATORY_FIELDS,
+    }
+
+
+VALID_LOCATIONS = [
+    {"uuid": str(i), "position": [i, i], "name": f"place {i}", "kind": ["a"]} for i in range(5)
+]
+
+INVALID_LOCATIONS = [
+    {"uuid": "1", "position": [1, 1], "name": "ok", "kind": ["a"]},
+    {"uuid": "2", "position": [100, 1], "name": "bad position", "kind": ["a"]},
+    {"uuid": "3", "position": [1, 1], "name": "bad kind", "kind": ["c"]},
+    {"uuid": "1", "position": [2, 2], "name": "duplicate", "kind": ["b"]},
+]
+
+
+def _write(tmp_path, locations, name="data.json"):
+    path = tmp_path / name
+    path.write_text(json.dumps({"map": _map_data(locations)}))
+    return path
+
+
+def test_validate_locations_accepts_valid_data():
+    report = validate_locations(_map_data(VALID_LOCATIONS), workers=1)
+    assert report.checked == 5
+    assert report.errors == []
+
+
+@pytest.mark.parametrize("workers, chunk_size", [(1, 1000), (2, 1)])
+def test_validate_locations_reports_errors_per_uuid(workers, chunk_size):
+    report = validate_locations(
+        _map_data(INVALID_LOCATIONS), workers=workers, chunk_size=chunk_size
+    )
+    assert [uuid for uuid, _ in report.errors] == ["2", "3", "1"]
+    assert report.errors[0][1].startswith("position.0:")
+    assert report.errors[1][1].startswith("kind")
+    assert report.errors[2][1] == "uuid is used by 2 locations"
+
+
+def test_main_exit_codes(tmp_path, capsys):
+    assert main([str(_write(tmp_path, VALID_LOCATIONS))]) == 0
+    assert "5 locations checked, 0 errors" in capsys.readouterr().out
+
+    assert main([str(_write(tmp_path, INVALID_LOCATIONS)), "--workers", "1"]) == 1
+    output = capsys.readouterr().out
+    assert "2: position.0:" in output
+    assert "4 locations checked, 3 errors" in output
+
+
+def test_main_rejects_invalid_model_configuration(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(
+        json.dumps(
+            {
+                "map": {
+                    "data": [],
+                    "categories": {"kind": []},
+                    "location_obligatory_fields": [["kind", "list"]],
+                }
+            }
+        )
+    )
+    assert main([str(path)]) == 2
+
+
+def test_snapshot_not_written_on_errors(tmp_path):
+    snapshot = tmp_path / "snapshot.json"
+    assert main([str(_write(tmp_path, INVALID_LOCATIONS)), "--snapshot", str(snapshot)]) == 1
+    assert not snapshot.exists()
+
+
+def test_snapshot_is_loaded_without_validation(tmp_path):
+    snapshot = tmp_path / "snapshot.json"
+    assert main([str(_write(tmp_path, VALID_LOCATIONS)), "--snapshot", str(snapshot)]) == 0
+    map_data = json.loads(snapshot.read_text())["map"]
+    assert map_data["data"][0] == {
+        "uuid": "0",
+        "position": [0.0, 0.0],
+        "name": "place 0",
+        "kind": ["a"],
+    }
+
+    Location = create_location_model(OBLIGATORY_FIELDS, CATEGORIES)
+    assert map_data[VALIDATED_FOR_KEY] == location_model_fingerprint(Location)
+    db = JsonFile(str(snapshot))
+    with mock.patch.object(Location, "model_validate") as validate:
+        locations = list(json_file_db_get_locations(db, {"kind": ["a"]}, Location))
+        location = json_file_db_get_location(db, "3", Location)
+    validate.assert_not_called()
+    assert len(locations) == 5
+    assert location is not None
+    assert cast(LocationBase, location).position == (3.0, 3.0)
+    assert location.model_dump() == {
+        "uuid": "3",
+        "position": (3.0, 3.0),
+        "name": "place 3",
+        "kind": ["a"],
+    }
+
+
+def test_snapshot_of_other_model_is_validated(tmp_path):
+    snapshot = tmp_path / "snapshot.json"
+    assert main([str(_write(tmp_path, VALID_LOCATIONS)), "--snapshot", str(snapshot)]) == 0
+
+    Location = create_location_model(OBLIGATORY_FIELDS, {"kind": ["a"]})
+    db = JsonFile(str(snapshot))
+    with mock.patch.object(Location, "model_validate", wraps=Location.model_validate) as validate:
+        list(json_file_db_get_locations(db, {}, Location))
+    assert validate.call_count == 5
+
+
+def test_location_model_fingerprint():
+    model = create_location_model(OBLIGATORY_FIELDS, CATEGORIES)
+    assert location_model_fingerprint(model) == location_model_fingerprint(
+        create_location_model(OBLIGATORY_FIELDS, {"kind": ["b", "a"]})
+    )
+    assert location_model_fingerprint(model) != location_model_fingerprint(
+        create_location_model(OBLIGATORY_FIELDS, {"kind": ["a"]})
+    )
+    assert location_model_fingerprint(model) != location_model_fingerprint(
+        create_location_model([("name", "str")], CATEGORIES)
+    )
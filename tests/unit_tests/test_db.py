@@ -1,5 +1,8 @@
 # pyright: reportArgumentType=false, reportCallIssue=false
+import copy
 import json
+import os
+import threading
 from typing import Any, cast
 from unittest import mock
 
@@ -9,25 +12,39 @@ from platzky.db.json_db import Json
 from platzky.db.json_file_db import JsonFile
 from platzky.db.mongodb_db import MongoDB
 
+from goodmap import json_codec
+from goodmap.core import LocationStore
 from goodmap.data_models.location import LocationBase, create_location_model
 from goodmap.db import (
+    BASIC_INFO_PROJECTION,
+    MONGODB_CONFIG_TTL,
+    CRUDHelper,
+    _json_file_writer,  # pyright: ignore[reportPrivateUsage]
     add_location,
     add_report,
     add_suggestion,
+    compact_json_file_journal,
     delete_location,
     delete_report,
     delete_suggestion,
+    enable_json_file_journal,
     extend_db_with_goodmap_queries,
+    get_config_version,
     get_data,
+    get_data_version,
     get_location_from_raw_data,
     get_location_obligatory_fields,
+    get_location_store,
+    get_shared_data_version,
     google_json_db_get_categories,
     google_json_db_get_category_data,
     google_json_db_get_data,
     google_json_db_get_location_obligatory_fields,
+    google_json_db_get_locations,
     google_json_db_get_locations_paginated,
     google_json_db_get_meta_data,
     google_json_db_get_visible_data,
+    invalidate_mongodb_config,
     json_db_add_location,
     json_db_add_report,
     json_db_add_suggestion,
@@ -37,7 +54,10 @@ from goodmap.db import (
     json_db_get_categories,
     json_db_get_category_data,
     json_db_get_data,
+    json_db_get_data_version,
+    json_db_get_location,
     json_db_get_location_obligatory_fields,
+    json_db_get_locations,
     json_db_get_report,
     json_db_get_reports,
     json_db_get_suggestion,
@@ -55,7 +75,9 @@ from goodmap.db import (
     json_file_db_get_categories,
     json_file_db_get_category_data,
     json_file_db_get_data,
+    json_file_db_get_data_version,
     json_file_db_get_location_obligatory_fields,
+    json_file_db_get_locations,
     json_file_db_get_locations_paginated,
     json_file_db_get_meta_data,
     json_file_db_get_report,
@@ -65,6 +87,7 @@ from goodmap.db import (
     json_file_db_get_suggestions,
     json_file_db_get_suggestions_paginated,
     json_file_db_get_visible_data,
+    json_file_db_transaction,
     json_file_db_update_location,
     json_file_db_update_report,
     json_file_db_update_suggestion,
@@ -76,7 +99,9 @@ from goodmap.db import (
     mongodb_db_delete_suggestion,
     mongodb_db_get_categories,
     mongodb_db_get_category_data,
+    mongodb_db_get_config_version,
     mongodb_db_get_data,
+    mongodb_db_get_data_version,
     mongodb_db_get_location,
     mongodb_db_get_location_obligatory_fields,
     mongodb_db_get_locations,
@@ -95,13 +120,17 @@ from goodmap.db import (
     update_location,
     update_report,
     update_suggestion,
+    watch_mongodb_config,
 )
 from goodmap.exceptions import (
     AlreadyExistsError,
+    ConcurrentModificationError,
     LocationAlreadyExistsError,
     LocationNotFoundError,
+    LocationValidationError,
     ReportNotFoundError,
 )
+from goodmap.json_file_writer import InterProcessLock
 
 data = {
     "data": [
@@ -127,7 +156,7 @@ def initialize_and_assert_db(db, data):
     assert location.position == (50, 50)
     assert location.uuid == "1"
 
-    assert len(db.get_locations(query)) == 2
+    assert len(list(db.get_locations(query))) == 2
     assert db.get_data() == data
 
 
@@ -151,7 +180,8 @@ def test_goodmap_google_json_db_extended(mock_cli):
     initialize_and_assert_db(db, data)
 
 
-@mock.patch("goodmap.db.json.dump")
+@mock.patch("goodmap.json_codec.orjson", None)
+@mock.patch("goodmap.json_codec.json.dump")
 @mock.patch("goodmap.db.tempfile.NamedTemporaryFile")
 @mock.patch("goodmap.db.os.fsync")
 @mock.patch("goodmap.db.os.replace")
@@ -384,6 +414,302 @@ def test_json_db_delete_location_not_found():
         json_db_delete_location(db, "1")
 
 
+def test_json_db_data_version_changes_on_location_mutations():
+    Location = create_location_model([], {})
+    db = Json({"data": []})
+    versions = [json_db_get_data_version(db)]
+    json_db_add_location(db, {"uuid": "1", "position": [1, 2]}, Location)
+    versions.append(json_db_get_data_version(db))
+    json_db_update_location(db, "1", {"uuid": "1", "position": [3, 4]}, Location)
+    versions.append(json_db_get_data_version(db))
+    json_db_delete_location(db, "1")
+    versions.append(json_db_get_data_version(db))
+    assert len(set(versions)) == 4
+
+
+def test_json_db_data_version_unchanged_on_failed_mutation():
+    db = Json({"data": []})
+    version = json_db_get_data_version(db)
+    with pytest.raises(LocationNotFoundError):
+        json_db_delete_location(db, "1")
+    assert json_db_get_data_version(db) == version
+
+
+def test_shared_data_version_of_in_memory_db_is_process_local():
+    Location = create_location_model([], {})
+    db = Json({"data": []})
+    version = get_shared_data_version(db)
+    assert version != json_db_get_data_version(db)
+    assert get_shared_data_version(Json({"data": []})) == version
+
+    json_db_add_location(db, {"uuid": "1", "position": [1, 2]}, Location)
+    assert get_shared_data_version(db) != version
+
+
+def test_shared_data_version_of_json_file_db_is_file_version(tmp_path):
+    db, file_path = _json_file_db(tmp_path, {"data": []})
+    assert get_shared_data_version(db) == json_file_db_get_data_version(db)
+    file_path.unlink()
+    assert get_shared_data_version(db) is None
+
+
+def test_json_db_config_version_changes_when_config_replaced():
+    db = Json({"data": [], "categories": {"kind": ["a"]}})
+    version = get_config_version(db)(db)
+    json_db_add_location(db, {"uuid": "1", "position": [1, 2]}, create_location_model([], {}))
+    assert get_config_version(db)(db) == version
+
+    db.data["categories"] = {"kind": ["a", "b"]}
+    assert get_config_version(db)(db) != version
+
+
+def test_json_file_db_config_version_follows_file(tmp_path):
+    db, _ = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    assert get_config_version(db)(db) == json_file_db_get_data_version(db)
+
+
+def test_json_db_location_store_rebuilt_when_locations_replaced():
+    Location = create_location_model([], {})
+    db = Json({"data": [{"uuid": "1", "position": [1, 2]}], "categories": {}})
+    store = get_location_store(db, db.data)
+    assert get_location_store(db, db.data) is store
+
+    db.data["data"] = [{"uuid": "1", "position": [1, 2]}, {"uuid": "2", "position": [3, 4]}]
+    new_store = get_location_store(db, db.data)
+    assert new_store is not store
+    locations = json_db_get_locations(db, {}, Location)
+    assert [cast(LocationBase, x).uuid for x in locations] == ["1", "2"]
+
+
+def test_json_db_location_store_patched_on_mutations():
+    Location = create_location_model([], {"kind": ["a", "b"]})
+    db = Json({"data": [], "categories": {"kind": ["a", "b"]}})
+    store = get_location_store(db, db.data)
+
+    with mock.patch("goodmap.db.LocationStore", wraps=LocationStore) as build_store:
+        json_db_add_location(db, {"uuid": "1", "position": [1, 2], "kind": ["a"]}, Location)
+        json_db_add_location(db, {"uuid": "2", "position": [3, 4], "kind": ["a", "b"]}, Location)
+        json_db_update_location(db, "1", {"uuid": "1", "position": [1, 2], "kind": ["b"]}, Location)
+        json_db_delete_location(db, "2")
+        locations = json_db_get_locations(db, {"kind": ["b"]}, Location)
+        assert [cast(LocationBase, x).uuid for x in locations] == ["1"]
+        assert list(json_db_get_locations(db, {"kind": ["a"]}, Location)) == []
+        build_store.assert_not_called()
+
+    # Stores are replaced, never changed, so readers of the old one are unaffected
+    assert len(store) == 0
+    assert get_location_store(db, db.data).data is db.data["data"]
+
+
+def test_json_db_reads_validate_each_location_once():
+    Location = create_location_model([], {})
+    db = Json({"data": [{"uuid": str(i), "position": [i, 0]} for i in range(3)], "categories": {}})
+    with mock.patch.object(Location, "model_validate", wraps=Location.model_validate) as validate:
+        assert len(list(json_db_get_locations(db, {}, Location))) == 3
+        assert len(list(json_db_get_locations(db, {}, Location))) == 3
+        assert cast(LocationBase, json_db_get_location(db, "1", Location)).position == (1, 0)
+        assert validate.call_count == 3
+
+        json_db_update_location(db, "1", {"uuid": "1", "position": [7, 7]}, Location)
+        assert cast(LocationBase, json_db_get_location(db, "1", Location)).position == (7, 7)
+        assert len(list(json_db_get_locations(db, {}, Location))) == 3
+        # One validation for the update itself, one for the replaced location
+        assert validate.call_count == 5
+
+
+_PROJECTION_DATA = {
+    "data": [
+        {"uuid": "1", "position": [1, 2], "name": "one", "remark": "closed"},
+        {"uuid": "2", "position": [3, 4], "name": "two"},
+    ],
+    "categories": {},
+}
+_PROJECTED_LOCATIONS = [
+    {"uuid": "1", "position": (1.0, 2.0), "remark": "closed"},
+    {"uuid": "2", "position": (3.0, 4.0)},
+]
+
+
+def test_json_db_get_locations_with_projection():
+    Location = create_location_model([("name", "str")], {})
+    db = Json(copy.deepcopy(_PROJECTION_DATA))
+    locations = json_db_get_locations(db, {}, Location, projection=BASIC_INFO_PROJECTION)
+    assert list(locations) == _PROJECTED_LOCATIONS
+
+
+def test_json_file_db_get_locations_with_projection(tmp_path):
+    Location = create_location_model([("name", "str")], {})
+    db, _ = _json_file_db(tmp_path, _PROJECTION_DATA)
+    locations = json_file_db_get_locations(db, {}, Location, projection=("uuid", "name"))
+    assert list(locations) == [{"uuid": "1", "name": "one"}, {"uuid": "2", "name": "two"}]
+
+
+@mock.patch("platzky.db.google_json_db.Client")
+def test_google_json_db_get_locations_with_projection(mock_cli):
+    mock_cli.return_value.bucket.return_value.blob.return_value.download_as_text.return_value = (
+        json.dumps({"map": _PROJECTION_DATA})
+    )
+    db = GoogleJsonDb("bucket", "blob")
+    Location = create_location_model([("name", "str")], {})
+    locations = google_json_db_get_locations(db, {}, Location, projection=BASIC_INFO_PROJECTION)
+    assert list(locations) == _PROJECTED_LOCATIONS
+
+
+def test_json_db_invalid_location_fails_every_read():
+    Location = create_location_model([], {})
+    db = Json({"data": [{"uuid": "1", "position": [200, 0]}], "categories": {}})
+    for _ in range(2):
+        with pytest.raises(LocationValidationError):
+            list(json_db_get_locations(db, {}, Location))
+
+
+def test_json_db_location_lookups_use_uuid_index():
+    Location = create_location_model([], {})
+    db = Json({"data": [{"uuid": str(i), "position": [i % 90, 0]} for i in range(100)]})
+    json_db_delete_location(db, "10")
+    json_db_update_location(db, "50", {"uuid": "50", "position": [1, 1]}, Location)
+
+    # The store built by the first mutation is patched in place and reused
+    with mock.patch("goodmap.db.LocationStore") as mock_store:
+        assert cast(LocationBase, json_db_get_location(db, "50", Location)).position == (1, 1)
+        assert json_db_get_location(db, "10", Location) is None
+        with pytest.raises(LocationAlreadyExistsError):
+            json_db_add_location(db, {"uuid": "99", "position": [0, 0]}, Location)
+    mock_store.assert_not_called()
+
+
+def test_location_store_not_cached_without_data_version():
+    db = Json({"data": [], "categories": {}})
+    with mock.patch("goodmap.db.json_db_get_data_version", return_value=None):
+        assert get_location_store(db, db.data) is not get_location_store(db, db.data)
+
+
+def test_get_data_version_dispatch_json_db():
+    db = Json({})
+    assert get_data_version(db) is json_db_get_data_version
+
+
+def test_json_file_db_data_version_follows_file(tmp_path):
+    file_path = tmp_path / "data.json"
+    file_path.write_text(json.dumps({"map": {"data": []}}))
+    db = JsonFile(str(file_path))
+    version = json_file_db_get_data_version(db)
+    assert version == json_file_db_get_data_version(db)
+
+    json_file_db_add_location(db, {"uuid": "a", "position": [5, 6]}, create_location_model([], {}))
+    assert json_file_db_get_data_version(db) != version
+
+
+def _json_file_db(tmp_path, map_data):
+    file_path = tmp_path / "data.json"
+    file_path.write_text(json.dumps({"map": map_data}))
+    return JsonFile(str(file_path)), file_path
+
+
+def test_json_file_db_parses_file_once(tmp_path):
+    db, _ = _json_file_db(tmp_path, {"data": [], "categories": {"kind": ["a"]}})
+    with mock.patch("goodmap.db.json_codec.load", wraps=json_codec.load) as mock_load:
+        assert list(json_file_db_get_categories(db)) == ["kind"]
+        assert json_file_db_get_data(db)["categories"] == {"kind": ["a"]}
+        assert json_file_db_get_category_data(db)["categories"] == {"kind": ["a"]}
+    assert mock_load.call_count == 1
+
+
+def test_json_file_db_cache_revalidated_on_file_change(tmp_path):
+    db, file_path = _json_file_db(tmp_path, {"categories": {"kind": ["a"]}})
+    assert list(json_file_db_get_categories(db)) == ["kind"]
+
+    replacement = tmp_path / "replacement.json"
+    replacement.write_text(json.dumps({"map": {"categories": {"other": ["b"]}}}))
+    os.replace(replacement, file_path)
+
+    assert list(json_file_db_get_categories(db)) == ["other"]
+
+
+def test_json_file_db_cache_updated_by_writes(tmp_path):
+    Location = create_location_model([], {})
+    db, file_path = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    json_file_db_get_data(db)
+
+    with mock.patch("goodmap.db.json_codec.load", wraps=json_codec.load) as mock_load:
+        json_file_db_add_location(db, {"uuid": "a", "position": [5, 6]}, Location)
+        locations = json_file_db_get_locations(db, {}, Location)
+        assert [cast(LocationBase, x).uuid for x in locations] == ["a"]
+    assert mock_load.call_count == 0
+    assert json.loads(file_path.read_text())["map"]["data"][0]["uuid"] == "a"
+
+
+def test_json_file_db_cache_dropped_on_failed_write(tmp_path):
+    Location = create_location_model([], {})
+    db, _ = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    with mock.patch("goodmap.db.json_file_atomic_dump", side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            json_file_db_add_location(db, {"uuid": "a", "position": [5, 6]}, Location)
+    assert json_file_db_get_data(db)["data"] == []
+
+
+def test_json_file_db_writes_leave_earlier_reads_intact(tmp_path):
+    Location = create_location_model([], {})
+    db, _ = _json_file_db(
+        tmp_path,
+        {
+            "data": [{"uuid": "a", "position": [1, 2]}, {"uuid": "b", "position": [3, 4]}],
+            "categories": {},
+            "suggestions": [{"uuid": "s1", "status": "pending"}],
+            "reports": [{"uuid": "r1", "status": "new"}],
+        },
+    )
+    before = json_file_db_get_data(db)
+    snapshot = json.loads(json.dumps(before))
+
+    json_file_db_add_location(db, {"uuid": "c", "position": [5, 6]}, Location)
+    json_file_db_update_location(db, "a", {"uuid": "a", "position": [7, 8]}, Location)
+    json_file_db_delete_location(db, "b")
+    json_file_db_update_suggestion(db, "s1", "accepted")
+    json_file_db_add_report(db, {"uuid": "r2", "status": "new"})
+    json_file_db_update_report(db, "r1", status="resolved")
+    json_file_db_delete_report(db, "r2")
+
+    # Readers holding the earlier contents see them unchanged
+    assert json.loads(json.dumps(before)) == snapshot
+    after = json_file_db_get_data(db)
+    assert [x["uuid"] for x in after["data"]] == ["a", "c"]
+    assert after["suggestions"][0]["status"] == "accepted"
+    assert after["reports"] == [{"uuid": "r1", "status": "resolved"}]
+
+
+def test_json_file_journal_replay_leaves_earlier_reads_intact(tmp_path):
+    Location = create_location_model([], {})
+    writer, file_path = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    reader = JsonFile(str(file_path))
+    enable_json_file_journal(writer)
+    enable_json_file_journal(reader)
+
+    json_file_db_add_location(writer, {"uuid": "a", "position": [5, 6]}, Location)
+    before = json_file_db_get_data(reader)["data"]
+    json_file_db_add_location(writer, {"uuid": "b", "position": [7, 8]}, Location)
+    json_file_db_delete_location(writer, "a")
+
+    assert [x["uuid"] for x in json_file_db_get_data(reader)["data"]] == ["b"]
+    assert [x["uuid"] for x in before] == ["a"]
+
+
+def test_pagination_sorting_leaves_items_in_place():
+    from goodmap.db import PaginationHelper
+
+    items = [{"name": "b"}, {"name": "a"}, {"name": "c"}]
+    paginated, total = PaginationHelper.apply_pagination_and_sorting(items, 1, None, "name", "asc")
+    assert [x["name"] for x in paginated] == ["a", "b", "c"]
+    assert total == 3
+    assert [x["name"] for x in items] == ["b", "a", "c"]
+
+
+@mock.patch("builtins.open", mock.mock_open(read_data=json.dumps({"map": {"data": []}})))
+def test_json_file_db_data_version_unknown_without_file():
+    db = JsonFile("/fake/path/file.json")
+    assert json_file_db_get_data_version(db) is None
+
+
 @mock.patch("builtins.open", mock.mock_open(read_data=json.dumps({"map": {"data": []}})))
 @mock.patch("goodmap.db.json_file_atomic_dump")
 def test_json_file_db_add_location(mock_atomic_dump):
@@ -393,7 +719,9 @@ def test_json_file_db_add_location(mock_atomic_dump):
     location_raw = {"uuid": "a", "position": [5, 6]}
     json_file_db_add_location(db, location_raw, Location)
     location = Location.model_validate(location_raw).model_dump()
-    mock_atomic_dump.assert_called_once_with({"map": {"data": [location]}}, file_path)
+    mock_atomic_dump.assert_called_once_with(
+        {"map": {"data": [location]}, "data_version": 1}, file_path
+    )
 
 
 @mock.patch(
@@ -421,7 +749,9 @@ def test_json_file_db_update_location(mock_atomic_dump):
     location_update_raw = {"uuid": "a", "position": [7, 8]}
     json_file_db_update_location(db, "a", location_update_raw, Location)
     location_update = Location.model_validate(location_update_raw).model_dump()
-    mock_atomic_dump.assert_called_once_with({"map": {"data": [location_update]}}, file_path)
+    mock_atomic_dump.assert_called_once_with(
+        {"map": {"data": [location_update]}, "data_version": 1}, file_path
+    )
 
 
 @mock.patch("builtins.open", mock.mock_open(read_data=json.dumps({"map": {"data": []}})))
@@ -443,7 +773,7 @@ def test_json_file_db_delete_location(mock_atomic_dump):
     file_path = "locs.json"
     db = JsonFile(file_path)
     json_file_db_delete_location(db, "a")
-    mock_atomic_dump.assert_called_once_with({"map": {"data": []}}, file_path)
+    mock_atomic_dump.assert_called_once_with({"map": {"data": []}, "data_version": 1}, file_path)
 
 
 @mock.patch("builtins.open", mock.mock_open(read_data=json.dumps({"map": {"data": []}})))
@@ -534,7 +864,9 @@ def test_json_file_db_add_suggestion(mock_atomic_dump):
     json_file_db_add_suggestion(db, suggestion_raw)
     suggestion = suggestion_raw.copy()
     suggestion["status"] = "pending"
-    mock_atomic_dump.assert_called_once_with({"map": {"suggestions": [suggestion]}}, file_path)
+    mock_atomic_dump.assert_called_once_with(
+        {"map": {"suggestions": [suggestion]}, "data_version": 1}, file_path
+    )
 
 
 @mock.patch(
@@ -599,7 +931,9 @@ def test_json_file_db_update_suggestion(mock_atomic_dump):
     db = JsonFile(file_path)
     json_file_db_update_suggestion(db, "s1", "done")
     suggestion = {"uuid": "s1", "status": "done"}
-    mock_atomic_dump.assert_called_once_with({"map": {"suggestions": [suggestion]}}, file_path)
+    mock_atomic_dump.assert_called_once_with(
+        {"map": {"suggestions": [suggestion]}, "data_version": 1}, file_path
+    )
 
 
 @mock.patch("builtins.open", mock.mock_open(read_data=json.dumps({"map": {"suggestions": []}})))
@@ -632,7 +966,7 @@ def test_json_file_db_update_suggestion_multiple(mock_atomic_dump):
     json_file_db_update_suggestion(db, "b", "done")
     rec1 = {"uuid": "a", "status": "pending"}
     rec2 = {"uuid": "b", "status": "done"}
-    expected = {"map": {"suggestions": [rec1, rec2]}}
+    expected = {"map": {"suggestions": [rec1, rec2]}, "data_version": 1}
     mock_atomic_dump.assert_called_once_with(expected, file_path)
 
 
@@ -645,7 +979,9 @@ def test_json_file_db_delete_suggestion(mock_atomic_dump):
     file_path = "sug.json"
     db = JsonFile(file_path)
     json_file_db_delete_suggestion(db, "s1")
-    mock_atomic_dump.assert_called_once_with({"map": {"suggestions": []}}, file_path)
+    mock_atomic_dump.assert_called_once_with(
+        {"map": {"suggestions": []}, "data_version": 1}, file_path
+    )
 
 
 @mock.patch("builtins.open", mock.mock_open(read_data=json.dumps({"map": {"suggestions": []}})))
@@ -745,7 +1081,9 @@ def test_json_file_db_add_report(mock_atomic_dump):
     db = JsonFile(file_path)
     report = {"uuid": "r1", "status": "new", "priority": "high"}
     json_file_db_add_report(db, report)
-    mock_atomic_dump.assert_called_once_with({"map": {"reports": [report]}}, file_path)
+    mock_atomic_dump.assert_called_once_with(
+        {"map": {"reports": [report]}, "data_version": 1}, file_path
+    )
 
 
 @mock.patch(
@@ -813,18 +1151,24 @@ def test_json_file_db_update_report_fields(mock_atomic_dump):
     json_file_db_update_report(db, "r1", status="done")
     report = original_report.copy()
     report["status"] = "done"
-    mock_atomic_dump.assert_called_with({"map": {"reports": [report]}}, file_path)
+    mock_atomic_dump.assert_called_with(
+        {"map": {"reports": [report]}, "data_version": 1}, file_path
+    )
 
     json_file_db_update_report(db, "r1", priority="low")
     report = original_report.copy()
     report["priority"] = "low"
-    mock_atomic_dump.assert_called_with({"map": {"reports": [report]}}, file_path)
+    mock_atomic_dump.assert_called_with(
+        {"map": {"reports": [report]}, "data_version": 1}, file_path
+    )
 
     json_file_db_update_report(db, "r1", status="done", priority="low")
     report = original_report.copy()
     report["status"] = "done"
     report["priority"] = "low"
-    mock_atomic_dump.assert_called_with({"map": {"reports": [report]}}, file_path)
+    mock_atomic_dump.assert_called_with(
+        {"map": {"reports": [report]}, "data_version": 1}, file_path
+    )
 
 
 @mock.patch("builtins.open", mock.mock_open(read_data=json.dumps({"map": {"reports": []}})))
@@ -858,7 +1202,7 @@ def test_json_file_db_update_report_multiple(mock_atomic_dump):
     json_file_db_update_report(db, "r2", priority="critical")
     rec1 = {"uuid": "r1", "status": "pending", "priority": "low"}
     rec2 = {"uuid": "r2", "status": "pending", "priority": "critical"}
-    expected = {"map": {"reports": [rec1, rec2]}}
+    expected = {"map": {"reports": [rec1, rec2]}, "data_version": 1}
     mock_atomic_dump.assert_called_once_with(expected, file_path)
 
 
@@ -870,7 +1214,7 @@ def test_json_file_db_delete_report(mock_atomic_dump):
     file_path = "rep.json"
     db = JsonFile(file_path)
     json_file_db_delete_report(db, "r1")
-    mock_atomic_dump.assert_called_once_with({"map": {"reports": []}}, file_path)
+    mock_atomic_dump.assert_called_once_with({"map": {"reports": []}, "data_version": 1}, file_path)
 
 
 @mock.patch("builtins.open", mock.mock_open(read_data=json.dumps({"map": {"reports": []}})))
@@ -1191,6 +1535,34 @@ def test_mongodb_db_delete_location(mock_client):
     mock_db.locations.delete_one.assert_called_once_with({"uuid": "1"})
 
 
+@mock.patch("platzky.db.mongodb_db.MongoClient")
+def test_mongodb_db_get_data_version(mock_client):
+    mock_db = mock.Mock()
+    mock_client.return_value.__getitem__.return_value = mock_db
+    mock_db.config.find_one.return_value = {"_id": "data_version", "version": 7}
+
+    db = MongoDB("mongodb://localhost:27017", "test_db")
+    assert mongodb_db_get_data_version(db) == 7
+    mock_db.config.find_one.assert_called_once_with({"_id": "data_version"})
+
+    mock_db.config.find_one.return_value = None
+    assert mongodb_db_get_data_version(db) == 0
+
+
+@mock.patch("platzky.db.mongodb_db.MongoClient")
+def test_mongodb_db_location_mutation_bumps_data_version(mock_client):
+    mock_db = mock.Mock()
+    mock_client.return_value.__getitem__.return_value = mock_db
+    mock_db.locations.delete_one.return_value.deleted_count = 1
+
+    db = MongoDB("mongodb://localhost:27017", "test_db")
+    mongodb_db_delete_location(db, "1")
+
+    mock_db.config.update_one.assert_called_once_with(
+        {"_id": "data_version"}, {"$inc": {"version": 1}}, upsert=True
+    )
+
+
 @mock.patch("platzky.db.mongodb_db.MongoClient")
 def test_mongodb_db_delete_location_not_found(mock_client):
     mock_db = mock.Mock()
@@ -1383,6 +1755,92 @@ def test_mongodb_db_get_categories(mock_client):
     assert categories == ["test-category"]
 
 
+@mock.patch("platzky.db.mongodb_db.MongoClient")
+def test_mongodb_db_config_version_follows_config(mock_client):
+    mock_db = mock.Mock()
+    mock_client.return_value.__getitem__.return_value = mock_db
+    mock_db.config.find_one.return_value = {"_id": "map_config", "categories": {"a": ["b"]}}
+    db = MongoDB("mongodb://localhost:27017", "test_db")
+    version = mongodb_db_get_config_version(db)
+    assert mongodb_db_get_config_version(db) == version
+
+    mock_db.config.find_one.return_value = {"_id": "map_config", "categories": {"a": ["c"]}}
+    invalidate_mongodb_config(db)
+    assert mongodb_db_get_config_version(db) != version
+
+
+@mock.patch("platzky.db.mongodb_db.MongoClient")
+def test_mongodb_db_config_read_once_per_snapshot(mock_client):
+    mock_db = mock.Mock()
+    mock_client.return_value.__getitem__.return_value = mock_db
+    mock_db.config.find_one.return_value = {
+        "_id": "map_config",
+        "categories": {"a": ["b"]},
+        "visible_data": {"name": {}},
+        "meta_data": {"uuid": {}},
+    }
+    db = MongoDB("mongodb://localhost:27017", "test_db")
+
+    assert mongodb_db_get_categories(db) == ["a"]
+    assert mongodb_db_get_visible_data(db) == {"name": {}}
+    assert mongodb_db_get_meta_data(db) == {"uuid": {}}
+    mongodb_db_get_config_version(db)
+    mock_db.config.find_one.assert_called_once_with({"_id": "map_config"})
+
+
+@mock.patch("platzky.db.mongodb_db.MongoClient")
+def test_mongodb_db_config_snapshot_expires(mock_client):
+    mock_db = mock.Mock()
+    mock_client.return_value.__getitem__.return_value = mock_db
+    mock_db.config.find_one.return_value = {"_id": "map_config", "categories": {"a": []}}
+    db = MongoDB("mongodb://localhost:27017", "test_db")
+
+    with mock.patch("goodmap.db.time.monotonic", return_value=100.0):
+        assert mongodb_db_get_categories(db) == ["a"]
+    mock_db.config.find_one.return_value = {"_id": "map_config", "categories": {"b": []}}
+    with mock.patch("goodmap.db.time.monotonic", return_value=100.0 + MONGODB_CONFIG_TTL - 1):
+        assert mongodb_db_get_categories(db) == ["a"]
+    with mock.patch("goodmap.db.time.monotonic", return_value=100.0 + MONGODB_CONFIG_TTL):
+        assert mongodb_db_get_categories(db) == ["b"]
+
+
+@mock.patch("platzky.db.mongodb_db.MongoClient")
+def test_mongodb_db_config_change_stream_invalidates_snapshot(mock_client):
+    mock_db = mock.Mock()
+    mock_client.return_value.__getitem__.return_value = mock_db
+    mock_db.config.find_one.return_value = {"_id": "map_config", "categories": {"a": []}}
+    db = MongoDB("mongodb://localhost:27017", "test_db")
+    assert mongodb_db_get_categories(db) == ["a"]
+
+    changed = threading.Event()
+    stream = mock.MagicMock()
+    stream.__enter__.return_value = stream
+
+    def changes():
+        mock_db.config.find_one.return_value = {"_id": "map_config", "categories": {"b": []}}
+        yield {"operationType": "update"}
+        changed.set()
+
+    stream.__iter__.side_effect = changes
+    mock_db.config.watch.return_value = stream
+
+    watch_mongodb_config(db).join(timeout=5)
+    assert changed.is_set()
+    assert mongodb_db_get_categories(db) == ["b"]
+    mock_db.config.watch.assert_called_once_with([{"$match": {"documentKey._id": "map_config"}}])
+
+
+@mock.patch("platzky.db.mongodb_db.MongoClient")
+def test_mongodb_db_config_change_stream_failure_is_logged(mock_client, caplog):
+    mock_db = mock.Mock()
+    mock_client.return_value.__getitem__.return_value = mock_db
+    mock_db.config.watch.side_effect = RuntimeError("not a replica set")
+    db = MongoDB("mongodb://localhost:27017", "test_db")
+
+    watch_mongodb_config(db).join(timeout=5)
+    assert "change stream stopped" in caplog.text
+
+
 @mock.patch("platzky.db.mongodb_db.MongoClient")
 def test_mongodb_db_get_categories_no_config(mock_client):
     mock_db = mock.Mock()
@@ -1574,15 +2032,15 @@ def test_mongodb_db_get_locations(mock_client):
     mock_db = mock.Mock()
     mock_client.return_value.__getitem__.return_value = mock_db
     mock_db.locations.find.return_value = [
-        {"uuid": "1", "position": [50, 50]},
-        {"uuid": "2", "position": [10, 10]},
+        {"_id": 1, "uuid": "1", "position": [50, 50]},
+        {"_id": 2, "uuid": "2", "position": [10, 10]},
     ]
 
     db = MongoDB("mongodb://localhost:27017", "test_db")
     extend_db_with_goodmap_queries(db, LocationBase)
 
     query = {"test-category": ["searchable"]}
-    locations = list(mongodb_db_get_locations(db, query, LocationBase))
+    locations = cast(list[LocationBase], list(mongodb_db_get_locations(db, query, LocationBase)))
 
     assert len(locations) == 2
     assert locations[0].uuid == "1"
@@ -1590,12 +2048,156 @@ def test_mongodb_db_get_locations(mock_client):
     assert locations[1].uuid == "2"
     assert locations[1].position == (10, 10)
 
+    # The _ids are fetched too, to cache them for the filter
     mock_db.locations.find.assert_called_once_with(
         {"test-category": {"$in": ["searchable"]}},
-        {"_id": 0, "uuid": 1, "position": 1, "remark": 1},
+        {"_id": 1, "uuid": 1, "position": 1, "remark": 1},
     )
 
 
+@mock.patch("platzky.db.mongodb_db.MongoClient")
+def test_mongodb_db_get_locations_with_projection(mock_client):
+    mock_db = mock.Mock()
+    mock_client.return_value.__getitem__.return_value = mock_db
+    mock_db.locations.find.return_value = [
+        {"uuid": "1", "name": "one"},
+        {"uuid": "2", "name": None},
+    ]
+    db = MongoDB("mongodb://localhost:27017", "test_db")
+
+    locations = list(mongodb_db_get_locations(db, {}, LocationBase, projection=("uuid", "name")))
+
+    assert locations == [{"uuid": "1", "name": "one"}, {"uuid": "2"}]
+    mock_db.locations.find.assert_called_once_with({}, {"_id": 0, "uuid": 1, "name": 1})
+
+
+@mock.patch("platzky.db.mongodb_db.MongoClient")
+def test_mongodb_db_get_locations_caches_filtered_ids_per_data_version(mock_client):
+    mock_db = mock.Mock()
+    mock_client.return_value.__getitem__.return_value = mock_db
+    mock_db.config.find_one.return_value = {"_id": "data_version", "version": 1}
+    docs = [
+        {"_id": "id1", "uuid": "1", "position": [50, 50]},
+        {"_id": "id2", "uuid": "2", "position": [10, 10]},
+    ]
+    mock_db.locations.find.return_value = docs
+    db = MongoDB("mongodb://localhost:27017", "test_db")
+
+    projection = ("uuid", "position")
+    first = list(
+        mongodb_db_get_locations(
+            db,
+            {"type": ["b", "a", "b"], "access": ["x"], "format": ["columnar"]},
+            LocationBase,
+            projection=projection,
+        )
+    )
+    mock_db.locations.find.assert_called_once_with(
+        {"access": {"$in": ["x"]}, "type": {"$in": ["a", "b"]}},
+        {"_id": 1, "uuid": 1, "position": 1},
+    )
+
+    # The same filter is answered by _id, in the order the ids were cached
+    mock_db.locations.find.return_value = docs[::-1]
+    again = list(
+        mongodb_db_get_locations(
+            db, {"access": ["x"], "type": ["a", "b"]}, LocationBase, projection=projection
+        )
+    )
+    assert (
+        first
+        == again
+        == [
+            {"uuid": "1", "position": [50, 50]},
+            {"uuid": "2", "position": [10, 10]},
+        ]
+    )
+    assert mock_db.locations.find.call_args.args == (
+        {"_id": {"$in": ["id1", "id2"]}},
+        {"_id": 1, "uuid": 1, "position": 1},
+    )
+
+    list(mongodb_db_get_locations(db, {"type": ["a"]}, LocationBase, projection=projection))
+    assert mock_db.locations.find.call_args.args[0] == {"type": {"$in": ["a"]}}
+
+    mock_db.config.find_one.return_value = {"_id": "data_version", "version": 2}
+    list(mongodb_db_get_locations(db, {"type": ["a", "b"], "access": ["x"]}, LocationBase))
+    assert mock_db.locations.find.call_args.args[0] == {
+        "access": {"$in": ["x"]},
+        "type": {"$in": ["a", "b"]},
+    }
+
+
+@mock.patch("platzky.db.mongodb_db.MongoClient")
+def test_mongodb_db_get_locations_coordinate_queries_use_cached_ids(mock_client):
+    mock_db = mock.Mock()
+    mock_client.return_value.__getitem__.return_value = mock_db
+    mock_db.config.find_one.return_value = {"_id": "data_version", "version": 1}
+    mock_db.locations.find.return_value = [
+        {"_id": 1, "uuid": "far", "position": [50.0, 12.0]},
+        {"_id": 2, "uuid": "near", "position": [50.0, 10.1]},
+    ]
+    db = MongoDB("mongodb://localhost:27017", "test_db")
+    near_me = {"kind": ["a"], "lat": ["50"], "lon": ["10"], "radius_km": ["200"]}
+
+    # Queries with coordinates do not cache the ids of their filter
+    list(mongodb_db_get_locations(db, near_me, LocationBase, projection=("uuid",)))
+    list(mongodb_db_get_locations(db, {"kind": ["a"]}, LocationBase, projection=("uuid",)))
+    assert mock_db.locations.find.call_args.args[0] == {"kind": {"$in": ["a"]}}
+
+    locations = list(mongodb_db_get_locations(db, near_me, LocationBase, projection=("uuid",)))
+    assert locations == [{"uuid": "near"}, {"uuid": "far"}]
+    (mongo_query, fields), _ = mock_db.locations.find.call_args
+    assert mongo_query.keys() == {"_id", "position.0"}
+    assert mongo_query["_id"] == {"$in": [1, 2]}
+    assert fields == {"_id": 1, "uuid": 1, "position": 1}
+    assert mock_db.locations.find.call_count == 3
+
+
+@mock.patch("platzky.db.mongodb_db.MongoClient")
+def test_mongodb_db_get_locations_ignores_rendering_params(mock_client):
+    mock_db = mock.Mock()
+    mock_client.return_value.__getitem__.return_value = mock_db
+    mock_db.locations.find.return_value = []
+    db = MongoDB("mongodb://localhost:27017", "test_db")
+
+    query = {"with_distance": ["true"], "format": ["list"]}
+    assert list(mongodb_db_get_locations(db, query, LocationBase)) == []
+    mock_db.locations.find.assert_called_once_with(
+        {}, {"_id": 0, "uuid": 1, "position": 1, "remark": 1}
+    )
+
+
+@mock.patch("platzky.db.mongodb_db.MongoClient")
+def test_mongodb_db_get_locations_nearest_within_radius(mock_client):
+    mock_db = mock.Mock()
+    mock_client.return_value.__getitem__.return_value = mock_db
+    mock_db.locations.find.return_value = [
+        {"uuid": "far", "position": [50.0, 12.0]},
+        {"uuid": "near", "position": [50.0, 10.1]},
+        {"uuid": "nearest", "position": [50.0, 10.0]},
+        {"uuid": "outside", "position": [50.0, 13.0]},
+    ]
+    db = MongoDB("mongodb://localhost:27017", "test_db")
+
+    query = {"kind": ["a"], "lat": ["50"], "lon": ["10"], "radius_km": ["200"], "limit": ["2"]}
+    locations = list(mongodb_db_get_locations(db, query, LocationBase, projection=("uuid",)))
+
+    assert locations == [{"uuid": "nearest"}, {"uuid": "near"}]
+    (mongo_query, fields), _ = mock_db.locations.find.call_args
+    assert mongo_query["kind"] == {"$in": ["a"]}
+    band = mongo_query["position.0"]
+    assert band["$gte"] == pytest.approx(50 - 1.7986, abs=1e-3)
+    assert band["$lte"] == pytest.approx(50 + 1.7986, abs=1e-3)
+    assert fields == {"_id": 0, "uuid": 1, "position": 1}
+
+    # Another point or limit is another query, not a cached result
+    query = {"kind": ["a"], "lat": ["50"], "lon": ["12"], "limit": ["1"]}
+    locations = list(mongodb_db_get_locations(db, query, LocationBase))
+    assert [cast(LocationBase, x).uuid for x in locations] == ["far"]
+    assert mock_db.locations.find.call_args.args[0] == {"kind": {"$in": ["a"]}}
+
+
 @mock.patch("platzky.db.mongodb_db.MongoClient")
 def test_mongodb_db_get_locations_empty_query(mock_client):
     mock_db = mock.Mock()
@@ -2410,3 +3012,307 @@ def test_pagination_helper_error_handling():
     items = [{"name": "test", "custom_field": "test_value"}]
     result = PaginationHelper.create_paginated_response(items, query, custom_extract)
     assert len(result["items"]) == 1  # Custom filter should pass the item
+
+
+def test_json_file_journal_appends_instead_of_rewriting(tmp_path):
+    Location = create_location_model([], {})
+    db, file_path = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    enable_json_file_journal(db)
+    original = file_path.read_text()
+
+    with mock.patch("goodmap.db.json_file_atomic_dump") as mock_dump:
+        json_file_db_add_location(db, {"uuid": "a", "position": [5, 6]}, Location)
+        json_file_db_add_location(db, {"uuid": "b", "position": [7, 8]}, Location)
+        json_file_db_update_location(db, "a", {"uuid": "a", "position": [1, 2]}, Location)
+        json_file_db_delete_location(db, "b")
+        json_file_db_add_suggestion(db, {"uuid": "s1"})
+        json_file_db_update_suggestion(db, "s1", "accepted")
+        json_file_db_add_report(db, {"uuid": "r1", "status": "new"})
+        json_file_db_delete_report(db, "r1")
+    mock_dump.assert_not_called()
+
+    assert file_path.read_text() == original
+    records = [json.loads(x) for x in (tmp_path / "data.json.journal").read_text().splitlines()]
+    assert len([r for r in records if r["op"] != "set"]) == 8
+    locations = json_file_db_get_locations(db, {}, Location)
+    assert [cast(LocationBase, x).position for x in locations] == [(1, 2)]
+    suggestion = json_file_db_get_suggestion(db, "s1")
+    assert suggestion is not None
+    assert suggestion["status"] == "accepted"
+    assert json_file_db_get_reports(db, {}) == []
+
+
+def test_json_file_journal_replayed_by_other_instances(tmp_path):
+    Location = create_location_model([], {})
+    writer, file_path = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    reader = JsonFile(str(file_path))
+    enable_json_file_journal(writer)
+    enable_json_file_journal(reader)
+
+    json_file_db_add_location(writer, {"uuid": "a", "position": [5, 6]}, Location)
+    locations = json_file_db_get_locations(reader, {}, Location)
+    assert [cast(LocationBase, x).uuid for x in locations] == ["a"]
+
+    json_file_db_add_location(writer, {"uuid": "b", "position": [7, 8]}, Location)
+    with mock.patch("goodmap.db.json_codec.load", wraps=json_codec.load) as mock_load:
+        locations = json_file_db_get_locations(reader, {}, Location)
+        assert [cast(LocationBase, x).uuid for x in locations] == ["a", "b"]
+    # Only the new journal record is applied, the data file is not parsed again
+    assert mock_load.call_count == 0
+
+
+def test_json_file_journal_compaction(tmp_path):
+    Location = create_location_model([], {})
+    db, file_path = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    enable_json_file_journal(db)
+    json_file_db_add_location(db, {"uuid": "a", "position": [5, 6]}, Location)
+
+    compact_json_file_journal(db)
+
+    assert not (tmp_path / "data.json.journal").exists()
+    assert json.loads(file_path.read_text())["map"]["data"][0]["uuid"] == "a"
+    locations = json_file_db_get_locations(db, {}, Location)
+    assert [cast(LocationBase, x).uuid for x in locations] == ["a"]
+
+
+def test_json_file_journal_compacted_in_background_past_threshold(tmp_path):
+    Location = create_location_model([], {})
+    db, _ = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    enable_json_file_journal(db, compact_bytes=1)
+
+    with mock.patch("goodmap.db.threading.Thread") as mock_thread:
+        json_file_db_add_location(db, {"uuid": "a", "position": [5, 6]}, Location)
+        json_file_db_add_location(db, {"uuid": "b", "position": [7, 8]}, Location)
+
+    # A compaction already in progress is not started twice
+    mock_thread.assert_called_once()
+    assert mock_thread.call_args.kwargs["daemon"] is True
+    mock_thread.return_value.start.assert_called_once()
+
+
+def test_leftover_json_file_journal_merged_without_journal_mode(tmp_path):
+    Location = create_location_model([], {})
+    db, file_path = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    enable_json_file_journal(db)
+    json_file_db_add_location(db, {"uuid": "a", "position": [5, 6]}, Location)
+
+    plain = JsonFile(str(file_path))
+    compact_json_file_journal(plain)
+
+    assert not (tmp_path / "data.json.journal").exists()
+    locations = json_file_db_get_locations(plain, {}, Location)
+    assert [cast(LocationBase, x).uuid for x in locations] == ["a"]
+
+
+def test_json_file_concurrent_writes_are_not_lost(tmp_path):
+    Location = create_location_model([], {})
+    db, file_path = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    # A second instance has its own batcher, like another worker process
+    other = JsonFile(str(file_path))
+
+    def add(target, uuid):
+        json_file_db_add_location(target, {"uuid": uuid, "position": [5, 6]}, Location)
+
+    threads = [
+        threading.Thread(target=add, args=(db if i % 2 else other, f"loc-{i}")) for i in range(20)
+    ]
+    with mock.patch("goodmap.db.json_file_atomic_dump", wraps=json_file_atomic_dump) as mock_dump:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    saved = json.loads(file_path.read_text())["map"]["data"]
+    assert sorted(x["uuid"] for x in saved) == sorted(f"loc-{i}" for i in range(20))
+    assert mock_dump.call_count <= 20
+
+
+def test_json_file_rejected_write_does_not_block_later_writes(tmp_path):
+    Location = create_location_model([], {})
+    db, file_path = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    json_file_db_add_location(db, {"uuid": "a", "position": [5, 6]}, Location)
+
+    with pytest.raises(LocationAlreadyExistsError):
+        json_file_db_add_location(db, {"uuid": "a", "position": [5, 6]}, Location)
+    json_file_db_add_location(db, {"uuid": "b", "position": [5, 6]}, Location)
+
+    saved = json.loads(file_path.read_text())["map"]["data"]
+    assert [x["uuid"] for x in saved] == ["a", "b"]
+
+
+def test_json_file_writes_keep_location_store(tmp_path):
+    Location = create_location_model([], {})
+    db, _ = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    json_file_db_add_location(db, {"uuid": "a", "position": [5, 6]}, Location)
+    json_file_db_get_locations(db, {}, Location)
+
+    with mock.patch("goodmap.db.LocationStore", wraps=LocationStore) as mock_store:
+        json_file_db_add_location(db, {"uuid": "b", "position": [7, 8]}, Location)
+        json_file_db_delete_location(db, "a")
+        locations = json_file_db_get_locations(db, {}, Location)
+        assert [cast(LocationBase, x).uuid for x in locations] == ["b"]
+    mock_store.assert_not_called()
+
+
+def _replace_file(tmp_path, file_path, json_file):
+    replacement = tmp_path / "replacement.json"
+    replacement.write_text(json.dumps(json_file))
+    os.replace(replacement, file_path)
+
+
+def test_json_file_transaction_saves_and_counts_versions(tmp_path):
+    db, file_path = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    extend_db_with_goodmap_queries(db, LocationBase)
+
+    with getattr(db, "transaction")() as transaction:
+        assert transaction.version == 0
+        transaction.data["map"]["categories"]["kind"] = ["a"]
+    with json_file_db_transaction(db) as transaction:
+        assert transaction.version == 1
+
+    saved = json.loads(file_path.read_text())
+    assert saved["map"]["categories"] == {"kind": ["a"]}
+    assert saved["data_version"] == 2
+
+
+def test_json_file_transaction_not_saved_on_error_or_discard(tmp_path):
+    db, file_path = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    original = file_path.read_text()
+
+    with pytest.raises(RuntimeError):
+        with json_file_db_transaction(db) as transaction:
+            transaction.data["map"]["categories"]["kind"] = ["a"]
+            raise RuntimeError("abort")
+    with json_file_db_transaction(db) as transaction:
+        transaction.data["map"]["categories"]["kind"] = ["b"]
+        transaction.discard()
+
+    assert file_path.read_text() == original
+    assert json_file_db_get_data(db)["categories"] == {}
+
+
+def test_json_file_transaction_detects_unlocked_writer(tmp_path):
+    db, file_path = _json_file_db(tmp_path, {"data": [], "categories": {}})
+
+    with pytest.raises(ConcurrentModificationError):
+        with json_file_db_transaction(db) as transaction:
+            transaction.data["map"]["categories"]["kind"] = ["a"]
+            _replace_file(tmp_path, file_path, {"map": {"data": [], "categories": {"x": []}}})
+
+    assert json.loads(file_path.read_text())["map"]["categories"] == {"x": []}
+    assert json_file_db_get_data(db)["categories"] == {"x": []}
+
+
+def test_json_file_write_retried_after_unlocked_writer(tmp_path):
+    db, file_path = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    add_to_collection = mock.Mock(wraps=CRUDHelper.add_item_to_json_db)
+
+    def add_racing_with_other_writer(*args, **kwargs):
+        if add_to_collection.call_count == 0:
+            _replace_file(
+                tmp_path, file_path, {"map": {"data": [], "suggestions": [{"uuid": "other"}]}}
+            )
+        return add_to_collection(*args, **kwargs)
+
+    with mock.patch.object(
+        CRUDHelper, "add_item_to_json_db", side_effect=add_racing_with_other_writer
+    ):
+        json_file_db_add_suggestion(db, {"uuid": "s1"})
+
+    saved = json.loads(file_path.read_text())["map"]["suggestions"]
+    assert [x["uuid"] for x in saved] == ["other", "s1"]
+    assert add_to_collection.call_count == 2
+
+
+@pytest.mark.parametrize("journal", [False, True])
+def test_json_file_writes_join_open_transaction(tmp_path, journal):
+    Location = create_location_model([], {})
+    db, file_path = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    if journal:
+        enable_json_file_journal(db)
+
+    with json_file_db_transaction(db) as transaction:
+        transaction.data["map"]["categories"]["kind"] = ["a"]
+        json_file_db_add_location(db, {"uuid": "a", "position": [5, 6]}, Location)
+        json_file_db_update_location(db, "a", {"uuid": "a", "position": [7, 8]}, Location)
+        with json_file_db_transaction(db) as inner:
+            assert inner is transaction
+            json_file_db_add_location(db, {"uuid": "b", "position": [1, 2]}, Location)
+        # Nothing is saved before the outer transaction ends
+        assert json.loads(file_path.read_text())["map"]["data"] == []
+
+    reader = JsonFile(str(file_path))
+    if journal:
+        enable_json_file_journal(reader)
+    saved = json_file_db_get_data(reader)
+    assert saved["categories"] == {"kind": ["a"]}
+    assert [(x["uuid"], x["position"]) for x in saved["data"]] == [("a", [7, 8]), ("b", [1, 2])]
+    assert json_file_db_get_data_version(db) == json_file_db_get_data_version(reader)
+    with json_file_db_transaction(db) as transaction:
+        assert transaction.version == 1
+        transaction.discard()
+
+
+def test_json_file_writes_in_failed_transaction_not_saved(tmp_path):
+    Location = create_location_model([], {})
+    db, file_path = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    original = file_path.read_text()
+
+    with pytest.raises(RuntimeError):
+        with json_file_db_transaction(db):
+            json_file_db_add_location(db, {"uuid": "a", "position": [5, 6]}, Location)
+            raise RuntimeError("abort")
+
+    assert file_path.read_text() == original
+    assert list(json_file_db_get_locations(db, {}, Location)) == []
+    json_file_db_add_location(db, {"uuid": "a", "position": [5, 6]}, Location)
+    assert [x["uuid"] for x in json.loads(file_path.read_text())["map"]["data"]] == ["a"]
+
+
+@pytest.mark.parametrize("hold", ["transaction", "lock"])
+def test_json_file_write_while_holding_write_lock(tmp_path, hold):
+    db, file_path = _json_file_db(tmp_path, {"data": [], "suggestions": []})
+    lock = _json_file_writer(db)[0]
+    other = threading.Thread(target=json_file_db_add_suggestion, args=(db, {"uuid": "other"}))
+    other_waits_for_lock = threading.Event()
+    enter_lock = InterProcessLock.__enter__
+
+    def enter(self):
+        if threading.current_thread() is other:
+            other_waits_for_lock.set()
+        return enter_lock(self)
+
+    with mock.patch.object(InterProcessLock, "__enter__", enter):
+        with json_file_db_transaction(db) if hold == "transaction" else lock:
+            other.start()
+            # The other thread leads a batch and waits for the lock held here
+            assert other_waits_for_lock.wait(timeout=5)
+            json_file_db_add_suggestion(db, {"uuid": "own"})
+        other.join(timeout=5)
+
+    assert not other.is_alive()
+    saved = json.loads(file_path.read_text())["map"]["suggestions"]
+    assert sorted(x["uuid"] for x in saved) == ["other", "own"]
+
+
+def test_json_file_journal_transaction(tmp_path):
+    Location = create_location_model([], {})
+    db, file_path = _json_file_db(tmp_path, {"data": [], "categories": {}})
+    enable_json_file_journal(db)
+    json_file_db_add_location(db, {"uuid": "a", "position": [5, 6]}, Location)
+
+    reader = JsonFile(str(file_path))
+    enable_json_file_journal(reader)
+    with json_file_db_transaction(reader) as transaction:
+        # The version counter is replayed from the journal
+        assert transaction.version == 1
+        transaction.discard()
+
+    # A transaction without journal records rewrites the file and merges the journal
+    with json_file_db_transaction(db) as transaction:
+        transaction.data["map"]["categories"]["kind"] = ["a"]
+
+    assert not (tmp_path / "data.json.journal").exists()
+    saved = json.loads(file_path.read_text())
+    assert saved["data_version"] == 2
+    assert [x["uuid"] for x in saved["map"]["data"]] == ["a"]
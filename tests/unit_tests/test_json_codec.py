@@ -0,0 +1,81 @@
+import datetime
+import decimal
+import io
+import json
+import uuid
+from unittest import mock
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from goodmap import json_codec
+from goodmap.json_codec import FastJSONProvider
+from goodmap.json_codec_benchmark import run_benchmark
+
+DOCUMENT = {"map": {"data": [{"uuid": "a", "name": "Zażółć", "position": [1.5, 2]}]}}
+
+requires_orjson = pytest.mark.skipif(json_codec.orjson is None, reason="orjson is not installed")
+
+
+@pytest.fixture(params=[pytest.param("orjson", marks=requires_orjson), "json"])
+def backend(request):
+    if request.param == "orjson":
+        yield "orjson"
+    else:
+        with mock.patch("goodmap.json_codec.orjson", None):
+            yield "json"
+
+
+def test_backend_name(backend):
+    assert json_codec.backend_name() == backend
+
+
+def test_round_trip(backend):
+    assert json_codec.loads(json_codec.dumps(DOCUMENT)) == DOCUMENT
+    assert json_codec.loads(json_codec.dumps(DOCUMENT).decode()) == DOCUMENT
+
+
+def test_file_round_trip(backend):
+    file = io.BytesIO() if json_codec.write_mode() == "wb" else io.StringIO()
+    json_codec.dump(DOCUMENT, file)
+    file.seek(0)
+    assert json_codec.load(file) == DOCUMENT
+
+
+def test_dumps_sort_keys(backend):
+    assert json_codec.dumps({"b": 1, "a": 2}, sort_keys=True) == b'{"a":2,"b":1}'
+
+
+def test_provider_matches_default_provider():
+    app = Flask(__name__)
+    payload = {
+        "b": [1, 2.5, None, True],
+        "a": "Zażółć",
+        "when": datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+        "day": datetime.date(2024, 1, 2),
+        "id": uuid.UUID(int=1),
+        "price": decimal.Decimal("1.10"),
+    }
+    fast = FastJSONProvider(app)
+    default = DefaultJSONProvider(app)
+
+    assert json.loads(fast.dumps(payload)) == json.loads(default.dumps(payload))
+    assert list(json.loads(fast.dumps(payload))) == list(json.loads(default.dumps(payload)))
+    assert fast.loads(b'{"a": [1]}') == {"a": [1]}
+
+
+def test_provider_indented_output_uses_default_provider():
+    app = Flask(__name__)
+    assert FastJSONProvider(app).dumps({"a": 1}, indent=2) == '{\n  "a": 1\n}'
+
+
+def test_provider_installed_on_app(test_app):
+    assert isinstance(test_app.application.json, FastJSONProvider)
+
+
+@requires_orjson
+def test_benchmark_reports_all_backends():
+    results = run_benchmark(json.dumps(DOCUMENT).encode(), repeat=1)
+    assert set(results) == {"json", "orjson"}
+    assert set(results["json"]) == {"load", "dump", "response"}
@@ -0,0 +1,96 @@
+import fcntl
+import os
+import threading
+
+import pytest
+
+from goodmap.json_file_writer import InterProcessLock, PendingWrite, WriteBatcher
+
+
+def _flock_is_free(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    finally:
+        os.close(fd)
+    return True
+
+
+def test_inter_process_lock_holds_flock_on_directory(tmp_path):
+    lock = InterProcessLock(str(tmp_path / "data.json"))
+    with lock:
+        assert not _flock_is_free(str(tmp_path))
+        with lock:
+            assert not _flock_is_free(str(tmp_path))
+        # Leaving the nested block keeps the lock held
+        assert not _flock_is_free(str(tmp_path))
+    assert _flock_is_free(str(tmp_path))
+
+
+def test_inter_process_lock_knows_holding_thread(tmp_path):
+    lock = InterProcessLock(str(tmp_path / "data.json"))
+    held_elsewhere = []
+    with lock:
+        with lock:
+            assert lock.held()
+        assert lock.held()
+        thread = threading.Thread(target=lambda: held_elsewhere.append(lock.held()))
+        thread.start()
+        thread.join()
+    assert held_elsewhere == [False]
+    assert not lock.held()
+
+
+def test_write_batcher_commits_concurrent_writes_together():
+    commits = []
+
+    def commit(batch: list[PendingWrite]):
+        commits.append([p.operation for p in batch])
+
+    batcher = WriteBatcher(commit, window=0.2)
+    threads = [threading.Thread(target=batcher.submit, args=(i,)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(op for batch in commits for op in batch) == [0, 1, 2, 3, 4]
+    assert len(commits) < 5
+
+
+def test_write_batcher_respects_max_size():
+    commits = []
+
+    def commit(batch: list[PendingWrite]):
+        commits.append(len(batch))
+
+    batcher = WriteBatcher(commit, window=0, max_size=1)
+    batcher.submit("a")
+    batcher.submit("b")
+    assert commits == [1, 1]
+
+
+def test_write_batcher_reports_errors_per_write():
+    def commit(batch):
+        for pending in batch:
+            if pending.operation == "bad":
+                pending.error = ValueError("bad write")
+
+    batcher = WriteBatcher(commit, window=0)
+    batcher.submit("good")
+    with pytest.raises(ValueError, match="bad write"):
+        batcher.submit("bad")
+
+
+def test_write_batcher_commit_failure_fails_the_batch():
+    def commit(batch):
+        raise OSError("disk full")
+
+    batcher = WriteBatcher(commit, window=0)
+    with pytest.raises(OSError, match="disk full"):
+        batcher.submit("a")
+    # The batcher stays usable after a failed commit
+    with pytest.raises(OSError, match="disk full"):
+        batcher.submit("b")
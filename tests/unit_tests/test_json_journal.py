@@ -0,0 +1,88 @@
+from unittest import mock
+
+from goodmap import json_codec
+from goodmap.json_journal import (
+    append_records,
+    apply_records,
+    delete_record,
+    put_record,
+    read_records,
+    set_record,
+)
+
+
+def test_apply_records_put_and_delete():
+    json_file = {"map": {"data": [{"uuid": "a", "v": 1}, {"uuid": "b", "v": 1}]}}
+    apply_records(
+        json_file,
+        [
+            put_record("data", {"uuid": "a", "v": 2}),
+            delete_record("data", "b"),
+            put_record("data", {"uuid": "c", "v": 1}),
+            put_record("reports", {"uuid": "r"}),
+            set_record("data_version", 3),
+        ],
+    )
+    assert json_file == {
+        "map": {
+            "data": [{"uuid": "a", "v": 2}, {"uuid": "c", "v": 1}],
+            "reports": [{"uuid": "r"}],
+        },
+        "data_version": 3,
+    }
+
+
+def test_apply_records_is_idempotent():
+    records = [
+        put_record("data", {"uuid": "a", "v": 2}),
+        put_record("data", {"uuid": "c", "v": 1}),
+        delete_record("data", "b"),
+    ]
+    json_file = {"map": {"data": [{"uuid": "a", "v": 1}, {"uuid": "b", "v": 1}]}}
+    apply_records(json_file, records)
+    once = {"map": {"data": list(json_file["map"]["data"])}}
+    apply_records(json_file, records)
+    assert json_file == once
+
+
+def test_read_records_from_offset(tmp_path):
+    path = str(tmp_path / "data.json.journal")
+    assert read_records(path) == ([], 0)
+
+    _, end = append_records(path, [delete_record("data", "a")])
+    append_records(path, [delete_record("data", "b")])
+
+    records, offset = read_records(path, end)
+    assert records == [delete_record("data", "b")]
+    assert offset == (tmp_path / "data.json.journal").stat().st_size
+
+
+def test_read_records_leaves_incomplete_line(tmp_path):
+    journal = tmp_path / "data.json.journal"
+    journal.write_bytes(b'{"op":"delete","collection":"data","uuid":"a"}\n{"op":"del')
+
+    records, offset = read_records(str(journal))
+    assert records == [delete_record("data", "a")]
+    assert offset == journal.read_bytes().index(b"\n") + 1
+
+
+def test_append_records_after_torn_write(tmp_path):
+    journal = tmp_path / "data.json.journal"
+    journal.write_bytes(b'{"op":"del')
+
+    append_records(str(journal), [delete_record("data", "a")])
+
+    records, _ = read_records(str(journal))
+    assert records == [delete_record("data", "a")]
+
+
+def test_append_records_uses_json_codec(tmp_path):
+    journal = tmp_path / "data.json.journal"
+    record = put_record("data", {"uuid": "a", "name": "Łódź"})
+
+    with mock.patch("goodmap.json_journal.json_codec.dumps", wraps=json_codec.dumps) as dumps:
+        append_records(str(journal), [record])
+
+    dumps.assert_called_once_with(record)
+    assert journal.read_bytes() == json_codec.dumps(record) + b"\n"
+    assert read_records(str(journal))[0] == [record]
@@ -0,0 +1,177 @@
+import threading
+from unittest import mock
+
+import pytest
+
+from goodmap.versioned_cache import VersionedLRUCache
+
+
+def test_versioned_cache_evicts_least_recently_used():
+    """Test that the least recently used entry is evicted beyond max_entries"""
+    cache = VersionedLRUCache(max_entries=2)
+    cache.put(1, "a", b"a")
+    cache.put(1, "b", b"b")
+    assert cache.get(1, "a") == b"a"
+
+    cache.put(1, "c", b"c")
+
+    assert cache.get(1, "b") is None
+    assert cache.get(1, "a") == b"a"
+    assert cache.get(1, "c") == b"c"
+    assert len(cache) == 2
+
+
+def test_versioned_cache_dropped_on_version_change():
+    """Test that entries of an old version are never returned"""
+    cache = VersionedLRUCache(max_size=100, sizeof=len)
+    cache.put(1, "a", b"aaaa")
+
+    assert cache.get(2, "a") is None
+    cache.put(2, "b", b"bb")
+    assert cache.get(1, "a") is None
+    assert len(cache) == 1
+    assert cache.size == 2
+
+
+def test_versioned_cache_skips_unknown_version():
+    """Test that nothing is cached when the version is unknown"""
+    cache = VersionedLRUCache()
+    cache.put(None, "a", b"a")
+
+    assert cache.get(None, "a") is None
+    assert len(cache) == 0
+
+
+def test_versioned_cache_is_bounded_by_size():
+    """Test that least recently used entries are evicted to stay within max_size"""
+    cache = VersionedLRUCache(max_size=10, sizeof=len)
+    cache.put(1, "a", b"aaaa")
+    cache.put(1, "b", b"bbbb")
+    assert cache.get(1, "a") == b"aaaa"
+
+    cache.put(1, "c", b"cccc")
+
+    assert cache.get(1, "b") is None
+    assert cache.get(1, "a") == b"aaaa"
+    assert cache.get(1, "c") == b"cccc"
+    assert cache.size == 8
+
+    cache.put(1, "c", b"cc")
+    assert cache.size == 6
+
+
+def test_versioned_cache_skips_oversized_values():
+    """Test that a value larger than the whole cache is not stored"""
+    cache = VersionedLRUCache(max_size=2, sizeof=len)
+    cache.put(1, "a", b"aaaa")
+
+    assert cache.get(1, "a") is None
+    assert len(cache) == 0
+
+
+def test_versioned_cache_builds_once_per_version_and_key():
+    """Test that built values are reused until the version changes"""
+    cache = VersionedLRUCache(max_entries=2)
+    build = mock.Mock(side_effect=lambda: object())
+
+    first = cache.get_or_build(1, ("a",), build)
+    assert cache.get_or_build(1, ("a",), build) is first
+    assert build.call_count == 1
+
+    cache.get_or_build(1, ("b",), build)
+    cache.get_or_build(1, ("c",), build)
+    assert build.call_count == 3
+    assert cache.get_or_build(1, ("a",), build) is not first
+    assert build.call_count == 4
+
+    assert cache.get_or_build(2, ("a",), build) is not first
+    assert build.call_count == 5
+
+
+def test_versioned_cache_builds_none_once():
+    """Test that a built None value is cached like any other"""
+    cache = VersionedLRUCache()
+    build = mock.Mock(return_value=None)
+
+    assert cache.get_or_build(1, "a", build) is None
+    assert cache.get_or_build(1, "a", build) is None
+    assert build.call_count == 1
+
+
+def test_versioned_cache_builds_outside_the_lock():
+    """Test that a slow build does not delay other keys, and is not started twice"""
+    cache = VersionedLRUCache()
+    cache.put(1, "cached", "hit")
+    started = threading.Event()
+    release = threading.Event()
+    built = object()
+    build = mock.Mock()
+
+    def slow_build():
+        build()
+        started.set()
+        assert release.wait(timeout=5)
+        return built
+
+    results = []
+    builders = [
+        threading.Thread(target=lambda: results.append(cache.get_or_build(1, "slow", slow_build)))
+        for _ in range(2)
+    ]
+    builders[0].start()
+    assert started.wait(timeout=5)
+    builders[1].start()
+
+    assert cache.get(1, "cached") == "hit"
+    assert cache.get_or_build(1, "other", lambda: "fast") == "fast"
+
+    release.set()
+    for thread in builders:
+        thread.join(timeout=5)
+    assert results == [built, built]
+    assert build.call_count == 1
+    assert cache.get(1, "slow") is built
+
+
+def test_versioned_cache_failed_build_not_cached():
+    """Test that a failing build raises and is retried by the next request"""
+    cache = VersionedLRUCache()
+    with pytest.raises(RuntimeError):
+        cache.get_or_build(1, "a", mock.Mock(side_effect=RuntimeError("boom")))
+
+    assert cache.get_or_build(1, "a", lambda: "a") == "a"
+
+
+def test_versioned_cache_outdated_build_not_stored():
+    """Test that a value built for a version replaced during the build is not stored"""
+    cache = VersionedLRUCache()
+
+    def build():
+        cache.put(2, "b", "b")
+        return "a"
+
+    assert cache.get_or_build(1, "a", build) == "a"
+    assert cache.get(1, "a") is None
+    assert cache.get(2, "b") == "b"
+
+
+def test_versioned_cache_builds_without_version():
+    """Test that an unknown version disables caching of built values"""
+    cache = VersionedLRUCache()
+    build = mock.Mock(side_effect=lambda: object())
+
+    cache.get_or_build(None, "a", build)
+    cache.get_or_build(None, "a", build)
+
+    assert build.call_count == 2
+    assert len(cache) == 0
+
+
+def test_versioned_cache_clear():
+    """Test that clear drops all entries"""
+    cache = VersionedLRUCache(max_size=10, sizeof=len)
+    cache.put(1, "a", b"aaaa")
+    cache.clear()
+
+    assert cache.get(1, "a") is None
+    assert cache.size == 0